@@ -0,0 +1,499 @@
+"""Vectorized batch simulator: N headless runs stepped together with NumPy.
+
+    python batch.py --runs 4096 --seconds 120
+    python batch.py --check --runs 64          # compare against the scalar Game
+
+Rabbits and their obstacle/carrot/wing/portal queues are kept as
+struct-of-arrays. Everything that happens every tick (gravity, jump hold,
+wings, ceiling/floor, movement, culling, AABB tests, pickups) is done with
+array ops over all runs at once. Spawning happens about once a second per
+run and draws from each run's own random.Random in exactly the order Game
+does, so it stays a small per-run Python step; this is what keeps results
+identical to sim.simulate() for the same seed and inputs.
+
+Within one tick the batch applies releases, then presses, then specials.
+"""
+import argparse, math, random, time
+
+import numpy as np
+
+import main, sim
+
+SCENES = (main.SCENE_GRASS, main.SCENE_HELL, main.SCENE_HEAVEN)
+GRASS, HELL, HEAVEN = range(3)
+ROCK, FOX = 0, 1
+PORTAL_HELL, PORTAL_HEAVEN = 0, 1
+
+
+class _Pool:
+    # 每局一行、固定容量的实体槽位；seq 记录生成顺序（= Game 里的列表顺序）
+    def __init__(self, n, cap, extra=()):
+        self.fields = ["x", "y", "w", "h", "seq"] + [name for name, _ in extra]
+        for name in ("x", "y", "w", "h", "seq"):
+            setattr(self, name, np.zeros((n, cap), np.int64))
+        for name, dtype in extra:
+            setattr(self, name, np.zeros((n, cap), dtype))
+        self.alive = np.zeros((n, cap), bool)
+        self.next_seq = np.zeros(n, np.int64)
+
+    def _grow(self):
+        for name in self.fields + ["alive"]:
+            a = getattr(self, name)
+            setattr(self, name, np.concatenate([a, np.zeros_like(a)], axis=1))
+
+    def add(self, i, x, y, w, h, **extra):
+        free = np.flatnonzero(~self.alive[i])
+        if free.size == 0:
+            self._grow()
+            free = np.flatnonzero(~self.alive[i])
+        j = free[0]
+        self.x[i, j], self.y[i, j], self.w[i, j], self.h[i, j] = x, y, w, h
+        for name, value in extra.items():
+            getattr(self, name)[i, j] = value
+        self.seq[i, j] = self.next_seq[i]
+        self.next_seq[i] += 1
+        self.alive[i, j] = True
+        return j
+
+    def slots(self, i):
+        js = np.flatnonzero(self.alive[i])
+        return js[np.argsort(self.seq[i, js])]
+
+    def rects(self, i):
+        return [(int(self.x[i, j]), int(self.y[i, j]), int(self.w[i, j]), int(self.h[i, j]))
+                for j in self.slots(i)]
+
+    def hits(self, px, py, pw, ph):
+        # pygame.Rect.colliderect，对每局的玩家矩形广播
+        return (self.alive
+                & (px[:, None] < self.x + self.w) & (self.x < (px + pw)[:, None])
+                & (py[:, None] < self.y + self.h) & (self.y < (py + ph)[:, None])
+                & (self.w > 0) & (self.h > 0))
+
+    def first(self, mask, key=None):
+        # 每行 mask 内 key 最小（相同则 seq 最小）的槽位；没有时为 -1
+        k = self.seq if key is None else ((key + (1 << 20)) << 32) | self.seq
+        k = np.where(mask, k, np.iinfo(np.int64).max)
+        j = np.argmin(k, axis=1)
+        return np.where(mask.any(axis=1), j, -1)
+
+
+def _collide(ax, ay, aw, ah, bx, by, bw, bh):
+    return aw > 0 and ah > 0 and bw > 0 and bh > 0 and ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class BatchSim:
+    def __init__(self, seeds, dt=None):
+        self.seeds = list(seeds)
+        self.dt = dt or main.STEP_MS
+        n = self.n = len(self.seeds)
+        self.rngs = [random.Random(s) for s in self.seeds]
+        self.tick = 0
+        f8 = lambda v=0.0: np.full(n, v, np.float64)
+        i8 = lambda v=0: np.full(n, v, np.int64)
+        b1 = lambda v=False: np.full(n, v, bool)
+
+        # Game
+        self.scene = i8(GRASS)
+        self.special_charges = i8()
+        self.gameover, self.revive_used, self.reviving = b1(), b1(), b1()
+        self.revive_timer = f8()
+        self.score, self.time_ms = f8(), f8()
+        self.spawn_cd, self.carrot_cd = f8(1200), f8(1200)
+        self.next_wing_threshold = i8(500)
+        self.pending_wing_at = f8(np.nan)
+        self.energy, self.coins = i8(), i8()
+        self.spawned_hell_portal, self.spawned_heaven_portal = b1(), b1()
+        self.space_held = b1()
+        self.ticks = i8()
+
+        # Rabbit
+        self.px = 180
+        self.w, self.h = i8(main.RABBIT_W), i8(main.RABBIT_H)
+        self.y = f8(main.GROUND_Y - main.RABBIT_H)
+        self.vy = f8()
+        self.on_ground = b1(True)
+        self.jump_holding, self.jump_cut_applied = b1(), b1()
+        self.jump_hold_time = f8()
+        self.jump_count = i8()
+        self.has_wings = b1()
+        self.wing_score_left = f8()
+        self.super_active = b1()
+        self.super_timer = f8()
+        self.iframe_ms = f8()
+
+        # 实体
+        self.obstacles = _Pool(n, 8, [("kind", np.int8), ("phase", np.float64)])
+        self.carrots = _Pool(n, 32)
+        self.wings = _Pool(n, 4, [("phase", np.float64)])
+        self.portals = _Pool(n, 2, [("kind", np.int8)])
+
+    # ---------- helpers ----------
+    def player_rects(self):
+        return (np.full(self.n, self.px, np.int64), np.trunc(self.y).astype(np.int64), self.w, self.h)
+
+    def current_speed(self):
+        return np.where(self.score < main.RAMP_START_SCORE, main.BASE_SPEED,
+                        main.BASE_SPEED + (self.score - main.RAMP_START_SCORE) * main.RAMP_SLOPE)
+
+    def _rightmost_obstacle_x(self, i):
+        m = self.obstacles.alive[i]
+        return int((self.obstacles.x[i] + self.obstacles.w[i])[m].max()) if m.any() else 0
+
+    def _shift_x_to_avoid_overlap(self, i, x, y, w, h, margin, rects=None):
+        if rects is None:
+            rects = self.obstacles.rects(i)
+        for _ in range(8):
+            overlap = False
+            for ox, oy, ow, oh in rects:
+                if _collide(x, y, w, h, ox, oy, ow, oh):
+                    x = ox + ow + margin
+                    overlap = True
+            if not overlap:
+                break
+        return x
+
+    def _start_super(self, m):
+        self.super_active |= m
+        self.super_timer[m] = main.SUPER_DURATION_MS
+        self.w[m] = int(main.RABBIT_W * main.SUPER_SCALE)
+        self.h[m] = int(main.RABBIT_H * main.SUPER_SCALE)
+        self.y[m] = np.minimum(self.y[m], main.GROUND_Y - self.h[m])
+
+    # ---------- spawners（逐局，随机数顺序与 Game 完全一致） ----------
+    def _spawn_obstacle(self, i):
+        rng = self.rngs[i]
+        kind = rng.choices(["rock", "fox"], weights=[0.64, 0.36], k=1)[0]
+        if kind == "rock":
+            w = rng.randint(main.ROCK_W_MIN, main.ROCK_W_MAX)
+            h = rng.randint(main.ROCK_H_MIN, main.ROCK_H_MAX)
+        else:
+            w, h = main.FOX_W, main.FOX_H
+        self.obstacles.add(i, main.WIDTH + 40, main.GROUND_Y - h, w, h,
+                           kind=ROCK if kind == "rock" else FOX, phase=rng.random()*math.tau)
+
+    def _spawn_carrots(self, i):
+        rng = self.rngs[i]
+        n = rng.randint(main.CARROT_ROW_MIN, main.CARROT_ROW_MAX)
+        y = rng.choice(main.CARROT_LOW_CHOICES)
+        start_x = main.WIDTH + 80
+        rmo = self._rightmost_obstacle_x(i)
+        if rmo > 0:
+            start_x = max(start_x, rmo + 140)
+        rects = self.obstacles.rects(i)
+        for k in range(n):
+            cy = y + rng.randint(-8, 8)
+            cx = self._shift_x_to_avoid_overlap(i, start_x + k * 34, cy, 22, 32, 140, rects)
+            self.carrots.add(i, cx, cy, 22, 32)
+
+    def _spawn_wing(self, i):
+        rng = self.rngs[i]
+        y = rng.choice([main.GROUND_Y - 180, main.GROUND_Y - 140, main.GROUND_Y - 110])
+        x = main.WIDTH + 80
+        rmo = self._rightmost_obstacle_x(i)
+        if rmo > 0:
+            x = max(x, rmo + 160)
+        w, h = main.WING_PICKUP_SIZE
+        phase = rng.random()*math.tau
+        self.wings.add(i, self._shift_x_to_avoid_overlap(i, x, y, w, h, 160), y, w, h, phase=phase)
+
+    def _spawn_portal(self, i, kind):
+        x, y = main.WIDTH + 120, main.GROUND_Y - 180
+        self.portals.add(i, self._shift_x_to_avoid_overlap(i, x, y, 70, 140, 200), y, 70, 140, kind=kind)
+
+    # ---------- input ----------
+    def apply_inputs(self, down=None, up=None, special=None):
+        ok = ~self.gameover
+        if up is not None:
+            m = up & ok
+            self.space_held[m] = False
+            cut = m & ~self.has_wings & (self.vy < 0) & ~self.jump_cut_applied
+            self.vy[cut] *= main.JUMP_CUT_FACTOR
+            self.jump_cut_applied |= cut
+            self.jump_holding[m] = False
+        if down is not None:
+            m = down & ok & ~self.reviving
+            j = m & ~self.has_wings & (self.jump_count < main.MAX_JUMPS)
+            self.vy[j] = main.JUMP_V0
+            self.on_ground[j] = False
+            self.jump_hold_time[j] = 0
+            self.jump_cut_applied[j] = False
+            self.jump_count[j] += 1
+            self.space_held |= m
+            self.jump_holding[m] = (self.vy < 0)[m] & (self.jump_hold_time < main.MAX_JUMP_HOLD_MS)[m]
+        if special is not None:
+            m = special & ok & ~self.reviving & (self.special_charges > 0)
+            ob = self.obstacles
+            cx = ob.x + ob.w // 2
+            pcx = self.px + self.w // 2
+            target = ob.first(ob.alive & m[:, None] & (cx > (pcx + 30)[:, None]), key=cx)
+            rows = np.flatnonzero(target >= 0)
+            ob.alive[rows, target[rows]] = False
+            self.special_charges[rows] -= 1
+
+    # ---------- update ----------
+    def step(self, down=None, up=None, special=None):
+        dt = self.dt
+        self.apply_inputs(down, up, special)
+        active = ~self.gameover
+        self.ticks[active] += 1
+        self.tick += 1
+
+        rv = active & self.reviving
+        self.revive_timer[rv] -= dt
+        done = rv & (self.revive_timer <= 0)
+        self.reviving[done] = False
+        self.iframe_ms[done] = main.POST_REVIVE_IFRAME_MS
+
+        live = active & ~rv
+        if not live.any():
+            return
+        score_gain = dt * 0.035
+        self.time_ms[live] += dt
+        self.score[live] += score_gain
+        speed = self.current_speed()
+
+        self._update_physics(live, score_gain)
+
+        # portals trigger
+        m = live & (self.score >= 3000) & ~self.spawned_hell_portal & (self.scene == GRASS)
+        for i in np.flatnonzero(m):
+            self._spawn_portal(i, PORTAL_HELL)
+        self.spawned_hell_portal |= m
+        m = live & (self.score >= 6000) & ~self.spawned_heaven_portal & (self.scene != HEAVEN)
+        for i in np.flatnonzero(m):
+            self._spawn_portal(i, PORTAL_HEAVEN)
+        self.spawned_heaven_portal |= m
+
+        # wings schedule（地狱不刷翅膀）
+        wl = live & (self.scene != HELL)
+        m = wl & (self.score >= self.next_wing_threshold)
+        for i in np.flatnonzero(m & np.isnan(self.pending_wing_at)):
+            self.pending_wing_at[i] = self.time_ms[i] + self.rngs[i].randint(*main.WING_JITTER_MS)
+        if m.any():
+            steps = np.floor((self.score[m] - self.next_wing_threshold[m]) / 500).astype(np.int64) + 1
+            self.next_wing_threshold[m] += 500 * steps
+        m = wl & (self.time_ms >= self.pending_wing_at)
+        for i in np.flatnonzero(m):
+            self._spawn_wing(i)
+        self.pending_wing_at[m] = np.nan
+
+        # spawn obstacles / carrots
+        self.spawn_cd[live] -= dt
+        for i in np.flatnonzero(live & (self.spawn_cd <= 0)):
+            self._spawn_obstacle(i)
+            gap = self.rngs[i].randint(main.OBST_MIN_GAP, main.OBST_MAX_GAP) - int(self.score[i] * main.OBST_GAP_SCORE_FACTOR)
+            self.spawn_cd[i] = max(1000, gap)
+        self.carrot_cd[live] -= dt
+        for i in np.flatnonzero(live & (self.carrot_cd <= 0)):
+            self._spawn_carrots(i)
+            self.carrot_cd[i] = self.rngs[i].randint(1100, 1900)
+
+        # move & clean
+        dx = np.rint(speed).astype(np.int64)[:, None]
+        t = self.time_ms[:, None]
+        ob = self.obstacles
+        ob.x -= np.where(live[:, None], dx, 0)
+        fox = live[:, None] & ob.alive & (ob.kind == FOX)
+        bob = np.trunc(3 * np.sin(t*0.02 + ob.phase)).astype(np.int64)
+        ob.y = np.where(fox, (main.GROUND_Y - ob.h) + bob, ob.y)
+        ob.alive &= (ob.x + ob.w) > -80
+        for pool in (self.carrots, self.wings, self.portals):
+            pool.x -= np.where(live[:, None], dx, 0)
+        wg = self.wings
+        wob = np.trunc(1.4 * np.sin(t*0.01 + wg.phase)).astype(np.int64)
+        wg.y += np.where(live[:, None] & wg.alive, wob, 0)
+        for pool in (self.carrots, self.wings, self.portals):
+            pool.alive &= (pool.x + pool.w) > -40
+
+        # --------- 碰撞/拾取 ----------
+        prect = self.player_rects()
+        pt = self.portals
+        j = pt.first(pt.hits(*prect) & live[:, None])
+        rows = np.flatnonzero(j >= 0)
+        pt.alive[rows, j[rows]] = False
+        self.scene[rows] = np.where(pt.kind[rows, j[rows]] == PORTAL_HELL, HELL, HEAVEN)
+        self.special_charges[rows] = 5
+
+        hit = live & (ob.hits(*prect).any(axis=1)) & ~self.super_active & (self.iframe_ms <= 0)
+        first = hit & ~self.revive_used
+        self.revive_used |= first
+        self.reviving |= first
+        self.revive_timer[first] = main.REVIVE_COUNTDOWN_MS
+        self.gameover |= hit & ~first
+
+        got = self.carrots.hits(*prect) & live[:, None]
+        k = got.sum(axis=1)
+        self.carrots.alive &= ~got
+        self.coins += k
+        for c in range(int(k.max(initial=0))):
+            self.score += np.where(k > c, 10.0, 0.0)  # 逐个 +10，保持与标量浮点累加一致
+        need = 50 - self.energy
+        charge = (k > 0) & ~self.super_active
+        boom = charge & (k >= need)
+        self.energy = np.where(boom, 0, np.where(charge, self.energy + k, self.energy))
+        self._start_super(boom)
+
+        got = self.wings.hits(*prect) & live[:, None]
+        m = got.any(axis=1)
+        self.wings.alive &= ~got
+        self.has_wings |= m
+        self.wing_score_left[m] = main.WING_SCORE_BUDGET
+
+    def _update_physics(self, live, score_gain):
+        dt = self.dt
+        m = live & (self.iframe_ms > 0)
+        self.iframe_ms[m] -= dt
+
+        m = live & self.super_active
+        self.super_timer[m] -= dt
+        end = m & (self.super_timer <= 0)
+        self.super_active[end] = False
+        self.w[end], self.h[end] = main.RABBIT_W, main.RABBIT_H
+        self.y[end] = np.minimum(self.y[end], main.GROUND_Y - self.h[end])
+
+        wing = live & self.has_wings
+        self.wing_score_left[wing] -= score_gain
+        self.has_wings[wing & (self.wing_score_left <= 0)] = False
+        self.vy[wing & self.space_held] += main.WING_ASCEND_VEL
+        self.vy[wing] += main.WING_GRAVITY
+
+        foot = live & ~wing
+        hold = foot & self.jump_holding & (self.vy < 0) & (self.jump_hold_time < main.MAX_JUMP_HOLD_MS)
+        self.vy[hold] += main.GRAVITY*main.HOLD_GRAVITY_SCALE
+        self.jump_hold_time[hold] += dt
+        fall = foot & ~hold
+        self.jump_holding[fall] = False
+        self.vy[fall] += main.GRAVITY
+
+        self.y[live] += self.vy[live]
+
+        ceil = live & (self.y < main.CEILING_Y)
+        self.y[ceil] = main.CEILING_Y
+        self.vy[ceil & (self.vy < 0)] = 0
+
+        floor = live & (self.y + self.h >= main.GROUND_Y)
+        self.y[floor] = (main.GROUND_Y - self.h)[floor]
+        self.vy[floor] = 0
+        self.jump_count[floor] = 0
+        self.jump_cut_applied[floor] = False
+        self.on_ground[live] = floor[live]
+
+    # ---------- runner ----------
+    def run(self, policy=None, max_ticks=60 * 60 * main.FPS):
+        """policy(batch, tick) -> (down, up, special) bool arrays (or None)."""
+        while self.tick < max_ticks and not self.gameover.all():
+            acts = policy(self, self.tick) if policy is not None else (None, None, None)
+            self.step(*acts)
+        return self.results()
+
+    def results(self):
+        return [{
+            "seed": self.seeds[i],
+            "ticks": int(self.ticks[i]),
+            "sim_ms": float(self.time_ms[i]),
+            "score": int(self.score[i]),
+            "carrots": int(self.coins[i]),
+            "scene": SCENES[self.scene[i]],
+            "gameover": bool(self.gameover[i]),
+            "revive_used": bool(self.revive_used[i]),
+        } for i in range(self.n)]
+
+
+class ScriptedInputs:
+    # 每局各自的 [(tick, action), ...] → 每 tick 的输入掩码
+    def __init__(self, per_run):
+        self.events = {}
+        for i, events in enumerate(per_run):
+            for tick, action in events:
+                self.events.setdefault(tick, []).append((i, action))
+
+    def __call__(self, batch, tick):
+        masks = {a: np.zeros(batch.n, bool) for a in (sim.JUMP_DOWN, sim.JUMP_UP, sim.SPECIAL)}
+        for i, action in self.events.get(tick, ()):
+            masks[action][i] = True
+        return masks[sim.JUMP_DOWN], masks[sim.JUMP_UP], masks[sim.SPECIAL]
+
+
+class BatchAutoJumper:
+    # sim.AutoJumper 的向量化版本（决策逐 tick 与标量版一致）
+    def __init__(self, lead_ticks=10, hold_ticks=12):
+        self.lead_ticks = lead_ticks
+        self.hold_ticks = hold_ticks
+        self.release_at = None
+
+    def __call__(self, b, tick):
+        if self.release_at is None:
+            self.release_at = np.full(b.n, -1, np.int64)
+        down = np.zeros(b.n, bool)
+        up = np.zeros(b.n, bool)
+        wing = b.has_wings
+        self.release_at[wing] = -1
+        down |= wing & ~b.reviving & ~b.jump_holding & (b.vy >= 0)
+
+        pending = ~wing & (self.release_at >= 0)
+        fire = pending & (tick >= self.release_at)
+        up |= fire
+        self.release_at[fire] = -1
+
+        px, py, pw, ph = b.player_rects()
+        ob = b.obstacles
+        ahead = ob.alive & (ob.x + ob.w > px[:, None])
+        j = ob.first(ahead, key=ob.x)
+        has = j >= 0
+        jj = np.where(has, j, 0)
+        rows = np.arange(b.n)
+        fx, fy = ob.x[rows, jj], ob.y[rows, jj]
+        dist = fx - (px + pw)
+        speed = b.current_speed()
+        free = ~wing & ~pending & has
+        ground = free & b.on_ground & (dist <= speed * self.lead_ticks)
+        air = (free & ~b.on_ground & (b.vy > 0) & (b.jump_count < 2)
+               & (dist < speed * 3) & (py + ph > fy - 4))
+        go = ground | air
+        down |= go
+        self.release_at[go] = tick + self.hold_ticks
+        return down, up, None
+
+
+def check(seeds, max_ticks):
+    # 与标量 Game（sim.simulate）逐局对比
+    keys = ("ticks", "score", "carrots", "scene", "gameover", "revive_used")
+    batch = BatchSim(seeds).run(BatchAutoJumper(), max_ticks=max_ticks)
+    bad = 0
+    for b in batch:
+        s = sim.simulate(b["seed"], sim.AutoJumper(), max_ticks=max_ticks)
+        diff = {k: (s[k], b[k]) for k in keys if s[k] != b[k]}
+        if diff:
+            bad += 1
+            print(f"seed {b['seed']}: scalar vs batch {diff}")
+    print(f"{len(batch) - bad}/{len(batch)} runs match the scalar Game")
+    return bad == 0
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=1024)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--seconds", type=float, default=120.0, help="max simulated seconds per run")
+    ap.add_argument("--check", action="store_true", help="verify against the scalar simulator")
+    args = ap.parse_args()
+
+    seeds = range(args.seed, args.seed + args.runs)
+    max_ticks = int(args.seconds * 1000 / main.STEP_MS)
+    if args.check:
+        raise SystemExit(0 if check(seeds, max_ticks) else 1)
+
+    t0 = time.perf_counter()
+    results = BatchSim(seeds).run(BatchAutoJumper(), max_ticks=max_ticks)
+    elapsed = time.perf_counter() - t0
+    ticks = sum(r["ticks"] for r in results)
+    scores = sorted(r["score"] for r in results)
+    print(f"runs: {len(results)}   run-ticks: {ticks}   wall: {elapsed:.2f}s   "
+          f"throughput: {ticks / elapsed:,.0f} ticks/s")
+    print(f"score  min: {scores[0]}   median: {scores[len(scores) // 2]}   max: {scores[-1]}   "
+          f"gameover: {sum(r['gameover'] for r in results)}/{len(results)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,464 @@
+"""Frame-time benchmarks for HAPPY RABBIT.
+
+    python bench.py [--frames 300]                      # 缓存前后对照 + 全部场景
+    python bench.py --skip-micro --save baseline.json   # 记一份基线
+    python bench.py --skip-micro --compare baseline.json --threshold 10
+
+Runs offscreen (SDL dummy video driver). The micro cases print ms/frame
+before and after each cache. The scenarios drive Game through scripted
+situations (calm run, dense carrots, hell portal, heaven with wings,
+super, revive and game-over overlays) and report update cost, draw cost
+and allocation pressure. --startup spawns main.py --startup-probe and
+times process start to first frame and to ready. Timings are the median
+of --repeat runs. --save and --compare need at least MIN_REPEAT (5) of them
+(one run swings 15-190% on a busy machine). The baseline keeps every
+run. --compare exits non-zero when a metric's median is worse than the
+baseline by more than --threshold percent and, for timings, the new
+runs' lower quartile is above the baseline's upper quartile, so one
+noisy burst does not count. A fixed reference loop runs between the
+scenario runs; if its median moved by more than half the threshold
+since the baseline, the machine itself is faster or slower and
+--compare exits 3 (inconclusive) instead of judging. It refuses a
+baseline recorded with fewer runs.
+"""
+import argparse, gc, json, os, platform, random, statistics, subprocess, sys, time, tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import main, sim
+
+
+def legacy_sky(surf, scene):
+    # 旧实现：每帧逐行 draw.line（对照用）
+    pal = main.SCENE_PALETTE[scene]
+    top, bottom = pal["top"], pal["bottom"]
+    for i in range(main.HEIGHT):
+        t = i/main.HEIGHT
+        col = (int(main.lerp(top[0], bottom[0], t)),
+               int(main.lerp(top[1], bottom[1], t)),
+               int(main.lerp(top[2], bottom[2], t)))
+        pygame.draw.line(surf, col, (0,i), (main.WIDTH,i))
+    pygame.draw.circle(surf, pal["sun"], (120, 120), 50)
+
+
+def cached_sky(surf, scene):
+    surf.blit(main.sky_surface(scene), (0, 0))
+
+
+def time_frames(fn, frames):
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / frames
+
+
+def bench_sky(frames):
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    rows = []
+    for scene in (main.SCENE_GRASS, main.SCENE_HELL, main.SCENE_HEAVEN):
+        before = time_frames(lambda: legacy_sky(surf, scene), frames)
+        cached_sky(surf, scene)  # 预热缓存
+        after = time_frames(lambda: cached_sky(surf, scene), frames)
+        rows.append((f"sky/{scene}", before, after))
+    return rows
+
+
+def _busy_game():
+    # 一屏上尽量多的实体：3 个障碍、3 排胡萝卜、翅膀、传送门
+    game = main.Game(seed=0)
+    for o in (main.Obstacle("rock", 320, main.GROUND_Y - 90, 70, 90, 0.0),
+              main.Obstacle("fox", 520, main.GROUND_Y - main.FOX_H, main.FOX_W, main.FOX_H, 1.0),
+              main.Obstacle("rock", 700, main.GROUND_Y - 60, 50, 60, 0.0)):
+        game.obstacles.add(o)
+    for row in range(3):
+        for i in range(6):
+            game.carrots.add(main.Carrot(60 + i * 34 + row * 260, main.CARROT_LOW_CHOICES[row]))
+    game.wings.add(main.WingsPickup(420, main.GROUND_Y - 180, 0.0))
+    game.portals.add(main.Portal("hell", 620, main.GROUND_Y - 180, 0.0))
+    game.player.has_wings = True
+    return game
+
+
+def bench_entities(frames):
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    game = _busy_game()
+    state = {"t": 0}
+
+    def draw_entities():
+        state["t"] += 16
+        for c in game.carrots: c.draw(surf, game.scene)
+        for o in game.obstacles: o.draw(surf, game.scene)
+        for w in game.wings: w.draw(surf, game.scene)
+        for p in game.portals: p.draw(surf)
+        game.player.draw(surf, state["t"], game.scene)
+
+    main.sprites.enabled = False
+    before = time_frames(draw_entities, frames)
+    main.sprites.enabled = True
+    draw_entities()
+    after = time_frames(draw_entities, frames)
+    n = len(game.carrots) + len(game.obstacles) + len(game.wings) + len(game.portals) + 1
+    return [(f"entities ({n} on screen)", before, after)]
+
+
+def bench_hud(frames):
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    game = _busy_game()
+    game.player.start_super()
+    game.scene, game.special_charges = main.SCENE_HEAVEN, 3
+
+    def legacy_hud(gain):
+        # 旧实现：每帧整串 font.render
+        game.score += gain
+        surf.blit(main.font.render(f"Score: {int(game.score)}   Carrots: {game.coins}   Best: {game.best}   Wings: ON   SUPER!",
+                                   True, (10, 25, 10)), (12, 14))
+        x, y = main.WIDTH - 238, 14
+        pygame.draw.rect(surf, (235, 235, 235), (x, y, 220, 20), border_radius=8)
+        pygame.draw.rect(surf, (120, 120, 120), (x, y, 220, 20), 2, border_radius=8)
+        surf.blit(main.font.render("Energy (50 carrots → SUPER)", True, (10, 25, 10)), (x, y + 26))
+        for i, text in enumerate(("Wings: 17s", "SUPER: 8s", "Wand: 3")):
+            surf.blit(main.font.render(text, True, (0, 0, 0)), (16, 502 + i * 26))
+
+    def cached_hud(gain):
+        game.score += gain
+        game.draw_hud(surf)
+
+    # 分数每帧 +0.6 时整行大约每两帧变一次；分数不动时（复活倒计时、HUD 静止）每帧都命中缓存
+    rows = []
+    for label, gain in (("hud text", 0.6), ("hud text (value unchanged)", 0.0)):
+        rows.append((label, time_frames(lambda g=gain: legacy_hud(g), frames),
+                     time_frames(lambda g=gain: cached_hud(g), frames)))
+    return rows
+
+
+def legacy_parallax(surf, scene, off):
+    # 旧 draw_far 的山 + draw_ground：每帧重算轮廓、填两个大多边形和地面
+    pal = main.SCENE_PALETTE[scene]
+    G = main.GROUND_Y
+    pts = [(0-off,G-110),(240-off,G-220),(480-off,G-110),(720-off,G-240),(1000-off,G-110),(1280-off,G-220),(1580-off,G-110)]
+    pygame.draw.polygon(surf, pal["hill1"], pts+[(main.WIDTH,G),(0,G)])
+    pygame.draw.polygon(surf, pal["hill2"], [(x+100, y+36) for (x,y) in pts]+[(main.WIDTH,G),(0,G)])
+    pygame.draw.rect(surf, pal["grass1"], (0,G, main.WIDTH, main.HEIGHT-G))
+    pygame.draw.rect(surf, pal["grass2"], (0,G+24, main.WIDTH, main.HEIGHT-(G+24)))
+    pygame.draw.line(surf, (60,90,60), (0,G), (main.WIDTH,G), 4)
+
+
+def bench_parallax(frames):
+    # 同样的山+地面对照一次；再加上远山和草丛两层（--extra-layers，都不含云）
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    main.use_parallax_layers(True)
+    bg = main.Background(main.RngStreams(0))
+    state = {"off": 0}
+
+    def legacy():
+        state["off"] = (state["off"] + 2) % (main.WIDTH + 200)
+        legacy_parallax(surf, main.SCENE_GRASS, state["off"])
+
+    def strips(layers):
+        for layer in layers:
+            bg.scroll[layer.name] = (bg.scroll[layer.name] + 8.0 * layer.factor) % layer.period
+        bg.draw_layers(surf, main.SCENE_GRASS, layers, 0.0)
+
+    same = [l for l in main.PARALLAX_LAYERS if l.name in ("hills", "ground")]
+    strips(main.PARALLAX_LAYERS)  # 预热缓存
+    before = time_frames(legacy, frames)
+    rows = [("hills+ground strips", before, time_frames(lambda: strips(same), frames)),
+            (f"all {len(main.PARALLAX_LAYERS)} strip layers", before,
+             time_frames(lambda: strips(main.PARALLAX_LAYERS), frames))]
+    main.use_parallax_layers(main.EXTRA_LAYERS)
+    return rows
+
+
+def bench_particles(frames):
+    # 地狱余烬：旧实现是逐个列表元素更新 + 每个一次 draw.circle
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    rows = []
+    for n in (main.FLOWER_COUNT, 2000):
+        rng = random.Random(0)
+        flowers = [[rng.randint(0, main.WIDTH), rng.randint(main.GROUND_Y + 10, main.HEIGHT - 12)] for _ in range(n)]
+
+        def legacy():
+            for f in flowers:
+                f[0] -= 4.0
+                if f[0] < -6:
+                    f[0] = main.WIDTH + rng.randint(0, 120)
+                    f[1] = rng.randint(main.GROUND_Y + 10, main.HEIGHT - 12)
+            for x, y in flowers:
+                c = (255, 120, 80) if rng.random() < 0.5 else (255, 180, 120)
+                pygame.draw.circle(surf, c, (x, y), 2)
+
+        field = main.ParticleField(n, (main.GROUND_Y + 10, main.HEIGHT - 12), 0.5, 4,
+                                   random.Random(0), random.Random(1))
+
+        def batched():
+            field.update(8.0)
+            field.draw(surf, main.dot_sprites(main.SCENE_HELL), 0.5, flicker=True)
+
+        rows.append((f"particles/{n}", time_frames(legacy, frames), time_frames(batched, frames)))
+    return rows
+
+
+# ---------- scenarios ----------
+# 固定种子 + AutoJumper 输入驱动 Game（带背景，不读写最高分），测：
+#   update_us  每步 update 的耗时（µs）     draw_ms  每帧 Game.draw 到离屏 Surface（ms）
+#   gc_per_1k  每 1000 步触发的 gen0 GC 次数  peak_kb  运行中 tracemalloc 峰值增量（KB）
+SEED = 1
+METRICS = ("update_us", "draw_ms", "gc_per_1k", "peak_kb")
+# 比较时的绝对余量：基数很小的指标（冻结场景的 update 只有零点几 µs）光看百分比会误报
+SLACK = {"update_us": 0.5, "draw_ms": 0.05, "gc_per_1k": 0.5, "peak_kb": 8.0,
+         "first_frame_ms": 20.0, "ready_ms": 20.0}
+MIN_REPEAT = 5           # --save/--compare 至少跑几遍取中位数
+
+
+class Scenario:
+    def __init__(self, name, setup=None, hold=None, overrides=None, policy=True):
+        self.name = name
+        self.setup = setup
+        self.hold = hold          # 每步之前调用，把局面维持在该场景
+        self.overrides = overrides or {}
+        self.policy = policy
+
+    def build(self):
+        game = main.Game(headless=True, seed=SEED)
+        game.bg = main.Background(game.streams)
+        if self.setup:
+            self.setup(game)
+        return game
+
+    def frames(self, ticks):
+        # 逐步产出 (game, keys_held)；跑着跑着死了就重建（重建不计时）
+        game, keys = self.build(), {"space": False}
+        policy = sim.AutoJumper() if self.policy else None
+        for tick in range(ticks):
+            if game.gameover and policy is not None:
+                game, keys = self.build(), {"space": False}
+                policy = sim.AutoJumper() if self.policy else None
+            if self.hold:
+                self.hold(game)
+            if policy is not None:
+                for action in policy(game, tick):
+                    sim.apply_action(game, keys, action)
+            yield game, keys
+
+
+def _hell_portal(game):
+    game.score = 2990.0  # 100 步后地狱门到兔子面前
+    game.next_wing_threshold = 3500
+
+
+def _heaven(game):
+    game.scene, game.special_charges, game.score = main.SCENE_HEAVEN, 5, 6100.0
+    game.spawned_hell_portal = game.spawned_heaven_portal = True
+    game.next_wing_threshold = 6500
+
+
+def _keep_wings(game):
+    if not game.player.has_wings:
+        game.player.give_wings()
+
+
+def _keep_super(game):
+    if not game.player.super_active:
+        game.player.start_super()
+
+
+def _revive(game):
+    game.revive_used = game.reviving = True
+    game.revive_timer = main.REVIVE_COUNTDOWN_MS
+
+
+def _keep_reviving(game):
+    if game.revive_timer < 100:
+        game.revive_timer = main.REVIVE_COUNTDOWN_MS
+
+
+def _gameover(game):
+    game.gameover = True
+
+
+SCENARIOS = {s.name: s for s in (
+    Scenario("calm"),
+    Scenario("dense_carrots", overrides={"CARROT_ROW_MIN": 10, "CARROT_ROW_MAX": 16}),
+    Scenario("hell_portal", setup=_hell_portal),
+    Scenario("heaven_wings", setup=_heaven, hold=_keep_wings),
+    Scenario("super", hold=_keep_super),
+    Scenario("revive", setup=_revive, hold=_keep_reviving, policy=False),
+    Scenario("gameover", setup=_gameover, policy=False),
+)}
+
+
+def reference(surf):
+    # 和游戏代码无关的固定活儿（Python 循环 + 一次整屏 fill），跟场景交替着跑：
+    # 它变慢了说明是机器此刻慢，不是代码退化
+    perf = time.perf_counter
+    t0 = perf()
+    r, hit = pygame.Rect(0, 0, 40, 40), (350, 0, 40, 40)
+    n = 0
+    for i in range(20000):
+        r.x = i % 700
+        n += r.colliderect(hit)
+    surf.fill((n & 255, 0, 0))
+    return (perf() - t0) * 1e3
+
+
+def measure(sc, ticks, repeat):
+    surf = pygame.Surface((main.WIDTH, main.HEIGHT)).convert()
+    perf, step = time.perf_counter, main.STEP_MS
+    with sim.overridden(sc.overrides):
+        # 计时取 repeat 次的中位数（最好的一次只是运气好，对比时会把噪声当退化）
+        ups, draws, refs = [], [], []
+        for _ in range(repeat):
+            refs.append(reference(surf))
+            t_up = t_draw = 0.0
+            for game, keys in sc.frames(ticks):
+                a = perf()
+                game.update(step, keys)
+                b = perf()
+                game.draw(surf)
+                t_up += b - a
+                t_draw += perf() - b
+            ups.append(t_up)
+            draws.append(t_draw)
+
+        # 分配：单独跑一遍（tracemalloc 会拖慢计时）
+        collections = [0]
+        def on_gc(phase, info):
+            if phase == "start" and info["generation"] == 0:
+                collections[0] += 1
+        gc.collect()
+        gc.callbacks.append(on_gc)
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            for game, keys in sc.frames(ticks):
+                game.update(step, keys)
+                game.draw(surf)
+            peak = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+            gc.callbacks.remove(on_gc)
+    samples = {"update_us": [t * 1e6 / ticks for t in ups], "draw_ms": [t * 1e3 / ticks for t in draws],
+               "reference_ms": refs}
+    return {"update_us": statistics.median(samples["update_us"]), "draw_ms": statistics.median(samples["draw_ms"]),
+            "gc_per_1k": collections[0] * 1000.0 / ticks, "peak_kb": peak / 1024.0}, samples
+
+
+def quartiles(xs):
+    q1, _, q3 = statistics.quantiles(xs, n=4, method="inclusive")
+    return q1, q3
+
+
+def drift(baseline, samples):
+    # 参照活儿的中位数比记基线时慢/快了多少（%）；没有参照样本时为 None
+    def ref(samples):
+        xs = [x for s in samples.values() for x in s.get("reference_ms", ())]
+        return statistics.median(xs) if xs else None
+    old, new = ref(baseline.get("samples", {})), ref(samples)
+    return None if old is None or new is None else (new / old - 1) * 100
+
+
+def compare(baseline, results, samples, threshold):
+    # 返回退化列表：(场景, 指标, 旧, 新, 百分比)。
+    # 计时指标还要求两边的分布分开：新的下四分位高过旧的上四分位，单次抖动不算退化
+    bad = []
+    for name, new in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        for m in new:
+            if m not in old or new[m] <= old[m] * (1 + threshold / 100.0) + SLACK.get(m, 0.0):
+                continue
+            a, b = baseline.get("samples", {}).get(name, {}).get(m), samples.get(name, {}).get(m)
+            if a and b and quartiles(b)[0] <= quartiles(a)[1]:
+                continue
+            bad.append((name, m, old[m], new[m], (new[m] / old[m] - 1) * 100 if old[m] else float("inf")))
+    return bad
+
+
+def measure_startup(runs):
+    # 从 spawn 子进程算起（含解释器启动与 import），各取中位数
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"), "--startup-probe"]
+    times = {}
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, env=env)
+        for line in proc.stdout:
+            key = {"first_frame": "first_frame_ms", "ready": "ready_ms"}.get(line.split(" ", 1)[0])
+            if key:
+                ms = (time.perf_counter() - t0) * 1000.0
+                times.setdefault(key, []).append(ms)
+        proc.wait()
+    return {key: statistics.median(ms) for key, ms in times.items()}, times
+
+
+def run_scenarios(names, ticks, repeat):
+    print(f"\n{'scenario':16s} {'update µs':>10s} {'ticks/s':>10s} {'draw ms':>9s} {'gc/1k':>7s} {'peak KB':>8s}")
+    results, samples = {}, {}
+    for name in names:
+        r, samples[name] = measure(SCENARIOS[name], ticks, repeat)
+        results[name] = r
+        print(f"{name:16s} {r['update_us']:10.1f} {1e6 / r['update_us']:10,.0f} {r['draw_ms']:9.3f} "
+              f"{r['gc_per_1k']:7.1f} {r['peak_kb']:8.1f}")
+    return results, samples
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--frames", type=int, default=300, help="frames per micro case")
+    ap.add_argument("--ticks", type=int, default=600, help="ticks per scenario run")
+    ap.add_argument("--repeat", type=int, default=MIN_REPEAT, help="scenario runs; timings are the median")
+    ap.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="default: all")
+    ap.add_argument("--skip-micro", action="store_true")
+    ap.add_argument("--startup", type=int, default=0, metavar="N", help="also time N cold starts of main.py")
+    ap.add_argument("--save", metavar="JSON", help="write scenario results as a baseline")
+    ap.add_argument("--compare", metavar="JSON", help="baseline to compare against")
+    ap.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = ap.parse_args()
+    if (args.save or args.compare) and (args.repeat < MIN_REPEAT or 0 < args.startup < MIN_REPEAT):
+        ap.error(f"--save/--compare need --repeat (and --startup) >= {MIN_REPEAT}: fewer runs are noise, not a baseline")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        meta = baseline.get("meta", {})
+        if meta.get("timing") != "median" or meta.get("repeat", 0) < MIN_REPEAT:
+            ap.error(f"{args.compare}: not a median-of-{MIN_REPEAT}+ baseline "
+                     f"(repeat {meta.get('repeat')}); record it again with --save")
+    main.init_display()
+
+    if not args.skip_micro:
+        print(f"{'case':44s} {'before ms':>10s} {'after ms':>10s} {'speedup':>8s}")
+        for name, before, after in (bench_sky(args.frames) + bench_entities(args.frames) + bench_hud(args.frames)
+                                  + bench_parallax(args.frames) + bench_particles(args.frames)):
+            print(f"{name:44s} {before:10.3f} {after:10.3f} {before / max(after, 1e-9):7.1f}x")
+
+    results, samples = run_scenarios(args.scenario or list(SCENARIOS), args.ticks, args.repeat)
+    if args.startup:
+        r, samples["startup"] = measure_startup(args.startup)
+        results["startup"] = r
+        print(f"\n{'startup':16s} first frame {r['first_frame_ms']:.0f} ms   ready {r['ready_ms']:.0f} ms")
+    if args.save:
+        meta = {"python": platform.python_version(), "pygame": pygame.version.ver,
+                "platform": platform.platform(), "ticks": args.ticks, "repeat": args.repeat, "timing": "median"}
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results, "samples": samples}, f, indent=2)
+        print(f"\nbaseline written: {args.save}")
+    if args.compare:
+        speed = drift(baseline, samples)
+        if speed is not None and abs(speed) > args.threshold / 2:
+            # 整台机器快慢变了（别的进程、降频）：这时的百分比说明不了代码，宁可不下结论
+            print(f"\ninconclusive: the reference loop is {speed:+.1f}% vs {args.compare}; "
+                  f"the machine is not running at baseline speed, rerun when it is idle")
+            sys.exit(3)
+        bad = compare(baseline, results, samples, args.threshold)
+        for name, m, old, new, pct in bad:
+            print(f"REGRESSION {name}/{m}: {old:.3f} -> {new:.3f} ({pct:+.1f}%)")
+        if bad:
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.threshold:g}% vs {args.compare}")
+
+
+if __name__ == "__main__":
+    run()
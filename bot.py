@@ -0,0 +1,336 @@
+"""Autoplay bot for soak tests: plans jumps by searching the real Rabbit physics.
+
+    python bot.py                                  # 5 局，每局打到 10000 分或死掉，打印分数和计数器
+    python bot.py --runs 20 --target 20000 --seed 7
+    python bot.py --chunks                         # 分段出怪
+                                                   # 有传送门出现过、却一局都没进去的场景：退出码 1
+    python sim.py --policy bot                     # 同一个策略放进 sim
+
+Planner is a sim policy: (game, tick) -> actions. The actions go through
+Game.press_jump / release_jump / use_special, i.e. Rabbit.start_jump,
+set_jump_hold, release_jump and destroy_front_obstacle, exactly like
+keys. Each plan is a depth-first search over per-tick choices (wait,
+press, release) for up to `horizon` ticks. The default horizon is the
+longest air time in reach.table("any"). The world is taken from Game
+directly: obstacle rects, their per-tick scroll from the predicted
+score, fox bobbing from time_ms, super and i-frames.
+
+When a portal is in view the search first asks for a safe plan that
+also runs into it, so a soak run visits every scene instead of
+hopping over portals by luck; if none exists it falls back to any
+safe plan.
+
+Two memo tables keep it cheap:
+
+    transitions   (rabbit state, action) -> next state, from stepping a
+                  real Rabbit; it is kept across plans because arcs
+                  from the ground repeat all game
+    outcomes      (tick, rabbit state, portal yet?) -> safe?, per plan
+
+The bot replans when the plan runs out, when the rabbit is not where
+the plan said it would be (revive, wings, super), when an obstacle or
+portal appears or vanishes, and every REPLAN ticks. If nothing
+survives, it fires a special when it has charges.
+"""
+import argparse, time
+
+import main, reach, sim
+
+PLAYER_X = 180                   # 与 Game.reset 里 Rabbit 的 x 一致
+MARGIN = 2                       # 障碍左右各放宽几 px（预测速度忽略了胡萝卜加分）
+REPLAN = 12                      # 最多隔几步重新规划一次
+NODE_BUDGET = 40000              # 一次规划最多展开多少个结点
+PORTAL_BUDGET = 4000             # 先找“进传送门”的规划时的结点上限，找不到就退回普通规划
+MEMO_MAX = 200000                # 状态转移表的上限，超了清空
+
+DOWN, UP, SPECIAL = sim.JUMP_DOWN, sim.JUMP_UP, sim.SPECIAL
+
+
+def _capture(p, held):
+    return (p.y, p.vy, p.on_ground, p.jump_count, p.jump_holding, p.jump_hold_time, p.jump_cut_applied,
+            p.has_wings, p.wing_score_left, p.super_active, p.super_timer, p.w, p.h, p.iframe_ms, held)
+
+
+def _load(r, s):
+    (r.y, r.vy, r.on_ground, r.jump_count, r.jump_holding, r.jump_hold_time, r.jump_cut_applied,
+     r.has_wings, r.wing_score_left, r.super_active, r.super_timer, r.w, r.h, r.iframe_ms, _) = s
+    r.scale = main.SUPER_SCALE if r.super_active else 1.0
+
+
+class Budget(Exception):
+    pass
+
+
+class Planner:
+    def __init__(self, horizon=None):
+        self.horizon = horizon or reach.table("any").air
+        self.rabbit = main.Rabbit(PLAYER_X, main.GROUND_Y)
+        self.gain = main.STEP_MS * 0.035   # Game.update 每步的得分（建时取，跟着 --set FPS 走）
+        self.memo = {}
+        self.plan = []
+        self.expect = None
+        self.world_key = None
+        self.since = 0
+        self.held = False
+        self.stats = {"plans": 0, "nodes": 0, "hits": 0, "misses": 0, "plan_ms": 0.0, "max_plan_ms": 0.0,
+                      "specials": 0, "stuck": 0, "budget": 0, "portal": 0}
+
+    # ---------- physics ----------
+    def step(self, s, action):
+        key = (s, action)
+        nxt = self.memo.get(key)
+        if nxt is not None:
+            self.stats["hits"] += 1
+            return nxt
+        self.stats["misses"] += 1
+        if len(self.memo) >= MEMO_MAX:
+            self.memo.clear()
+        r = self.rabbit
+        _load(r, s)
+        held = s[-1]
+        # 与 Game.press_jump / release_jump 的调用顺序一致
+        if action == DOWN:
+            r.start_jump()
+            held = True
+            r.set_jump_hold(True)
+        elif action == UP:
+            held = False
+            r.release_jump()
+            r.set_jump_hold(False)
+        r.update_physics(main.STEP_MS, self.gain, held)
+        nxt = self.memo[key] = _capture(r, held)
+        return nxt
+
+    # ---------- world ----------
+    def snapshot(self, game):
+        # 视野内每步的累计卷动量和时间；只留视野内会扫过兔子的障碍。
+        # Game.update 先加分再算速度，所以第 t 步的卷动量用的是 t 步后的分数
+        n = self.horizon
+        shift, t_ms, score, total = [0], [game.time_ms], game.score, 0
+        for _ in range(n):
+            score += self.gain
+            speed = main.BASE_SPEED if score < main.RAMP_START_SCORE else \
+                main.BASE_SPEED + (score - main.RAMP_START_SCORE) * main.RAMP_SLOPE
+            total += int(round(speed))
+            shift.append(total)
+            t_ms.append(t_ms[-1] + main.STEP_MS)
+        right = PLAYER_X + main.RABBIT_W * 2
+        obs = []
+        for o in game.obstacles:
+            r = o.rect
+            if r.right + MARGIN >= PLAYER_X and r.x - total - MARGIN <= right:
+                obs.append((r.x - MARGIN, r.w + 2 * MARGIN, r.h, o.kind == "fox", o.phase, r.y))
+        # 传送门反过来收窄 MARGIN：要确实撞上才算
+        portals = [(r.x + MARGIN, r.w - 2 * MARGIN, r.y, r.h) for r in (p.rect for p in game.portals)
+                   if r.right - MARGIN > PLAYER_X and r.x - total + MARGIN <= right]
+        self.shift, self.t_ms, self.obs, self.portals = shift, t_ms, obs, portals
+        self.portal_y = min(portals)[2] + min(portals)[3] / 2 if portals else None   # 最近那扇门的中线
+
+    def hits(self, t, s):
+        if s[9] or s[13] > 0:                          # super 无敌；i-frames 还没耗完
+            return False
+        y, w, h = int(s[0]), s[11], s[12]
+        x0, x1 = PLAYER_X, PLAYER_X + w
+        shift = self.shift[t]
+        for ox, ow, oh, fox, phase, oy in self.obs:
+            ox -= shift
+            if ox >= x1 or ox + ow <= x0:
+                continue
+            if fox:
+                oy = main.GROUND_Y - oh + int(3 * main.math.sin(self.t_ms[t] * 0.02 + phase))
+            if y < oy + oh and oy < y + h:
+                return True
+        return False
+
+    def enters(self, t, s):
+        y, h = int(s[0]), s[12]
+        x0, x1 = PLAYER_X, PLAYER_X + s[11]
+        for ox, ow, oy, oh in self.portals:
+            ox -= self.shift[t]
+            if ox < x1 and x0 < ox + ow and y < oy + oh and oy < y + h:
+                return True
+        return False
+
+    # ---------- search ----------
+    def choices(self, s, entered=True):
+        # 先试“不动”：能晚跳就晚跳，能按住就按住。
+        # 找传送门时往门的高度去：在门上方先松开，在下方先按
+        if s[-1]:
+            return (UP, None) if not entered and s[0] + s[12] / 2 < self.portal_y else (None, UP)
+        if s[7] or s[3] < main.MAX_JUMPS:
+            return (DOWN, None) if not entered and s[0] + s[12] / 2 > self.portal_y else (None, DOWN)
+        return (None,)
+
+    def safe(self, t, s, entered=True):
+        # 第 t 步后的状态 s 能否撑到视野尽头（entered=False：途中还得进传送门）；
+        # 结果记在 seen 里（False 或选中的动作）
+        key = (t, s, entered)
+        got = self.seen.get(key, 0)
+        if got != 0:
+            return got is not False
+        self.nodes += 1
+        if self.nodes > self.budget:
+            raise Budget
+        if t and self.hits(t, s):
+            self.seen[key] = False
+            return False
+        entered = entered or (t > 0 and self.enters(t, s))
+        if t == self.horizon:
+            self.seen[key] = None if entered else False
+            return entered
+        for a in self.choices(s, entered):
+            if self.safe(t + 1, self.step(s, a), entered):
+                self.seen[key] = a
+                return True
+        self.seen[key] = False
+        return False
+
+    def search(self, s, entered, budget):
+        # 返回 horizon 步的动作表，找不到（或结点用完）为 None；只有普通规划用完预算才记进 budget
+        self.seen, self.nodes, self.budget = {}, 0, budget
+        try:
+            ok = self.safe(0, s, entered)
+        except Budget:
+            if entered:
+                self.stats["budget"] += 1
+            ok = False
+        self.stats["nodes"] += self.nodes
+        if not ok:
+            return None
+        plan, t = [], 0
+        while t < self.horizon:
+            a = self.seen[(t, s, entered)]
+            entered = entered or (t > 0 and self.enters(t, s))
+            plan.append(a)
+            s = self.step(s, a)
+            t += 1
+        return plan
+
+    def replan(self, game, s):
+        t0 = time.perf_counter()
+        self.snapshot(game)
+        plan = self.search(s, False, PORTAL_BUDGET) if self.portals else None
+        if plan is not None:
+            self.stats["portal"] += 1
+        else:
+            plan = self.search(s, True, NODE_BUDGET)
+        ms = (time.perf_counter() - t0) * 1000.0
+        st = self.stats
+        st["plans"] += 1
+        st["plan_ms"] += ms
+        st["max_plan_ms"] = max(st["max_plan_ms"], ms)
+        self.seen = None
+        return plan is not None, plan or []
+
+    def world(self, game):
+        # 障碍随 distance 一起平移：数量或“最右沿 + distance”变了就是出了新障碍/少了一个
+        return len(game.obstacles.items), game.obstacles.rightmost() + game.distance, len(game.portals.items)
+
+    def __call__(self, game, tick):
+        if game.gameover:
+            return ()
+        if game.reviving:
+            # 倒计时里按键无效；松开键，等复活后重新规划
+            self.plan, self.expect = [], None
+            if self.held:
+                self.held = False
+                return (UP,)
+            return ()
+        s = _capture(game.player, self.held)
+        world = self.world(game)
+        self.since += 1
+        if not self.plan or s != self.expect or world != self.world_key or self.since >= REPLAN:
+            ok, self.plan = self.replan(game, s)
+            self.world_key, self.since = world, 0
+            if not ok:
+                self.expect = None
+                if game.special_charges > 0:
+                    self.stats["specials"] += 1
+                    return (SPECIAL,)
+                self.stats["stuck"] += 1
+                return ()
+        a = self.plan.pop(0)
+        self.expect = self.step(s, a)
+        if a is None:
+            return ()
+        self.held = a == DOWN
+        return (a,)
+
+
+def soak(seed, target, level=None, max_ticks=None):
+    # 打到 target 分或死掉为止；返回 sim.simulate 的结果加上规划计数器。
+    # offered：出现过的传送门通往的场景；missed：出现了却没进去的
+    bot = Planner()
+    max_ticks = max_ticks or int((target / bot.gain) * 1.2) + 10000
+    scenes, offered = set(), set()
+    seen = {"wings": 0, "super": 0}
+    last = [False, False]
+
+    def policy(game, tick):
+        scenes.add(game.scene)
+        offered.update(p.kind for p in game.portals)
+        p = game.player
+        seen["wings"] += p.has_wings and not last[0]
+        seen["super"] += p.super_active and not last[1]
+        last[:] = p.has_wings, p.super_active
+        return bot(game, tick)
+
+    def done(game):
+        scenes.add(game.scene)
+        return game.score >= target
+
+    r = sim.simulate(seed, policy, max_ticks=max_ticks, level=level, until=done)
+    r["reached"] = r["score"] >= target
+    r["scenes"] = sorted(scenes)
+    r["offered"] = sorted(offered)
+    r["missed"] = sorted(offered - scenes)
+    r.update(seen)
+    r["stats"] = bot.stats
+    return r
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--target", type=int, default=10000, help="stop a run once it reaches this score")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE")
+    ap.add_argument("--chunks", action="store_true", help="spawn from validated chunk segments")
+    args = ap.parse_args()
+
+    sim.apply(sim.parse_set(args.set))
+    level = None
+    if args.chunks:
+        import chunks
+        level = chunks.ChunkStream()
+
+    total_ticks, t0, reached = 0, time.perf_counter(), 0
+    scenes, offered = set(), set()
+    for i in range(args.runs):
+        r = soak(args.seed + i, args.target, level)
+        st = r["stats"]
+        total_ticks += r["ticks"]
+        reached += r["reached"]
+        scenes.update(r["scenes"])
+        offered.update(r["offered"])
+        memo = st["hits"] + st["misses"]
+        print(f"seed {r['seed']:4d}  score {r['score']:6d}  {'reached' if r['reached'] else 'died   '}  "
+              f"scenes {','.join(r['scenes']):17s}  missed {','.join(r['missed']) or '-':11s}  wings {r['wings']:2d}  super {r['super']:2d}  "
+              f"revive {'used' if r['revive_used'] else '-   '}  "
+              f"ticks {r['ticks']:6d}  {r['tps']:7,.0f} ticks/s  "
+              f"plans {st['plans']:5d}  nodes/plan {st['nodes'] / max(1, st['plans']):6.1f}  "
+              f"memo hit {st['hits'] / max(1, memo):5.1%}  plan ms avg {st['plan_ms'] / max(1, st['plans']):.2f} "
+              f"max {st['max_plan_ms']:.1f}  portal plans {st['portal']}  specials {st['specials']}  stuck {st['stuck']}  budget {st['budget']}")
+    elapsed = time.perf_counter() - t0
+    print(f"reached {args.target}: {reached}/{args.runs}   {total_ticks / elapsed:,.0f} ticks/s "
+          f"({total_ticks * main.STEP_MS / 1000 / elapsed:,.0f}x realtime)")
+    # 覆盖：传送门出现过、却一局都没进去的场景算失败（目标分太低、门都没刷出来的不算）
+    never = sorted(offered - scenes)
+    if never:
+        raise SystemExit(f"scenes never reached: {', '.join(never)}")
+    print(f"scenes reached: {', '.join(sorted(scenes))}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,445 @@
+"""Chunk-based level generation: validated world segments streamed into Game.
+
+    python main.py --chunks                       # 桌面版改用分段出怪
+    python sim.py --chunks --runs 200             # 无头对照（同样的 AutoJumper）
+    python chunks.py --tiers 0-12 --size 48       # 预生成段库并统计
+    python chunks.py --set JUMP_V0=-11 --set ROCK_H_MAX=150   # 调参后看有多少候选被拒
+
+Instead of spawn timers, the world ahead of the rabbit is laid out in
+segments: a few obstacles plus carrot rows, positioned in pixels and
+stored as compact array("h") records. Segments are generated per
+difficulty tier (every TIER_SCORE points) and each one is checked once
+against the real Rabbit jump arcs from reach.py (single jumps with every
+hold length, double jumps at every second-press tick) at every integer
+scroll speed the tier can reach. Segments that cannot be cleared are
+thrown away at generation time, so nothing impossible ever reaches the
+game and the per-tick path only pops ready-made entities. If no
+candidate passes within MAX_CANDIDATES tries (e.g. --set values that
+make the jumps too short), the segment falls back to a single smallest
+rock, and if even that cannot be cleared generation stops with a
+ValueError naming the tier and speed.
+
+Higher tiers cluster obstacles more often and allow taller rocks inside
+a cluster, so some candidates really are impossible and get rejected
+(python chunks.py prints the acceptance rate per tier).
+
+Tiers are built in small steps (one candidate at one speed, a few ms),
+only up to the tier in play + 1: by a worker thread on desktop and on
+idle frames within a time budget in the browser. App builds tier 0
+during the splash screen. The game's stream never builds on the frame
+thread: if the tier in play is not ready yet, stream() returns False
+and Game spawns from its timers until it is. Headless callers (sim.py,
+bot.py) use a blocking stream that builds the tier on the spot.
+
+A tier's library depends only on (seed, tier) and the tuning constants,
+never on which thread built it or when, so a blocking stream stays
+reproducible from the game's seed: the segment order comes from the
+game's own sim stream. Libraries are shared per (seed, size, constants),
+so --set never reuses one built for other physics.
+"""
+import argparse, math, random, threading, time
+from array import array
+from collections import deque
+
+import main, reach
+
+TIER_SCORE = 1000                # 每 1000 分一档难度
+MAX_TIER = 30
+LIB_SIZE = 48                    # 每档多少段
+MAX_CANDIDATES = 200             # 一段最多抽几个候选；都不行就用兜底段（调参调坏时不会卡死）
+SEG_OBSTACLES = (3, 6)
+CLUSTER_P = 0.1                  # 障碍后紧跟一块石头的概率（第 0 档），每档再加 CLUSTER_P_TIER，最多 0.5
+CLUSTER_P_TIER = 0.04
+CLUSTER_MAX = 2                  # 一簇最多再跟几块
+CLUSTER_GAP = (60, 520)
+CLUSTER_H = (1.5, 0.1, 2.5)      # 簇里石头最高 ROCK_H_MAX × min(2.5, 1.5 + 0.1 × 档)；跳不过的整段由验证扔掉
+SPAWN_X = main.WIDTH + 40        # 实体进场的屏幕 x（同计时出怪）
+LOOKAHEAD = main.WIDTH * 2       # 已排好的段至少领先屏幕右沿这么远
+FOX_BOB = 3                      # 狐狸上下摆动幅度
+
+ROCK, FOX, CARROT = range(3)
+FIELDS = 5                       # 每条记录：dx, code, y, w, h
+
+def _intersect(a, b):
+    out = []
+    for lo1, hi1 in a:
+        for lo2, hi2 in b:
+            lo, hi = max(lo1, lo2), min(hi1, hi2)
+            if lo <= hi:
+                out.append((lo, hi))
+    return out
+
+
+def windows(obstacles, v):
+    # 障碍 (dx, w, H) → 与兔子横向重叠的步 [lo, hi]。段原点开局时贴着兔子右沿；
+    # 第 t 步（从 0 数）兔子先更新高度，障碍再左移，此时已移动 t+1 次，然后判碰撞
+    out = []
+    for dx, w, height in obstacles:
+        lo = dx // v
+        hi = -(-(dx + w + main.RABBIT_W) // v) - 2
+        out.append((lo, hi, height))
+    return out
+
+
+def landing_tick(obstacles, v, max_group=3):
+    """Earliest tick the rabbit is back on the ground after clearing every
+    obstacle at scroll speed v (px/tick), or None if some obstacle cannot
+    be cleared. best[i] = first tick a new jump may start after clearing
+    the first i obstacles; one arc may clear up to max_group in a row."""
+    A = reach.table("any")
+    win = windows(obstacles, v)
+    n = len(win)
+    best = [None] * (n + 1)
+    best[0] = 0
+    for i in range(n):
+        ready = best[i]
+        if ready is None:
+            continue
+        for j in range(i, min(n, i + max_group)):
+            for a in range(len(A.arcs)):
+                # 每个障碍要求起跳步 t0 落在若干区间内：[hi - e, lo - s]
+                ok = [(ready, win[i][0])]
+                for lo, hi, height in win[i:j + 1]:
+                    ok = _intersect(ok, [(hi - e, lo - s) for s, e in A.spans(a, height)])
+                    if not ok:
+                        break
+                if ok:
+                    land = min(lo for lo, _ in ok) + len(A.arcs[a])
+                    if best[j + 1] is None or land < best[j + 1]:
+                        best[j + 1] = land
+    return best[n]
+
+
+# ---------- segments ----------
+class Segment:
+    __slots__ = ("length", "data")
+
+    def __init__(self, length, data):
+        self.length = length
+        self.data = data
+
+    def entities(self):
+        d = self.data
+        for k in range(0, len(d), FIELDS):
+            yield d[k], d[k + 1], d[k + 2], d[k + 3], d[k + 4]
+
+
+def tier_scores(tier):
+    return tier * TIER_SCORE, (tier + 1) * TIER_SCORE
+
+
+def tier_speeds(tier):
+    # 这一档里可能出现的每步位移（Obstacle.update 用 int(round(speed))），再多验一档防跨档
+    lo, hi = tier_scores(tier)
+    s_lo, s_hi = (int(round(_speed_at(s))) for s in (lo, hi))
+    return list(range(s_lo, s_hi + 2))
+
+
+def _speed_at(score):
+    if score < main.RAMP_START_SCORE:
+        return main.BASE_SPEED
+    return main.BASE_SPEED + (score - main.RAMP_START_SCORE) * main.RAMP_SLOPE
+
+
+def _obstacle(rng):
+    # 与 Game.spawn_obstacle 同样的种类/尺寸分布
+    if rng.random() < 0.64:
+        return ROCK, rng.randint(main.ROCK_W_MIN, main.ROCK_W_MAX), rng.randint(main.ROCK_H_MIN, main.ROCK_H_MAX)
+    return FOX, main.FOX_W, main.FOX_H
+
+
+def _layout(rng, tier):
+    # 候选段：障碍间距按计时出怪的毫秒间隔换算成像素；档越高越常紧跟一簇石头、簇里的石头越高。
+    # 这里不做任何可达性判断，跳不过的候选由 TierBuild 的验证整段扔掉
+    lo, hi = tier_scores(tier)
+    score = rng.uniform(lo, hi)
+    px_per_ms = max(1, int(round(_speed_at(score)))) / main.STEP_MS
+    cluster_p = min(0.5, CLUSTER_P + CLUSTER_P_TIER * tier)
+    base, per_tier, cap = CLUSTER_H
+    cluster_h = max(main.ROCK_H_MIN, int(main.ROCK_H_MAX * min(cap, base + per_tier * tier)))
+    obstacles, x = [], 0
+    for _ in range(rng.randint(*SEG_OBSTACLES)):
+        gap = max(1000, rng.randint(main.OBST_MIN_GAP, main.OBST_MAX_GAP) - int(score * main.OBST_GAP_SCORE_FACTOR))
+        x += int(gap * px_per_ms)
+        code, w, h = _obstacle(rng)
+        obstacles.append((x, code, w, h))
+        for _ in range(CLUSTER_MAX):
+            if rng.random() >= cluster_p:
+                break
+            x += w + rng.randint(*CLUSTER_GAP)
+            code, w, h = ROCK, rng.randint(main.ROCK_W_MIN, main.ROCK_W_MAX), rng.randint(main.ROCK_H_MIN, cluster_h)
+            obstacles.append((x, code, w, h))
+        x += w
+    return obstacles, px_per_ms
+
+
+def _carrots(rng, obstacles, length, px_per_ms):
+    # 胡萝卜排：每 1100~1900ms 一排，与障碍重叠就挪到它后面 140px（离线一次遍历）
+    out, x = [], int(rng.randint(1100, 1900) * px_per_ms)
+    while True:
+        n = rng.randint(main.CARROT_ROW_MIN, main.CARROT_ROW_MAX)
+        y = rng.choice(main.CARROT_LOW_CHOICES)
+        for dx, _, w, _ in obstacles:
+            if dx - 40 < x + n * 34 and x < dx + w:
+                x = dx + w + 140
+        if x + n * 34 > length:
+            return out
+        out.extend((x + i * 34, y + rng.randint(-8, 8)) for i in range(n))
+        x += int(rng.randint(1100, 1900) * px_per_ms)
+
+
+def _segment(rng, obstacles, px_per_ms, lands, speeds):
+    # 验证通过的障碍 → 段；段太长（坐标放不进 int16）返回 None
+    last = obstacles[-1]
+    # 段尾要够兔子落地，下一段按“开头可以立即起跳”验证
+    length = max(last[0] + last[2] + 1, max(t * v for t, v in zip(lands, speeds)))
+    if length > 32000:
+        return None
+    data = array("h")
+    items = [(dx, code, main.GROUND_Y - h, w, h) for dx, code, w, h in obstacles]
+    if rng is not None:
+        items += [(dx, CARROT, y, 0, 0) for dx, y in _carrots(rng, obstacles, length, px_per_ms)]
+    for item in sorted(items):
+        data.extend(item)
+    return Segment(length, data)
+
+
+def fallback_segment(tier):
+    # 兜底段：一块最小的石头；连它都跳不过说明常量把跳跃调坏了
+    speeds = tier_speeds(tier)
+    obstacles = [(main.WIDTH // 2, ROCK, main.ROCK_W_MIN, main.ROCK_H_MIN)]
+    lands = []
+    for v in speeds:
+        land = landing_tick([(main.WIDTH // 2, main.ROCK_W_MIN, main.ROCK_H_MIN)], v)
+        if land is None:
+            raise ValueError(f"chunks tier {tier}: a {main.ROCK_W_MIN}x{main.ROCK_H_MIN} rock cannot be "
+                             f"jumped at {v} px/tick; check the jump and obstacle constants")
+        lands.append(land)
+    return _segment(None, obstacles, 0, lands, speeds)
+
+
+class TierBuild:
+    # 一档的增量构建。work() 每次只验证当前候选在一个速度下能不能过（几 ms），
+    # 所以能按时间预算切开；抽候选的顺序和一口气建完一样，段库只由 (seed, tier) 决定
+    def __init__(self, seed, tier):
+        self.rng = random.Random(f"{seed}/chunks/{tier}")
+        self.tier, self.speeds = tier, tier_speeds(tier)
+        self.segs = []
+        self.cand = None             # (obstacles, px_per_ms, spec, lands)
+        self.tries = 0
+
+    def work(self, stats):
+        if self.cand is None:
+            obstacles, px_per_ms = _layout(self.rng, self.tier)
+            spec = [(dx, w, h + (FOX_BOB if code == FOX else 0)) for dx, code, w, h in obstacles]
+            self.cand = (obstacles, px_per_ms, spec, [])
+            self.tries += 1
+            stats["candidates"] = stats.get("candidates", 0) + 1
+        obstacles, px_per_ms, spec, lands = self.cand
+        land = landing_tick(spec, self.speeds[len(lands)])
+        if land is not None:
+            lands.append(land)
+            if len(lands) < len(self.speeds):
+                return
+            seg = _segment(self.rng, obstacles, px_per_ms, lands, self.speeds)
+        else:
+            seg = None
+            stats["rejected"] = stats.get("rejected", 0) + 1
+        self.cand = None
+        if seg is None and self.tries >= MAX_CANDIDATES:
+            seg = fallback_segment(self.tier)
+            stats["fallbacks"] = stats.get("fallbacks", 0) + 1
+        if seg is not None:
+            self.segs.append(seg)
+            self.tries = 0
+
+
+# 段库依赖的常量：跳跃物理（reach._TUNING）+ 速度/障碍/胡萝卜的分布
+_LAYOUT = ("BASE_SPEED", "RAMP_START_SCORE", "RAMP_SLOPE", "OBST_MIN_GAP", "OBST_MAX_GAP", "OBST_GAP_SCORE_FACTOR",
+           "ROCK_W_MIN", "ROCK_W_MAX", "ROCK_H_MIN", "ROCK_H_MAX", "FOX_W", "FOX_H", "CARROT_ROW_MIN", "CARROT_ROW_MAX")
+
+
+def constants_key():
+    return tuple(getattr(main, name) for name in reach._TUNING + _LAYOUT)
+
+
+class ChunkLibrary:
+    # 每档 size 段；第 t 档只由 Random(f"{seed}/chunks/{t}") 和调参常量决定。
+    # step() 按时间预算往前建到 upto 档（后台线程或空闲帧调用）；
+    # get() 缺哪档时 block=True 当场补齐，block=False 返回 None（交给后台去建）
+    _shared = {}
+
+    def __init__(self, seed=0, size=LIB_SIZE):
+        self.seed, self.size = seed, size
+        self.tiers = {}
+        self.building = {}
+        self.upto = 1                # 往前建到第几档：ChunkStream 推到 当前档 + 1
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.worker = None
+
+    @classmethod
+    def shared(cls, seed=0, size=LIB_SIZE):
+        # 按 (seed, size, 当前调参常量) 共用；--set/sweep 改了常量就换一个库
+        key = (seed, size) + constants_key()
+        lib = cls._shared.get(key)
+        if lib is None:
+            lib = cls._shared[key] = cls(seed, size)
+        return lib
+
+    def want(self, tier):
+        self.upto = max(self.upto, min(tier, MAX_TIER))
+
+    def ready(self, tier):
+        return tier in self.tiers
+
+    def _step_tier(self, tier):
+        b = self.building.get(tier)
+        if b is None:
+            b = self.building[tier] = TierBuild(self.seed, tier)
+        b.work(self.stats)
+        if len(b.segs) >= self.size:
+            self.tiers[tier] = b.segs
+            del self.building[tier]
+
+    def step(self, budget_ms=0.0, upto=None):
+        # 往最低的未完成档补，直到用完 budget_ms（至少做一小步）。返回 False 表示 0..upto 都已建好
+        upto = self.upto if upto is None else upto
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        with self.lock:
+            while True:
+                tier = next((t for t in range(upto + 1) if t not in self.tiers), None)
+                if tier is None:
+                    return False
+                self._step_tier(tier)
+                if time.perf_counter() >= deadline:
+                    return True
+
+    def get(self, tier, block=True):
+        segs = self.tiers.get(tier)
+        if segs is None:
+            if not block:
+                self.want(tier)
+                return None
+            with self.lock:
+                while tier not in self.tiers:
+                    self._step_tier(tier)
+                segs = self.tiers[tier]
+        return segs
+
+    def start_worker(self):
+        # 守护线程往前建到 upto 档；每小步之间让出 GIL，帧线程不被饿着；建完了就等档位往前推
+        if self.worker is None:
+            def run():
+                while True:
+                    time.sleep(0.002 if self.step() else 0.05)
+            self.worker = threading.Thread(target=run, name="chunks", daemon=True)
+            self.worker.start()
+        return self.worker
+
+
+class ChunkStream:
+    # 挂在 Game.level 上：按滚动距离把排好的段里的实体放进各 Lane。
+    # 世界坐标 wx 从开局起累计；屏幕 x = wx - dist。
+    # block=False（游戏里）：当前档还没建好时不在帧线程上现建，stream() 返回 False 让 Game 先用计时出怪
+    def __init__(self, library=None, block=True):
+        self.library = library or ChunkLibrary.shared()
+        self.block = block
+        self.reset()
+
+    def reset(self):
+        self.dist = 0
+        self.end = main.WIDTH       # 下一段原点（世界坐标）
+        self.pending = deque()       # (wx, code, y, w, h)，按 wx 有序
+
+    def tier(self, game):
+        return min(int(game.score // TIER_SCORE), MAX_TIER)
+
+    def queue(self, game):
+        tier = self.tier(game)
+        self.library.want(tier + 1)
+        segs = self.library.get(tier, self.block)
+        if segs is None:
+            return False
+        seg = segs[game.rng.randrange(len(segs))]
+        # 退回过计时出怪时 end 落在后面：新段从进场点开始，不在屏幕里凭空出现
+        base = self.end = max(self.end, self.dist + SPAWN_X)
+        for dx, code, y, w, h in seg.entities():
+            self.pending.append((base + dx, code, y, w, h))
+        self.end += seg.length
+        return True
+
+    def stream(self, game, speed):
+        # 返回 False：排好的都放完了而这一档还没建好，这一步由 Game 的计时出怪接手
+        self.dist += int(round(speed))
+        while self.end - self.dist < LOOKAHEAD:
+            if not self.queue(game):
+                if not self.pending and self.end - self.dist <= SPAWN_X:
+                    return False
+                break
+        pending = self.pending
+        while pending and pending[0][0] - self.dist <= SPAWN_X:
+            wx, code, y, w, h = pending.popleft()
+            x = wx - self.dist
+            if code == CARROT:
+                game.carrots.add(game.carrots.new(x, y))
+            else:
+                kind = "rock" if code == ROCK else "fox"
+                game.obstacles.add(game.obstacles.new(kind, x, y, w, h, game.rng.random() * math.tau))
+        return True
+
+    def clear_x(self, game, rect, margin):
+        # 翅膀/传送门：屏上和待进场的障碍按 x 有序，一次遍历找到第一个放得下的位置
+        x = rect.x
+        obstacles = [(o.rect.x, o.rect.y, o.rect.w, o.rect.h) for o in game.obstacles.items]
+        obstacles += [(wx - self.dist, y - FOX_BOB, w, h + FOX_BOB)
+                      for wx, code, y, w, h in self.pending if code != CARROT]
+        for ox, oy, w, h in obstacles:
+            if ox + w <= x or oy >= rect.bottom or oy + h <= rect.y:
+                continue
+            if ox >= x + rect.w:
+                break
+            x = ox + w + margin
+        return x
+
+
+def parse_tiers(text):
+    lo, _, hi = text.partition("-")
+    return range(int(lo), int(hi or lo) + 1)
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--tiers", default="0-8", help="e.g. 0-12")
+    ap.add_argument("--size", type=int, default=LIB_SIZE, help="segments per tier")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE")
+    args = ap.parse_args()
+
+    import sim
+    sim.apply(sim.parse_set(args.set))
+
+    lib = ChunkLibrary(args.seed, args.size)
+    t0 = time.perf_counter()
+    arcs = reach.table("any").arcs
+    print(f"{len(arcs)} jump arcs in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    print(f"{'tier':>4s} {'speeds':>8s} {'build ms':>9s} {'accept':>7s} {'obst/seg':>9s} {'len px':>7s} {'bytes':>6s}")
+    for tier in parse_tiers(args.tiers):
+        before = lib.stats.get("candidates", 0)
+        t0 = time.perf_counter()
+        segs = lib.get(tier)
+        ms = (time.perf_counter() - t0) * 1000
+        tried = lib.stats["candidates"] - before
+        obst = sum(code != CARROT for s in segs for _, code, _, _, _ in s.entities())
+        speeds = tier_speeds(tier)
+        print(f"{tier:4d} {f'{speeds[0]}-{speeds[-1]}':>8s} {ms:9.0f} {len(segs) / tried:7.0%} "
+              f"{obst / len(segs):9.1f} {sum(s.length for s in segs) / len(segs):7.0f} "
+              f"{sum(len(s.data) * s.data.itemsize for s in segs):6d}")
+    print(f"{lib.stats.get('rejected', 0)} of {lib.stats.get('candidates', 0)} candidates rejected by validation")
+    if lib.stats.get("fallbacks"):
+        print(f"{lib.stats['fallbacks']} segments fell back to a single rock after {MAX_CANDIDATES} rejected candidates")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,264 @@
+"""Ghost racing: record the rabbit every tick, race the best run's ghost next time.
+
+    python main.py --ghost                  # 破纪录的那局存成 ghost.hrg，之后每局旁边跑一只半透明的兔子
+    python ghost.py ghost.hrg               # 轨迹信息：步数、大小、最远距离
+
+File layout (little endian):
+
+    header  b"HRGH" | u8 version | u64 seed | u16 simulation Hz | u32 score
+    ticks   varint(zigzag(dy) << 2 | has_speed << 1 | has_state)
+            [varint(zigzag(d_speed))]                   has_speed: scroll px this tick changed
+            [u8 flags | varint(w) | varint(h)]          has_state: super/wings/size changed
+
+Record k is the rabbit after k Game.update steps: y rounded to whole
+pixels, the world distance scrolled so far (Game.distance, stored as
+the per-tick speed, which changes rarely), and the flags and size.
+Every field is a delta against the previous record, so a tick on the
+ground is one byte. A 20-minute run is about 70 KB.
+
+Ghost.tick() appends to a small buffer that goes to a temp file every
+few KB. At game over the temp file replaces ghost.hrg only if the run
+beat the ghost's score. Playback reads the file a few KB at a time and
+decodes forward one record per live tick, so memory stays flat and no
+run loads its whole track.
+"""
+import argparse, os, struct, sys
+
+import main
+
+GHOST_PATH = "ghost.hrg"
+MAGIC = b"HRGH"
+VERSION = 1
+HEADER = struct.Struct("<4sBQHI")
+CHUNK = 4096
+MAX_RECORD = 32                   # 一条记录最多几字节（解码前保证缓冲里至少有这么多）
+SUPER, WINGS = 1, 2
+GHOST_TINT = (170, 200, 255, 110)  # 乘到兔子精灵上：偏蓝、半透明
+
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data, i):
+    n = shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+
+def _zig(n):
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _unzig(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def _state(p):
+    return (SUPER if p.super_active else 0) | (WINGS if p.has_wings else 0), int(p.w), int(p.h)
+
+
+class TrackWriter:
+    def __init__(self, path, seed, hz=main.FPS):
+        self.f = open(path, "w+b")
+        self.f.write(HEADER.pack(MAGIC, VERSION, seed, hz, 0))
+        self.buf = bytearray()
+        self.y = self.speed = self.dist = 0
+        self.state = None
+        self.count = 0
+
+    def add(self, dist, y, state):
+        speed = dist - self.dist
+        dy = y - self.y
+        head = _zig(dy) << 2 | (speed != self.speed) << 1 | (state != self.state)
+        buf = self.buf
+        _put_varint(buf, head)
+        if speed != self.speed:
+            _put_varint(buf, _zig(speed - self.speed))
+        if state != self.state:
+            buf.append(state[0])
+            _put_varint(buf, state[1])
+            _put_varint(buf, state[2])
+        self.y, self.speed, self.dist, self.state = y, speed, dist, state
+        self.count += 1
+        if len(buf) >= CHUNK:
+            self.f.write(buf)
+            buf.clear()
+
+    def finish(self, score):
+        # 写完剩下的记录，把分数补进文件头
+        self.f.write(self.buf)
+        self.buf.clear()
+        self.f.seek(HEADER.size - 4)
+        self.f.write(struct.pack("<I", max(0, int(score))))
+        self.f.close()
+
+    def close(self):
+        self.f.close()
+
+
+class TrackReader:
+    # 只往前读：seek(k) 解码到第 k 条（k 不会往回走；重开一局就新建一个 reader）
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        head = self.f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            self.f.close()
+            raise ValueError("ghost track too short")
+        magic, version, self.seed, self.hz, self.score = HEADER.unpack(head)
+        if magic != MAGIC or version != VERSION:
+            self.f.close()
+            raise ValueError("not a ghost track")
+        self.buf, self.i = b"", 0
+        self.eof = False
+        self.k = -1
+        self.y = self.speed = self.dist = 0
+        self.state = (0, main.RABBIT_W, main.RABBIT_H)
+        self.prev_y = 0
+
+    def _next(self):
+        if len(self.buf) - self.i < MAX_RECORD and not self.eof:
+            more = self.f.read(CHUNK)
+            self.eof = len(more) < CHUNK
+            self.buf, self.i = self.buf[self.i:] + more, 0
+        if self.i >= len(self.buf):
+            return False
+        buf = self.buf
+        try:
+            head, i = _get_varint(buf, self.i)
+            if head & 2:
+                d, i = _get_varint(buf, i)
+                self.speed += _unzig(d)
+            if head & 1:
+                flags = buf[i]
+                w, i = _get_varint(buf, i + 1)
+                h, i = _get_varint(buf, i)
+                self.state = (flags, w, h)
+        except IndexError:
+            # 文件尾巴被截断（写到一半退出）：就当轨迹到这里为止
+            self.i = len(buf)
+            return False
+        self.i = i
+        self.prev_y = self.y
+        self.y += _unzig(head >> 2)
+        self.dist += self.speed
+        self.k += 1
+        return True
+
+    def seek(self, k):
+        # 返回是否还有第 k 条；轨迹跑完后停在最后一条
+        while self.k < k:
+            if not self._next():
+                return False
+        return True
+
+    def close(self):
+        self.f.close()
+
+
+def _paint_ghost(surf, r, super_active, has_wings, wob):
+    main._paint_rabbit(surf, r, super_active, has_wings, wob)
+    surf.fill(GHOST_TINT, special_flags=main.pygame.BLEND_RGBA_MULT)
+
+
+class Ghost:
+    # App 里一个（--ghost），交给 Game(ghost=...)：reset/tick 由 Game 调，finish/close 由 App 调
+    def __init__(self, path=GHOST_PATH):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.reader = self.writer = None
+
+    def reset(self, game):
+        self.close()
+        if os.path.exists(self.path):
+            try:
+                self.reader = TrackReader(self.path)
+                if self.reader.hz != main.FPS:
+                    self.reader.close()
+                    raise ValueError(f"recorded at {self.reader.hz} Hz, game runs at {main.FPS}")
+            except (OSError, ValueError) as e:
+                self.reader = None
+                print(f"ghost ignored: {e}", file=sys.stderr)
+        try:
+            self.writer = TrackWriter(self.tmp, game.seed)
+        except OSError:
+            self.writer = None
+
+    def tick(self, game):
+        # 每步开始时调用：记下已完成 game.ticks - 1 步后的兔子
+        if self.writer is not None:
+            p = game.player
+            self.writer.add(game.distance, int(round(p.y)), _state(p))
+
+    def finish(self, game):
+        # 结束：比幽灵分高就换成这一局
+        writer, self.writer = self.writer, None
+        if writer is None:
+            return
+        best = self.reader.score if self.reader is not None else -1
+        writer.finish(game.score)
+        if int(game.score) > best and writer.count:
+            if self.reader is not None:
+                self.reader.close()
+                self.reader = None
+            try:
+                os.replace(self.tmp, self.path)
+                return
+            except OSError:
+                pass
+        self._discard()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self._discard()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def _discard(self):
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
+    def draw(self, surf, game, alpha=1.0):
+        r = self.reader
+        if r is None or not r.seek(game.ticks):
+            return []
+        flags, w, h = r.state
+        x = game.player.x + (r.dist - game.distance)
+        if x + w < 0 or x > main.WIDTH:
+            return []
+        y = int(main.lerp(r.prev_y, r.y, alpha))
+        wob = int(4 * main.math.sin(game.time_ms * 0.012))
+        rect = main.pygame.Rect(int(x), y, w, h)
+        return [main.sprites.draw(surf, rect, main.RABBIT_PAD, _paint_ghost, bool(flags & SUPER), bool(flags & WINGS), wob)]
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("paths", nargs="*", default=[GHOST_PATH])
+    args = ap.parse_args()
+    for path in args.paths:
+        r = TrackReader(path)
+        top = 0
+        while r._next():
+            top = min(top, r.y - (main.GROUND_Y - main.RABBIT_H))
+        print(f"{path}: seed {r.seed}  score {r.score}  {r.k + 1} ticks ({(r.k + 1) / r.hz:.0f}s at {r.hz} Hz)  "
+              f"{os.path.getsize(path)} bytes  distance {r.dist} px  highest {-top} px above ground")
+        r.close()
+
+
+if __name__ == "__main__":
+    run()
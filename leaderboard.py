@@ -0,0 +1,290 @@
+"""Shared leaderboard for several kiosks: a tiny asyncio HTTP service plus a client.
+
+    python leaderboard.py --serve                        # 本机起服务（默认 127.0.0.1:8765，leaderboard.db）
+    python main.py --leaderboard http://127.0.0.1:8765   # 每局结束提交，结束画面显示前几名
+    python leaderboard.py                                # 打印榜单
+    python leaderboard.py --submit 5000                  # 模拟一台 kiosk 连续提交，看批次/连接数
+
+The service speaks plain HTTP/1.1 with keep-alive and JSON bodies:
+
+    POST /scores   {"runs": [{"id", "kiosk", "score", "seed", "scene", "ms", "ts"}, ...]}
+    GET  /top?n=10 {"count": N, "top": [[score, kiosk, scene, seed, ts], ...]}
+
+Each run carries a client-made id, and inserts are INSERT OR IGNORE, so
+a batch resent after a timeout is never counted twice.
+
+LeaderboardClient never does I/O on the caller's thread. submit() appends
+to a bounded queue. top() returns the cached page and, once it is older
+than the TTL, asks for a refresh. A background thread flushes the queue
+in batches over one persistent connection, reconnects when the server
+drops it, and backs off while the service is down. The game keeps
+running the same with or without it. Browsers have no threads, so the
+web build does not use the client.
+"""
+import argparse, http.client, json, socket, sqlite3, threading, time, urllib.parse
+from collections import deque
+
+HOST, PORT = "127.0.0.1", 8765
+DB = "leaderboard.db"
+TOP_N = 5                         # 结束画面显示几名
+TTL_S = 30.0                      # 榜单缓存多久算过期
+FLUSH_S = 2.0                     # 没有新局时多久醒一次
+BATCH = 100                       # 一次 POST 最多几局
+MAX_PENDING = 10000               # 服务一直不在时最多攒几局（本地 runs.db 另有全量）
+TIMEOUT_S = 2.0
+MAX_BACKOFF_S = 30.0
+IDLE_S = 60.0                     # 服务端：空闲连接多久后关
+MAX_BODY = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id    TEXT PRIMARY KEY,
+    kiosk TEXT    NOT NULL,
+    score INTEGER NOT NULL,
+    seed  INTEGER NOT NULL,
+    scene TEXT    NOT NULL,
+    ms    INTEGER NOT NULL,
+    ts    REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_score ON scores(score);
+"""
+
+
+# ---------- service ----------
+class Board:
+    # 服务端的库；查询都走索引、很快，所以直接在事件循环里做
+    def __init__(self, path=DB):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.count = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def add(self, runs):
+        rows = [(str(r["id"]), str(r["kiosk"])[:40], int(r["score"]), int(r["seed"]), str(r["scene"])[:16],
+                 int(r["ms"]), float(r["ts"])) for r in runs]
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self.db.total_changes - before
+        self.count += added
+        return added
+
+    def top(self, n):
+        return self.db.execute("SELECT score, kiosk, scene, seed, ts FROM scores ORDER BY score DESC LIMIT ?",
+                               (max(1, min(n, 100)),)).fetchall()
+
+    def route(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        if method == "POST" and url.path == "/scores":
+            return 200, {"added": self.add(json.loads(body)["runs"])}
+        if method == "GET" and url.path == "/top":
+            n = int(urllib.parse.parse_qs(url.query).get("n", [TOP_N])[0])
+            return 200, {"count": self.count, "top": self.top(n)}
+        return 404, {"error": "not found"}
+
+
+async def handle(board, reader, writer):
+    import asyncio
+    try:
+        while True:
+            line = await asyncio.wait_for(reader.readline(), IDLE_S)
+            if not line:
+                break
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = h.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip()
+            size = int(headers.get("content-length", 0))
+            if size > MAX_BODY:
+                status, payload = 413, {"error": "body too large"}
+            else:
+                body = await reader.readexactly(size)
+                try:
+                    status, payload = board.route(method, target, body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, {"error": str(e)}
+            data = json.dumps(payload).encode()
+            writer.write(f"HTTP/1.1 {status} {http.client.responses.get(status, '')}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+            if status == 413 or headers.get("connection", "").lower() == "close":
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, port=PORT, path=DB):
+    import asyncio
+    board = Board(path)
+    server = await asyncio.start_server(lambda r, w: handle(board, r, w), host, port)
+    print(f"leaderboard on http://{host}:{port}  ({board.count} runs in {path})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+# ---------- client ----------
+class LeaderboardClient:
+    # App 里一个（--leaderboard URL）：submit()/top() 只碰内存，网络全在后台线程
+    def __init__(self, url, kiosk=None, ttl=TTL_S, top_n=TOP_N):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname or HOST, parts.port or PORT
+        self.kiosk = kiosk or socket.gethostname()
+        self.ttl, self.top_n = ttl, top_n
+        self.pending = deque()
+        self.page, self.page_at = None, float("-inf")
+        self.want_page = True
+        self.conn = None
+        self.backoff, self.retry_at = 0.0, 0.0
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = None
+        self.stats = {"runs": 0, "batches": 0, "pages": 0, "connects": 0, "errors": 0, "dropped": 0}
+
+    def submit(self, game):
+        if len(self.pending) >= MAX_PENDING:
+            self.stats["dropped"] += 1
+            return
+        self.pending.append({"id": f"{self.kiosk}/{game.seed}/{time.time():.3f}", "kiosk": self.kiosk,
+                             "score": int(game.score), "seed": game.seed, "scene": game.scene,
+                             "ms": int(game.time_ms), "ts": time.time()})
+        self.want_page = True     # 提交后刷新一次，好在榜上看到自己
+        self.wake.set()
+
+    def top(self):
+        # 缓存里的榜单（还没取到/服务不在时为 None）；过期了叫后台去取
+        if time.monotonic() - self.page_at > self.ttl and not self.want_page:
+            self.want_page = True
+            self.wake.set()
+        return self.page
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="leaderboard", daemon=True)
+        self.thread.start()
+
+    def close(self, timeout=1.0):
+        # 退出时最后冲一次；服务不在就算了（本地 runs.db 里都有）
+        self.closed = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _loop(self):
+        while True:
+            self.wake.wait(FLUSH_S)
+            self.wake.clear()
+            if self.closed:
+                self.retry_at = 0.0
+            if time.monotonic() >= self.retry_at:
+                try:
+                    self._flush()
+                    if self.want_page and not self.closed:
+                        self._fetch()
+                    self.backoff = 0.0
+                except (OSError, http.client.HTTPException, ValueError):
+                    self.stats["errors"] += 1
+                    self._drop()
+                    self.backoff = min(MAX_BACKOFF_S, max(0.5, self.backoff * 2))
+                    self.retry_at = time.monotonic() + self.backoff
+            if self.closed:
+                self._drop()
+                return
+
+    def _drop(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _request(self, method, path, body=None):
+        # 复用长连接；服务端关掉了空闲连接时换一条新的重试一次
+        while True:
+            fresh = self.conn is None
+            if fresh:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT_S)
+                self.stats["connects"] += 1
+            try:
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                self.conn.request(method, path, body, headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+            except (ConnectionError, http.client.BadStatusLine):
+                self._drop()
+                if fresh:
+                    raise
+                continue
+            if resp.status != 200:
+                raise ValueError(f"{method} {path}: HTTP {resp.status}")
+            return json.loads(data)
+
+    def _flush(self):
+        while self.pending:
+            batch = [self.pending[i] for i in range(min(BATCH, len(self.pending)))]
+            self._request("POST", "/scores", json.dumps({"runs": batch}).encode())
+            for _ in batch:
+                self.pending.popleft()
+            self.stats["runs"] += len(batch)
+            self.stats["batches"] += 1
+
+    def _fetch(self):
+        page = self._request("GET", f"/top?n={self.top_n}")
+        self.page = tuple((int(score), kiosk) for score, kiosk, _, _, _ in page["top"])
+        self.page_at = time.monotonic()
+        self.want_page = False
+        self.stats["pages"] += 1
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--serve", action="store_true", help="run the service")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--db", default=DB, help="service database (--serve)")
+    ap.add_argument("--url", default=None, help="service to query (default http://HOST:PORT)")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--submit", type=int, default=0, metavar="N", help="submit N fake runs through the client")
+    args = ap.parse_args()
+
+    if args.serve:
+        import asyncio
+        try:
+            asyncio.run(serve(args.host, args.port, args.db))
+        except KeyboardInterrupt:
+            pass
+        return
+    url = args.url or f"http://{args.host}:{args.port}"
+    client = LeaderboardClient(url, top_n=args.top)
+    if args.submit:
+        import random
+        from types import SimpleNamespace
+        rng = random.Random(0)
+        client.start()
+        t0 = time.perf_counter()
+        worst = 0.0
+        for i in range(args.submit):
+            s = time.perf_counter()
+            client.submit(SimpleNamespace(score=int(rng.expovariate(1 / 1500.0)), seed=rng.getrandbits(32),
+                                          scene="grass", time_ms=60000.0))
+            worst = max(worst, time.perf_counter() - s)
+        while client.pending and time.perf_counter() - t0 < 30:
+            time.sleep(0.01)
+        client.close(5.0)
+        print(f"submitted {args.submit} in {time.perf_counter() - t0:.2f}s   "
+              f"slowest submit() {worst * 1e6:.0f} us   {client.stats}")
+    try:
+        page = client._request("GET", f"/top?n={args.top}")
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        raise SystemExit(f"{url}: {e}")
+    print(f"{page['count']} runs")
+    for i, (score, kiosk, scene, seed, ts) in enumerate(page["top"], 1):
+        print(f"  {i:3d}. {score:7d}  {kiosk:16s}  {scene:6s}  seed {seed}  "
+              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(ts))}")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,9 +1,24 @@
-import pygame, sys, random, math, os
+import time
+STARTUP_T0 = time.perf_counter()  # 启动计时起点：放在 import pygame/numpy 之前，重的 import 也算进去
+
+import pygame, sys, random, math, os, bisect
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+np = None                        # 第一次建 ParticleField 时才 import（见 _import_numpy）
+
+if __name__ == "__main__":
+    # python main.py 时本模块叫 __main__：登记成 main，store/ghost/chunks 里的 import main
+    # 拿到的就是正在跑的这一份，不会再载一遍（那样 _best、sprites、text_cache 各有两份）
+    sys.modules.setdefault("main", sys.modules[__name__])
 
 # ================= Basic Settings =================
 WIDTH, HEIGHT = 800, 600
 GROUND_Y = 570
-FPS = 60
+FPS = 60                         # 模拟频率（固定步长）
+STEP_MS = 1000.0 / FPS
+MAX_FRAME_MS = 250               # 卡顿时最多追 15 步，超出的时间丢弃（防止越追越慢）
+RENDER_FPS = 60                  # 渲染帧率上限；0 = 不限（--fps）
 
 RABBIT_W, RABBIT_H = 56, 46      # 1080p下略大
 BASE_SPEED = 8.0
@@ -55,138 +70,616 @@ FOX_W, FOX_H = 78, 56
 # 场景
 SCENE_GRASS, SCENE_HELL, SCENE_HEAVEN = "grass", "hell", "heaven"
 
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("HAPPY RABBIT")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 32)
-big_font = pygame.font.SysFont(None, 84)
+# 显示/字体在 init_display() 里创建；只跑逻辑（headless）时不需要
+screen = clock = font = big_font = None
+presenter = None  # --scale 时的 Presenter；screen 换成它的逻辑分辨率 canvas
+
+def init_display(scaling=None, window_size=None):
+    # 只初始化显示和字体（不开音频/手柄等）。字体直接用 pygame 自带的默认字体：
+    # 与 SysFont(None) 是同一个文件，但不会先扫描整个系统字体目录（网页上尤其慢）
+    global screen, clock, font, big_font, presenter
+    pygame.display.init()
+    pygame.font.init()
+    if scaling is None:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    else:
+        pygame.display.set_mode(window_size or (WIDTH, HEIGHT), pygame.RESIZABLE)
+        presenter = Presenter(scaling)
+        screen = presenter.canvas
+    pygame.display.set_caption("HAPPY RABBIT")
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 32)
+    big_font = pygame.font.Font(None, 84)
+    return screen
+
+def show(rects=None):
+    # 提交这一帧（None = 整屏）；开了 Presenter 时只记下，帧末 present() 一起缩放到窗口
+    if presenter is not None:
+        presenter.add(rects)
+    elif rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(rects)
+
+# ================= Presenter =================
+# --scale integer|smooth：游戏照旧按逻辑分辨率 WIDTH×HEIGHT 画到离屏 canvas（即全局 screen），
+# 帧末由 Presenter 等比缩放进真实窗口，居中留黑边；窗口随便拉伸，常量一个不用改。
+#   integer：整数倍最近邻，像素清晰，脏矩形逐块按倍数放大；窗口不到 1 倍时退回等比最近邻
+#   smooth ：等比双线性，整帧缩放
+# 没有“降内部分辨率”：所有绘制都是按逻辑像素写死的坐标，画的量和窗口无关；
+# 只能把画好的整帧再缩小一次，那是多出来的活，不是省下来的
+
+class Presenter:
+    def __init__(self, scaling="smooth"):
+        self.scaling = scaling
+        self.canvas = pygame.Surface((WIDTH, HEIGHT)).convert()
+        self.window = self.size = None
+        self.full, self.dirty = True, []
+
+    def layout(self, window):
+        ww, wh = window.get_size()
+        if self.scaling == "integer" and ww >= WIDTH and wh >= HEIGHT:
+            self.k = min(ww // WIDTH, wh // HEIGHT)
+            w, h = WIDTH * self.k, HEIGHT * self.k
+        else:
+            self.k = 0
+            f = min(ww / WIDTH, wh / HEIGHT)
+            w, h = max(1, int(WIDTH * f)), max(1, int(HEIGHT * f))
+        self.dest = pygame.Rect((ww - w) // 2, (wh - h) // 2, w, h)
+        window.fill((0, 0, 0))
+        # 缩放结果直接写进窗口的这块子表面：不另分配后备缓冲，画面不变时原样留着
+        self.target = window.subsurface(self.dest)
+        self.window, self.size = window, (ww, wh)
+        self.full = True
+
+    def add(self, rects=None):
+        if rects is None:
+            self.full = True
+        else:
+            self.dirty.extend(r for r in rects if r is not None)
+
+    def scale_all(self):
+        size, src = self.dest.size, self.canvas
+        if size == src.get_size():
+            self.target.blit(src, (0, 0))
+        elif self.scaling == "smooth":
+            pygame.transform.smoothscale(src, size, self.target)
+        else:
+            pygame.transform.scale(src, size, self.target)
+
+    def present(self):
+        window = pygame.display.get_surface()
+        if window is not self.window or window.get_size() != self.size:
+            self.layout(window)
+        if self.full or (self.dirty and not self.k):
+            self.scale_all()
+            pygame.display.flip()
+        elif self.dirty:
+            k, ox, oy = self.k, self.dest.x, self.dest.y
+            bounds, out = self.canvas.get_rect(), []
+            for r in self.dirty:
+                r = r.clip(bounds)
+                if r.w and r.h:
+                    d = pygame.Rect(ox + r.x * k, oy + r.y * k, r.w * k, r.h * k)
+                    pygame.transform.scale(self.canvas.subsurface(r), d.size, self.window.subsurface(d))
+                    out.append(d)
+            pygame.display.update(out)
+        self.full, self.dirty = False, []
 
 # ================= Utils =================
 def lerp(a, b, t):
     return a + (b - a) * t
 
-def load_best(path="best_score.txt"):
-    try:
-        if os.path.exists(path):
+def new_seed():
+    return random.getrandbits(32)
+
+class RngStreams:
+    # 每个子系统一条独立的随机流，互不消耗：
+    #   sim 出怪/掉落（决定一局的走向）  bg 云/花/鸟
+    #   fx 外观相位（耳朵、传送门）      render 绘制时的抖动/闪烁
+    # sim 流就是 random.Random(seed)，与 batch.py / 旧的 rng= 参数一致
+    def __init__(self, seed):
+        self.seed = seed
+        self.sim = random.Random(seed)
+        self.bg = random.Random(f"{seed}/bg")
+        self.fx = random.Random(f"{seed}/fx")
+        self.render = random.Random(f"{seed}/render")
+
+def lerp_rect(rect, px, py, alpha):
+    # (px, py) 为上一步的位置；渲染时在两步之间插值
+    if px is None or alpha >= 1.0:
+        return rect
+    return rect.move(int(round((px - rect.x) * (1.0 - alpha))),
+                     int(round((py - rect.y) * (1.0 - alpha))))
+
+BEST_PATH = "best_score.txt"
+_best = {}  # path → 读过/写过的最高分；新建 Game 不再重读文件
+
+def load_best(path=BEST_PATH):
+    if path not in _best:
+        try:
             with open(path, "r") as f:
-                return int(f.read().strip() or "0")
-    except:
-        pass
-    return 0
-
-def save_best(score, path="best_score.txt"):
+                _best[path] = int(f.read().strip() or "0")
+        except (OSError, ValueError):
+            _best[path] = 0
+    return _best[path]
+
+def save_best(score, path=BEST_PATH):
+    # 先写临时文件再 os.replace：写到一半崩了也只会留下旧文件。会阻塞，帧里用 store.ScoreStore
+    _best[path] = int(score)
+    tmp = path + ".tmp"
     try:
-        with open(path, "w") as f:
+        with open(tmp, "w") as f:
             f.write(str(int(score)))
-    except:
-        pass
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        return False
 
 # 把“基于得分的翅膀剩余量”换算成秒（每秒≈+35分，因为 score_gain = dt*0.035）
 def wings_seconds_left(score_budget):
     return max(0, int(score_budget / 35.0 + 0.5))
 
+# ================= Sky cache =================
+SCENE_PALETTE = {
+    SCENE_GRASS: dict(top=(160,210,255), bottom=(225,248,255),
+                      grass1=(120,190,90), grass2=(95,170,75),
+                      hill1=(120,160,120), hill2=(110,150,115), sun=(255,235,150)),
+    SCENE_HELL: dict(top=(60, 10, 10), bottom=(120, 20, 20),
+                     grass1=(90, 35, 35), grass2=(75, 25, 25),
+                     hill1=(90, 30, 30), hill2=(110, 40, 40), sun=(255, 90, 60)),
+    SCENE_HEAVEN: dict(top=(220,235,255), bottom=(255,255,255),
+                       grass1=(185, 225, 185), grass2=(165, 210, 170),
+                       hill1=(170, 210, 230), hill2=(155, 200, 220), sun=(255, 255, 255)),
+}
+
+FLOWER_COUNT = 90                # 地面装饰粒子数（花/余烬/星点）
+SKY_FADE_MS = 600                # 场景切换时天空渐变时长
+SKY_FADE_STEPS = 12              # 渐变量化档数（每档缓存一张）
+EXTRA_LAYERS = False             # 远山 + 近处草丛两层视差（--extra-layers）；默认只有山丘和地面
+
+_sky_cache = {}
+
+def _build_sky(scene):
+    pal = SCENE_PALETTE[scene]
+    top, bottom = pal["top"], pal["bottom"]
+    surf = pygame.Surface((WIDTH, HEIGHT))
+    # 只在首次构建时逐行画，之后每帧一次 blit
+    for i in range(HEIGHT):
+        t = i/HEIGHT
+        col = (int(lerp(top[0], bottom[0], t)),
+               int(lerp(top[1], bottom[1], t)),
+               int(lerp(top[2], bottom[2], t)))
+        pygame.draw.line(surf, col, (0,i), (WIDTH,i))
+    pygame.draw.circle(surf, pal["sun"], (120, 120), 50)
+    return surf
+
+def sky_surface(scene, prev_scene=None, t=1.0):
+    # t: 0 → prev_scene, 1 → scene
+    if prev_scene is None or prev_scene == scene or t >= 1.0:
+        key = scene
+    else:
+        key = (prev_scene, scene, max(0, int(t * SKY_FADE_STEPS)))
+    surf = _sky_cache.get(key)
+    if surf is None:
+        if key == scene:
+            surf = _build_sky(scene)
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert()
+        else:
+            # 两张已缓存（已 convert）的整图叠加；临时设整面 alpha，画完还原
+            surf = sky_surface(prev_scene).copy()
+            top = sky_surface(scene)
+            top.set_alpha(int(255 * key[2] / SKY_FADE_STEPS))
+            surf.blit(top, (0, 0))
+            top.set_alpha(None)
+        _sky_cache[key] = surf
+    return surf
+
+# 整屏半透明遮罩（复活/结束）：每种颜色建一张，用整面 alpha（set_alpha）
+# 而不是逐像素 SRCALPHA，混合快得多，也不用每帧重新分配
+_overlay_cache = {}
+
+def overlay_surface(rgba):
+    surf = _overlay_cache.get(rgba)
+    if surf is None:
+        surf = pygame.Surface((WIDTH, HEIGHT))
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        surf.fill(rgba[:3])
+        surf.set_alpha(rgba[3])
+        _overlay_cache[rgba] = surf
+    return surf
+
+# ================= Sprite cache =================
+class SpriteCache:
+    # 每种实体外观（尺寸/场景配色/动画帧）只光栅化一次，之后每帧一次 blit
+    # paint(surf, rect, *args) 是原来的逐帧图元绘制；pad=(左,上,右,下) 为超出 rect 的部分
+    def __init__(self):
+        self.enabled = True
+        self.surfs = {}
+        self.hits = self.misses = 0
+
+    def get(self, size, pad, paint, *args):
+        key = (paint, size, args)
+        hit = self.surfs.get(key)
+        if hit is None:
+            self.misses += 1
+            l, t, r, b = pad
+            w, h = size
+            img = pygame.Surface((w + l + r, h + t + b), pygame.SRCALPHA)
+            paint(img, pygame.Rect(l, t, w, h), *args)
+            if pygame.display.get_surface() is not None:
+                img = img.convert_alpha()
+            hit = self.surfs[key] = (img, -l, -t)
+        else:
+            self.hits += 1
+        return hit
+
+    def draw(self, surf, rect, pad, paint, *args):
+        # 返回画过的区域；关闭缓存时返回 None（不知道确切范围）
+        if not self.enabled:
+            paint(surf, rect, *args)
+            return None
+        img, ox, oy = self.get(rect.size, pad, paint, *args)
+        return surf.blit(img, (rect.x + ox, rect.y + oy))
+
+sprites = SpriteCache()
+
+# ================= Text cache =================
+class TextCache:
+    # font.render 结果按 (字体, 文本, 颜色) 缓存，LRU 淘汰；
+    # 带数字的整行也按拼好的文本缓存：值不变就是一次 blit，变了才重新 render 一行
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+
+    def render(self, fnt, text, color):
+        key = (fnt, text, color)
+        img = self.items.get(key)
+        if img is None:
+            self.misses += 1
+            img = self.items[key] = fnt.render(text, True, color)
+            if len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        else:
+            self.hits += 1
+            self.items.move_to_end(key)
+        return img
+
+    def blit_parts(self, surf, fnt, color, parts, pos=None, center=None):
+        # parts: 字符串和数字拼成一行，整行按值缓存；返回画过的范围（整张文字图，含下伸部）
+        img = self.render(fnt, "".join(map(str, parts)), color)
+        rect = img.get_rect(center=center) if center is not None else img.get_rect(topleft=pos)
+        surf.blit(img, rect)
+        return rect
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"text_hits": self.hits, "text_misses": self.misses, "text_items": len(self.items),
+                "text_hit_rate": self.hits / total if total else 1.0}
+
+text_cache = TextCache()
+
+def cache_stats():
+    # 给性能面板用：精灵/文字缓存命中率
+    total = sprites.hits + sprites.misses
+    return dict(text_cache.stats(), sprite_hits=sprites.hits, sprite_misses=sprites.misses,
+                sprite_hit_rate=sprites.hits / total if total else 1.0)
+
+# ================= 背景粒子 =================
+FLOWER_COLORS = [(245,215,0),(255,160,160),(200,255,200),(200,220,255)]
+EMBER_COLORS = [(255,120,80),(255,180,120)]
+DOT_R = 2
+
+def _paint_dot(surf, rect, color):
+    pygame.draw.circle(surf, color, rect.center, DOT_R)
+
+def _import_numpy():
+    # numpy 只有背景粒子用：不放在模块顶上，启动（和网页版首帧前的下载）不等它；
+    # 没有 numpy 时背景粒子退回纯 Python 列表
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+def dot_sprites(scene):
+    # 每种颜色的小圆点只画一次；余烬的两种颜色每帧随机挑
+    colors = {SCENE_HELL: EMBER_COLORS, SCENE_HEAVEN: [(255,255,255)]}.get(scene, FLOWER_COLORS)
+    size = (DOT_R * 2 + 1, DOT_R * 2 + 1)
+    return [sprites.get(size, (0, 0, 0, 0), _paint_dot, c)[0] for c in colors]
+
+class ParticleField:
+    # 一层只会匀速左移、出界后从右侧重生的粒子：x/y/kind 放在数组里整体更新。
+    # 绘制时按小图的不透明像素直接写进目标 surface（surfarray），
+    # 写不了（非 32 位 / 没有 numpy）时把小图一次 blits 出去
+    def __init__(self, n, y_range, factor, kinds, rng, render_rng):
+        self.n, self.factor, self.kinds = n, factor, kinds
+        self.y_lo, self.y_hi = y_range
+        self.stamps = {}
+        _import_numpy()
+        self.reseed(rng, render_rng)
+
+    def reseed(self, rng, render_rng):
+        n, lo, hi = self.n, self.y_lo, self.y_hi
+        if np is None:
+            self.rng, self.render_rng = rng, render_rng
+            self.x = [float(rng.randint(0, WIDTH)) for _ in range(n)]
+            self.y = [rng.randint(lo, hi) for _ in range(n)]
+            self.kind = [rng.randrange(self.kinds) for _ in range(n)]
+            return
+        # numpy 的生成器由 bg/render 流派生，同一种子画面仍然可复现
+        self.rng = np.random.default_rng(rng.getrandbits(64))
+        self.render_rng = np.random.default_rng(render_rng.getrandbits(64))
+        self.x = self.rng.integers(0, WIDTH, n, endpoint=True).astype(np.float64)
+        self.y = self.rng.integers(lo, hi, n, endpoint=True)
+        self.kind = self.rng.integers(0, self.kinds, n)
+
+    def update(self, world_speed):
+        dx = world_speed * self.factor
+        if np is None:
+            rng, x, y = self.rng, self.x, self.y
+            for i in range(self.n):
+                x[i] -= dx
+                if x[i] < -6:
+                    x[i] = WIDTH + rng.randint(0, 120)
+                    y[i] = rng.randint(self.y_lo, self.y_hi)
+            return
+        x = self.x
+        x -= dx
+        out = np.flatnonzero(x < -6)
+        if out.size:
+            x[out] = WIDTH + self.rng.integers(0, 120, out.size, endpoint=True)
+            self.y[out] = self.rng.integers(self.y_lo, self.y_hi, out.size, endpoint=True)
+
+    def _stamp(self, surf, imgs):
+        # 小图 → (不透明像素相对左上角的偏移, 每张图映射到 surf 格式的颜色)
+        key = (surf.get_bitsize(), surf.get_masks(), tuple(map(id, imgs)))
+        st = self.stamps.get(key)
+        if st is None:
+            dx, dy = np.nonzero(pygame.surfarray.array_alpha(imgs[0]) == 255)
+            colors = np.array([surf.map_rgb(img.get_at((int(dx[0]), int(dy[0])))) for img in imgs], np.uint32)
+            st = self.stamps[key] = (dx, dy, colors)
+        return st
+
+    def draw(self, surf, imgs, lag=0.0, flicker=False):
+        # flicker: 每帧每个粒子随机换图（余烬闪烁）；否则按 kind 取图。
+        # 同一组的小图形状相同、纯色不透明，只是颜色不同
+        shift = lag * self.factor - DOT_R
+        m = len(imgs)
+        if np is not None and surf.get_bytesize() == 4:
+            dx, dy, colors = self._stamp(surf, imgs)
+            idx = self.render_rng.integers(0, m, self.n) if flicker else self.kind % m
+            xs = (self.x + shift).astype(np.int32)[:, None] + dx
+            ys = (self.y - DOT_R)[:, None] + dy
+            w, h = surf.get_size()
+            ok = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            c = np.broadcast_to(colors[idx][:, None], xs.shape)
+            px = pygame.surfarray.pixels2d(surf)
+            px[xs[ok], ys[ok]] = c[ok]
+            del px  # 解锁 surface
+            return
+        if np is None:
+            rnd = self.render_rng.randrange
+            idx = [rnd(m) for _ in range(self.n)] if flicker else [k % m for k in self.kind]
+            pos = [(int(x + shift), y - DOT_R) for x, y in zip(self.x, self.y)]
+        else:
+            idx = (self.render_rng.integers(0, m, self.n) if flicker else self.kind % m).tolist()
+            pos = zip((self.x + shift).astype(np.int32).tolist(), (self.y - DOT_R).tolist())
+        surf.blits(list(zip([imgs[i] for i in idx], pos)), False)
+
+# ================= 视差层 =================
+# 每层是一段横向周期图案：每个场景预先画成一条 period 宽的带子（colorkey 透明），
+# 每帧按滚动偏移 blit 1~2 次拼满屏幕，多加一层也只是多一两次 blit
+STRIP_KEY = (255, 0, 255)
+
+def _hill_poly(pts, period, top, bottom, k):
+    # pts 为一个周期内的轮廓（首尾同高），平移 k 个周期后补上底边
+    shifted = [(x + k * period, y - top) for x, y in pts]
+    return shifted + [(shifted[-1][0], bottom - top), (shifted[0][0], bottom - top)]
+
+def _paint_periodic(surf, layer, colors_pts):
+    # 依次画每条轮廓；左右各多画一个周期，接缝处无缝
+    for color, pts in colors_pts:
+        for k in (-1, 0, 1):
+            pygame.draw.polygon(surf, color, _hill_poly(pts, layer.period, layer.top, layer.bottom, k))
+
+def _paint_mountains(surf, layer, pal):
+    col = tuple(int(lerp(a, b, 0.55)) for a, b in zip(pal["hill2"], pal["bottom"]))
+    pts = [(0,GROUND_Y-200),(260,GROUND_Y-330),(520,GROUND_Y-230),(800,GROUND_Y-300),
+           (1100,GROUND_Y-190),(1350,GROUND_Y-320),(1600,GROUND_Y-200)]
+    _paint_periodic(surf, layer, [(col, pts)])
+
+def _paint_hills(surf, layer, pal):
+    pts = [(0,GROUND_Y-110),(240,GROUND_Y-220),(480,GROUND_Y-110),(720,GROUND_Y-240),(1000,GROUND_Y-110)]
+    _paint_periodic(surf, layer, [(pal["hill1"], pts), (pal["hill2"], [(x+100, y+36) for x, y in pts])])
+
+def _paint_ground(surf, layer, pal, scene):
+    top = layer.top
+    pygame.draw.rect(surf, pal["grass1"], (0, GROUND_Y-top, WIDTH, HEIGHT-GROUND_Y))
+    pygame.draw.rect(surf, pal["grass2"], (0, GROUND_Y+24-top, WIDTH, HEIGHT-(GROUND_Y+24)))
+    pygame.draw.line(surf, (60,90,60) if scene!=SCENE_HELL else (120,30,30), (0,GROUND_Y-top), (WIDTH,GROUND_Y-top), 4)
+
+def _paint_foliage(surf, layer, pal):
+    # 草丛：固定种子摆放（不占用任何随机流），靠边的草丛左右各补画一份
+    col = tuple(int(c * 0.78) for c in pal["grass2"])
+    rng = random.Random("foliage")
+    for _ in range(26):
+        x, y = rng.randint(0, layer.period - 1), rng.randint(GROUND_Y+8, HEIGHT-4) - layer.top
+        blades = [(rng.randint(-5, 5), rng.randint(5, 10)) for _ in range(rng.randint(2, 4))]
+        for k in (-1, 0, 1):
+            bx = x + k * layer.period
+            for dx, h in blades:
+                pygame.draw.line(surf, col, (bx, y), (bx + dx, y - h), 2)
+
+class ParallaxLayer:
+    def __init__(self, name, factor, period, top, bottom, paint, scene_arg=False):
+        self.name, self.factor, self.period = name, factor, period
+        self.top, self.bottom = top, bottom
+        self.paint, self.scene_arg = paint, scene_arg
+        self.strips = {}
+
+    def strip(self, scene):
+        img = self.strips.get(scene)
+        if img is None:
+            img = pygame.Surface((self.period, self.bottom - self.top))
+            img.fill(STRIP_KEY)
+            args = (scene,) if self.scene_arg else ()
+            self.paint(img, self, SCENE_PALETTE[scene], *args)
+            if pygame.display.get_surface() is not None:
+                img = img.convert()
+            img.set_colorkey(STRIP_KEY, pygame.RLEACCEL)
+            self.strips[scene] = img
+        return img
+
+    def draw(self, surf, scene, off):
+        img = self.strip(scene)
+        x = -(int(off) % self.period)
+        while x < WIDTH:
+            surf.blit(img, (x, self.top))
+            x += self.period
+
+# 由远到近；ground 不滚动。far 组在云之前画，near 组在花/鸟之前画
+MOUNTAINS_LAYER = ParallaxLayer("mountains", 0.1, 1600, GROUND_Y-330, GROUND_Y-100, _paint_mountains)  # 再往下被山丘挡住
+HILLS_LAYER = ParallaxLayer("hills", 0.25, WIDTH+200, GROUND_Y-240, GROUND_Y, _paint_hills)
+GROUND_LAYER = ParallaxLayer("ground", 0.0, WIDTH, GROUND_Y-2, HEIGHT, _paint_ground, scene_arg=True)
+FOLIAGE_LAYER = ParallaxLayer("foliage", 0.8, 960, GROUND_Y, HEIGHT, _paint_foliage)
+
+def use_parallax_layers(extra):
+    # 默认只有山丘和地面（原来的画面）；extra 再加远山和近处草丛。要在建 Background 之前调
+    global FAR_LAYERS, NEAR_LAYERS, PARALLAX_LAYERS
+    FAR_LAYERS = [MOUNTAINS_LAYER, HILLS_LAYER] if extra else [HILLS_LAYER]
+    NEAR_LAYERS = [FOLIAGE_LAYER] if extra else []
+    PARALLAX_LAYERS = FAR_LAYERS + [GROUND_LAYER] + NEAR_LAYERS
+
+use_parallax_layers(EXTRA_LAYERS)
+
 # ================= Background（多场景） =================
 class Background:
-    def __init__(self):
+    def __init__(self, streams=None):
         self.t = 0.0
-        self.hills_off = 0
+        self.scroll = {layer.name: 0.0 for layer in PARALLAX_LAYERS}
+        self.scene = SCENE_GRASS
+        self.prev_scene = None
+        self.fade_ms = SKY_FADE_MS
+        self.last_speed = 0.0
+        self.reseed(streams or RngStreams(new_seed()))
+
+    def reseed(self, streams):
+        # 背景装饰用 bg 流，绘制时的闪烁用 render 流；都不碰 sim 流
+        self.rng = streams.bg
+        self.render_rng = streams.render
         self.reset_clouds_flowers_birds()
 
     def reset_clouds_flowers_birds(self):
-        self.clouds = [[random.randint(0, WIDTH), random.randint(60, 220), random.randint(120, 280)] for _ in range(10)]
-        self.flowers = [[random.randint(0, WIDTH), random.randint(GROUND_Y+10, HEIGHT-12),
-                         random.choice([(245,215,0),(255,160,160),(200,255,200),(200,220,255)])] for _ in range(90)]
-        self.birds = [[random.randint(0, WIDTH), random.randint(90, 200), random.choice([1, -1])] for _ in range(5)]
+        rng = self.rng
+        self.clouds = [[rng.randint(0, WIDTH), rng.randint(60, 220), rng.randint(120, 280)] for _ in range(10)]
+        self.flowers = ParticleField(FLOWER_COUNT, (GROUND_Y+10, HEIGHT-12), 0.5, len(FLOWER_COLORS),
+                                     rng, self.render_rng)
+        self.birds = [[rng.randint(0, WIDTH), rng.randint(90, 200), rng.choice([1, -1])] for _ in range(5)]
 
     def update(self, world_speed, dt):
+        rng = self.rng
         self.t += dt
-        self.hills_off = (self.hills_off + world_speed * 0.25) % (WIDTH+200)
+        self.last_speed = world_speed
+        if self.fade_ms < SKY_FADE_MS:
+            self.fade_ms += dt
+        for layer in PARALLAX_LAYERS:
+            self.scroll[layer.name] = (self.scroll[layer.name] + world_speed * layer.factor) % layer.period
         for c in self.clouds:
             c[0] -= world_speed * 0.35
             if c[0] + c[2] < -20:
-                c[0] = WIDTH + random.randint(30, 200)
-                c[1] = random.randint(60, 220)
-                c[2] = random.randint(120, 280)
-        for f in self.flowers:
-            f[0] -= world_speed * 0.5
-            if f[0] < -6:
-                f[0] = WIDTH + random.randint(0, 120)
-                f[1] = random.randint(GROUND_Y+10, HEIGHT-12)
+                c[0] = WIDTH + rng.randint(30, 200)
+                c[1] = rng.randint(60, 220)
+                c[2] = rng.randint(120, 280)
+        self.flowers.update(world_speed)
         for b in self.birds:
             b[0] += b[2] * 0.8
             if b[0] < -20:
-                b[0] = WIDTH + 10; b[1] = random.randint(90, 200); b[2] = -1
+                b[0] = WIDTH + 10; b[1] = rng.randint(90, 200); b[2] = -1
             if b[0] > WIDTH+20:
-                b[0] = -10; b[1] = random.randint(90, 200); b[2] = 1
-
-    def draw(self, surf, scene):
-        if scene == SCENE_GRASS:
-            top, bottom = (160,210,255), (225,248,255)
-            grass1, grass2 = (120,190,90), (95,170,75)
-            hill1, hill2 = (120,160,120), (110,150,115)
-            sun = (255,235,150)
-        elif scene == SCENE_HELL:
-            top, bottom = (60, 10, 10), (120, 20, 20)
-            grass1, grass2 = (90, 35, 35), (75, 25, 25)
-            hill1, hill2 = (90, 30, 30), (110, 40, 40)
-            sun = (255, 90, 60)
-        else:  # HEAVEN
-            top, bottom = (220,235,255), (255,255,255)
-            grass1, grass2 = (185, 225, 185), (165, 210, 170)
-            hill1, hill2 = (170, 210, 230), (155, 200, 220)
-            sun = (255, 255, 255)
-
-        # sky gradient + sun
-        for i in range(HEIGHT):
-            t = i/HEIGHT
-            col = (int(lerp(top[0], bottom[0], t)),
-                   int(lerp(top[1], bottom[1], t)),
-                   int(lerp(top[2], bottom[2], t)))
-            pygame.draw.line(surf, col, (0,i), (WIDTH,i))
-        pygame.draw.circle(surf, sun, (120, 120), 50)
-
-        # hills
-        off = int(self.hills_off)
-        pts = [(0-off,GROUND_Y-110),(240-off,GROUND_Y-220),(480-off,GROUND_Y-110),
-               (720-off,GROUND_Y-240),(1000-off,GROUND_Y-110),(1280-off,GROUND_Y-220),(1580-off,GROUND_Y-110)]
-        pygame.draw.polygon(surf, hill1, pts+[(WIDTH,GROUND_Y),(0,GROUND_Y)])
-        pts2 = [(x+100, y+36) for (x,y) in pts]
-        pygame.draw.polygon(surf, hill2, pts2+[(WIDTH,GROUND_Y),(0,GROUND_Y)])
+                b[0] = -10; b[1] = rng.randint(90, 200); b[2] = 1
+
+    def draw(self, surf, scene, alpha=1.0, rects=None):
+        # 视差层都按 world_speed 匀速左移：插值 = 往回挪 (1-alpha) 步
+        # rects: 只从天空缓存恢复这些区域（分层渲染）；None = 整屏
+        lag = self.last_speed * (1.0 - alpha)
+        self.draw_sky(surf, scene, rects)
+        self.draw_far(surf, scene, lag)
+        self.draw_ground(surf, scene)
+        self.draw_near(surf, scene, lag)
+
+    def fading(self):
+        return self.prev_scene is not None and self.fade_ms < SKY_FADE_MS
+
+    def moving_rects(self, alpha=1.0):
+        # 这一帧会动的区域：滚动层所在的横带 + 每朵云、每只鸟的包围盒（与 draw 用同样的插值）。
+        # 其余地方只有天空，分层渲染时不用重画也不用提交
+        lag = self.last_speed * (1.0 - alpha)
+        top = min((layer.top for layer in PARALLAX_LAYERS if layer.factor), default=GROUND_Y-2)
+        rects = [pygame.Rect(0, top, WIDTH, HEIGHT - top)]
+        for x, y, w in self.clouds:
+            x += lag * 0.35
+            rects.append(pygame.Rect(int(x) - 2, y - 14, int(w * 1.1) + 5, int(w * 0.5) + 17))
+        for x, y, d in self.birds:
+            rects.append(pygame.Rect(int(min(x, x + 20*d)) - 2, y - 2, 25, 10))
+        return rects
+
+    def draw_sky(self, surf, scene, rects=None):
+        if scene != self.scene:
+            self.prev_scene, self.scene, self.fade_ms = self.scene, scene, 0.0
+        # sky gradient + sun（缓存整张，切场景时淡入）
+        sky = sky_surface(scene, self.prev_scene, self.fade_ms / SKY_FADE_MS)
+        if rects is None:
+            surf.blit(sky, (0, 0))
+        else:
+            for r in rects:
+                surf.blit(sky, r, r)
+
+    def draw_layers(self, surf, scene, layers, lag):
+        for layer in layers:
+            layer.draw(surf, scene, self.scroll[layer.name] - lag * layer.factor)
+
+    def draw_far(self, surf, scene, lag=0.0):
+        # mountains / hills
+        self.draw_layers(surf, scene, FAR_LAYERS, lag)
 
         # clouds
         for x,y,w in self.clouds:
+            x += lag * 0.35
             ccol = (255,255,255) if scene!=SCENE_HELL else (220,180,180)
             pygame.draw.ellipse(surf, ccol, (x,y,w,int(w*0.5)))
             pygame.draw.ellipse(surf, ccol, (x+int(w*0.3),y-12,int(w*0.8),int(w*0.45)))
 
-        # ground
-        pygame.draw.rect(surf, grass1, (0,GROUND_Y, WIDTH, HEIGHT-GROUND_Y))
-        pygame.draw.rect(surf, grass2, (0,GROUND_Y+24, WIDTH, HEIGHT-(GROUND_Y+24)))
-        pygame.draw.line(surf, (60,90,60) if scene!=SCENE_HELL else (120,30,30), (0,GROUND_Y), (WIDTH,GROUND_Y), 4)
+    def draw_ground(self, surf, scene):
+        GROUND_LAYER.draw(surf, scene, 0)
 
-        # flowers / embers / sparkles
-        for x,y,c in self.flowers:
-            if scene == SCENE_HELL:
-                c = (255,120,80) if random.random()<0.5 else (255,180,120)
-            elif scene == SCENE_HEAVEN:
-                c = (255,255,255)
-            pygame.draw.circle(surf, c, (x,y), 2)
+    def draw_near(self, surf, scene, lag=0.0):
+        # foliage, then flowers / embers / sparkles
+        self.draw_layers(surf, scene, NEAR_LAYERS, lag)
+        self.flowers.draw(surf, dot_sprites(scene), lag, flicker=scene == SCENE_HELL)
 
         # far birds/souls
         for x,y,d in self.birds:
             col = (100,130,160) if scene!=SCENE_HELL else (200,90,90)
             pygame.draw.lines(surf, col, False, [(x, y), (x+10*d, y+5), (x+20*d, y)], 2)
 
-bg = Background()
 # ================= Player (Rabbit) =================
 class Rabbit:
-    def __init__(self, x, ground_y):
+    def __init__(self, x, ground_y, rng=random):
         self.base_w, self.base_h = RABBIT_W, RABBIT_H
         self.scale = 1.0
         self.x, self.ground_y = x, ground_y
         self.w, self.h = RABBIT_W, RABBIT_H
         self.y = ground_y - self.h
+        self.prev_y = self.y
         self.vy = 0.0
         self.on_ground = True
         # jumping
@@ -201,7 +694,7 @@ class Rabbit:
         self.super_active = False
         self.super_timer = 0
         # visuals
-        self.ear_phase = random.random()*math.tau
+        self.ear_phase = rng.random()*math.tau
         # i-frames
         self.iframe_ms = 0
 
@@ -288,130 +781,312 @@ class Rabbit:
         else:
             self.on_ground = False
 
-    def draw(self, surf, t_ms, scene):
+    def draw(self, surf, t_ms, scene, alpha=1.0):
         r = self.rect
+        r.y = int(lerp(self.prev_y, self.y, alpha))
         flicker = (self.iframe_ms > 0) and (int(t_ms / 80) % 2 == 0)
         shadow = pygame.Rect(r.centerx-26, self.ground_y-8, 52, 8)
-        pygame.draw.ellipse(surf, (65,85,65) if scene!=SCENE_HELL else (110,50,50), shadow)
-        body_col = (220, 245, 255) if self.super_active else (240,240,245)
-        outline_col = (120,170,220) if self.super_active else (160,160,170)
+        rects = [sprites.draw(surf, shadow, (0, 0, 0, 0), _paint_shadow, (65,85,65) if scene!=SCENE_HELL else (110,50,50))]
 
         if not flicker:
-            pygame.draw.ellipse(surf, body_col, r)
-            pygame.draw.ellipse(surf, outline_col, r, 2)
-            head = pygame.Rect(r.x+10, r.y-14, 30, 30)
-            pygame.draw.ellipse(surf, body_col, head); pygame.draw.ellipse(surf, outline_col, head, 2)
+            # 耳朵摆动只有 -4..4 九帧
             wob = int(4*math.sin(t_ms*0.012 + self.ear_phase))
-            ear1 = pygame.Rect(head.centerx-16, head.y-22+wob, 12, 26)
-            ear2 = pygame.Rect(head.centerx+6, head.y-18-wob, 12, 24)
-            pygame.draw.ellipse(surf, body_col, ear1); pygame.draw.ellipse(surf, body_col, ear2)
-            pygame.draw.ellipse(surf, (255,190,210), ear1.inflate(-6,-8)); pygame.draw.ellipse(surf, (255,190,210), ear2.inflate(-6,-8))
-            pygame.draw.ellipse(surf, outline_col, ear1, 1); pygame.draw.ellipse(surf, outline_col, ear2, 1)
-            pygame.draw.circle(surf, (20,20,20), (head.centerx+8, head.centery), 3)
-            pygame.draw.circle(surf, (255,120,130), (head.centerx+12, head.centery+6), 3)
-            pygame.draw.circle(surf, outline_col, (r.right-8, r.centery+10), 7, 1)
-
-        if self.has_wings and not flicker:
-            wing = [(r.x-14, r.y+8), (r.x-34, r.y+4), (r.x-22, r.y+20)]
-            pygame.draw.polygon(surf, (220,240,255), wing); pygame.draw.polygon(surf, (140,170,200), wing, 1)
+            rects.append(sprites.draw(surf, r, RABBIT_PAD, _paint_rabbit, self.super_active, self.has_wings, wob))
+        return rects
+
+RABBIT_PAD = (36, 42, 2, 2)
+
+def _paint_shadow(surf, r, col):
+    pygame.draw.ellipse(surf, col, r)
+
+def _paint_rabbit(surf, r, super_active, has_wings, wob):
+    body_col = (220, 245, 255) if super_active else (240,240,245)
+    outline_col = (120,170,220) if super_active else (160,160,170)
+    pygame.draw.ellipse(surf, body_col, r)
+    pygame.draw.ellipse(surf, outline_col, r, 2)
+    head = pygame.Rect(r.x+10, r.y-14, 30, 30)
+    pygame.draw.ellipse(surf, body_col, head); pygame.draw.ellipse(surf, outline_col, head, 2)
+    ear1 = pygame.Rect(head.centerx-16, head.y-22+wob, 12, 26)
+    ear2 = pygame.Rect(head.centerx+6, head.y-18-wob, 12, 24)
+    pygame.draw.ellipse(surf, body_col, ear1); pygame.draw.ellipse(surf, body_col, ear2)
+    pygame.draw.ellipse(surf, (255,190,210), ear1.inflate(-6,-8)); pygame.draw.ellipse(surf, (255,190,210), ear2.inflate(-6,-8))
+    pygame.draw.ellipse(surf, outline_col, ear1, 1); pygame.draw.ellipse(surf, outline_col, ear2, 1)
+    pygame.draw.circle(surf, (20,20,20), (head.centerx+8, head.centery), 3)
+    pygame.draw.circle(surf, (255,120,130), (head.centerx+12, head.centery+6), 3)
+    pygame.draw.circle(surf, outline_col, (r.right-8, r.centery+10), 7, 1)
+    if has_wings:
+        wing = [(r.x-14, r.y+8), (r.x-34, r.y+4), (r.x-22, r.y+20)]
+        pygame.draw.polygon(surf, (220,240,255), wing); pygame.draw.polygon(surf, (140,170,200), wing, 1)
 
 # ================= 障碍 & 收集 & 传送门 =================
+# 实体都带 __slots__，由 Lane 回收后用 reinit() 原地复用（不重新分配 Rect）
 class Obstacle:
     # kind: "rock" or "fox"
-    def __init__(self, kind, x, y, w, h):
-        self.kind = kind
+    __slots__ = ("kind", "rect", "phase", "px", "py")
+    def __init__(self, kind, x, y, w, h, phase):
         self.rect = pygame.Rect(x, y, w, h)
-        self.phase = random.random()*math.tau
+        self.reinit(kind, x, y, w, h, phase)
+    def reinit(self, kind, x, y, w, h, phase):
+        self.kind = kind
+        self.rect.update(x, y, w, h)
+        self.phase = phase
+        self.px = self.py = None
     def update(self, speed, t_ms):
         self.rect.x -= int(round(speed))
         if self.kind == "fox":
             self.rect.y = (GROUND_Y - self.rect.h) + int(3 * math.sin(t_ms*0.02 + self.phase))
-    def draw(self, surf, scene):
+    def draw(self, surf, scene, alpha=1.0, rng=random):
+        hell = scene == SCENE_HELL
+        r = lerp_rect(self.rect, self.px, self.py, alpha)
         if self.kind == "rock":
-            r = self.rect
-            peak_dx = random.choice([-4, -2, 0, 2, 4])
-            poly = [(r.x, r.bottom-4),(r.x+10, r.y+10),(r.centerx+peak_dx, r.y),
-                    (r.right-12, r.y+14),(r.right, r.bottom-4)]
-            base_col = (120,120,120) if scene!=SCENE_HELL else (150,90,90)
-            edge_col = (80,80,80) if scene!=SCENE_HELL else (120,60,60)
-            pygame.draw.polygon(surf, base_col, poly)
-            pygame.draw.polygon(surf, edge_col, poly, 2)
-            pygame.draw.ellipse(surf, (60,80,60) if scene!=SCENE_HELL else (120,50,50), (r.centerx-22, r.bottom-4, 44, 8))
-        else:
-            r = self.rect
-            body_col = (230,120,60) if scene!=SCENE_HELL else (210,80,50)
-            line_col = (200,90,45) if scene!=SCENE_HELL else (180,60,40)
-            pygame.draw.ellipse(surf, body_col, (r.x, r.y+8, r.w, r.h-8))
-            pygame.draw.ellipse(surf, line_col, (r.x, r.y+8, r.w, r.h-8), 2)
-            head = pygame.Rect(r.x-14, r.y-6, 28, 24)
-            pygame.draw.ellipse(surf, body_col, head); pygame.draw.ellipse(surf, line_col, head, 2)
-            ear1 = pygame.Rect(head.x+2, head.y-10, 10, 14); ear2 = pygame.Rect(head.x+12, head.y-8, 10, 12)
-            pygame.draw.ellipse(surf, body_col, ear1); pygame.draw.ellipse(surf, body_col, ear2)
-            pygame.draw.ellipse(surf, line_col, ear1, 1); pygame.draw.ellipse(surf, line_col, ear2, 1)
-            pygame.draw.circle(surf, (30,15,10), (head.centerx+4, head.centery), 2)
-            pygame.draw.polygon(surf, (255,210,140), [(r.right-8, r.centery+6), (r.right+14, r.centery+2), (r.right-2, r.centery+14)])
-            pygame.draw.ellipse(surf, (60,80,60) if scene!=SCENE_HELL else (120,50,50), (r.centerx-22, r.bottom-4, 44, 8))
+            peak_dx = rng.choice([-4, -2, 0, 2, 4])
+            return sprites.draw(surf, r, (6, 6, 6, 6), _paint_rock, hell, peak_dx)
+        return sprites.draw(surf, r, (16, 18, 16, 6), _paint_fox, hell)
+
+def _paint_rock(surf, r, hell, peak_dx):
+    poly = [(r.x, r.bottom-4),(r.x+10, r.y+10),(r.centerx+peak_dx, r.y),
+            (r.right-12, r.y+14),(r.right, r.bottom-4)]
+    base_col = (120,120,120) if not hell else (150,90,90)
+    edge_col = (80,80,80) if not hell else (120,60,60)
+    pygame.draw.polygon(surf, base_col, poly)
+    pygame.draw.polygon(surf, edge_col, poly, 2)
+    pygame.draw.ellipse(surf, (60,80,60) if not hell else (120,50,50), (r.centerx-22, r.bottom-4, 44, 8))
+
+def _paint_fox(surf, r, hell):
+    body_col = (230,120,60) if not hell else (210,80,50)
+    line_col = (200,90,45) if not hell else (180,60,40)
+    pygame.draw.ellipse(surf, body_col, (r.x, r.y+8, r.w, r.h-8))
+    pygame.draw.ellipse(surf, line_col, (r.x, r.y+8, r.w, r.h-8), 2)
+    head = pygame.Rect(r.x-14, r.y-6, 28, 24)
+    pygame.draw.ellipse(surf, body_col, head); pygame.draw.ellipse(surf, line_col, head, 2)
+    ear1 = pygame.Rect(head.x+2, head.y-10, 10, 14); ear2 = pygame.Rect(head.x+12, head.y-8, 10, 12)
+    pygame.draw.ellipse(surf, body_col, ear1); pygame.draw.ellipse(surf, body_col, ear2)
+    pygame.draw.ellipse(surf, line_col, ear1, 1); pygame.draw.ellipse(surf, line_col, ear2, 1)
+    pygame.draw.circle(surf, (30,15,10), (head.centerx+4, head.centery), 2)
+    pygame.draw.polygon(surf, (255,210,140), [(r.right-8, r.centery+6), (r.right+14, r.centery+2), (r.right-2, r.centery+14)])
+    pygame.draw.ellipse(surf, (60,80,60) if not hell else (120,50,50), (r.centerx-22, r.bottom-4, 44, 8))
 
 class Carrot:
+    __slots__ = ("rect", "t", "px", "py")
     def __init__(self, x, y):
-        self.rect = pygame.Rect(x, y, 22, 32); self.t = 0.0
+        self.rect = pygame.Rect(x, y, 22, 32)
+        self.reinit(x, y)
+    def reinit(self, x, y):
+        self.rect.update(x, y, 22, 32); self.t = 0.0
+        self.px = self.py = None
     def update(self, speed, dt):
         self.rect.x -= int(round(speed)); self.t += dt
-    def draw(self, surf, scene):
-        r = self.rect
-        body = [(r.centerx, r.y), (r.x, r.bottom), (r.right, r.bottom)]
-        pygame.draw.polygon(surf, (255,150,50) if scene!=SCENE_HELL else (255,120,80), body)
-        pygame.draw.polygon(surf, (180,90,30), body, 1)
-        pygame.draw.ellipse(surf, (70,170,80) if scene!=SCENE_HELL else (180,90,90), (r.centerx-12, r.y-12, 10, 14))
-        pygame.draw.ellipse(surf, (70,170,80) if scene!=SCENE_HELL else (180,90,90), (r.centerx+2, r.y-14, 12, 16))
+    def draw(self, surf, scene, alpha=1.0):
+        return sprites.draw(surf, lerp_rect(self.rect, self.px, self.py, alpha), (4, 16, 6, 2), _paint_carrot, scene == SCENE_HELL)
+
+def _paint_carrot(surf, r, hell):
+    body = [(r.centerx, r.y), (r.x, r.bottom), (r.right, r.bottom)]
+    pygame.draw.polygon(surf, (255,150,50) if not hell else (255,120,80), body)
+    pygame.draw.polygon(surf, (180,90,30), body, 1)
+    pygame.draw.ellipse(surf, (70,170,80) if not hell else (180,90,90), (r.centerx-12, r.y-12, 10, 14))
+    pygame.draw.ellipse(surf, (70,170,80) if not hell else (180,90,90), (r.centerx+2, r.y-14, 12, 16))
 
 class WingsPickup:
-    def __init__(self, x, y):
+    __slots__ = ("rect", "phase", "px", "py")
+    def __init__(self, x, y, phase):
+        self.rect = pygame.Rect(x, y, *WING_PICKUP_SIZE)
+        self.reinit(x, y, phase)
+    def reinit(self, x, y, phase):
         w,h = WING_PICKUP_SIZE
-        self.rect = pygame.Rect(x, y, w, h); self.phase = random.random()*math.tau
+        self.rect.update(x, y, w, h); self.phase = phase
+        self.px = self.py = None
     def update(self, speed, t_ms):
         self.rect.x -= int(round(speed)); self.rect.y += int(1.4*math.sin(t_ms*0.01 + self.phase))
-    def draw(self, surf, scene):
-        r = self.rect
-        left = [(r.centerx-10, r.centery), (r.x, r.y+6), (r.x+12, r.bottom-6)]
-        right = [(r.centerx+10, r.centery), (r.right, r.y+6), (r.right-12, r.bottom-6)]
-        fill = (220,240,255) if scene!=SCENE_HELL else (240,210,210)
-        edge = (140,170,200) if scene!=SCENE_HELL else (170,120,120)
-        pygame.draw.polygon(surf, fill, left);  pygame.draw.polygon(surf, fill, right)
-        pygame.draw.polygon(surf, edge, left, 2); pygame.draw.polygon(surf, edge, right, 2)
+    def draw(self, surf, scene, alpha=1.0):
+        return sprites.draw(surf, lerp_rect(self.rect, self.px, self.py, alpha), (2, 2, 2, 2), _paint_wings_pickup, scene == SCENE_HELL)
+
+def _paint_wings_pickup(surf, r, hell):
+    left = [(r.centerx-10, r.centery), (r.x, r.y+6), (r.x+12, r.bottom-6)]
+    right = [(r.centerx+10, r.centery), (r.right, r.y+6), (r.right-12, r.bottom-6)]
+    fill = (220,240,255) if not hell else (240,210,210)
+    edge = (140,170,200) if not hell else (170,120,120)
+    pygame.draw.polygon(surf, fill, left);  pygame.draw.polygon(surf, fill, right)
+    pygame.draw.polygon(surf, edge, left, 2); pygame.draw.polygon(surf, edge, right, 2)
 
 class Portal:
     # kind: "hell" or "heaven"
-    def __init__(self, kind, x, y):
-        self.kind = kind
+    __slots__ = ("kind", "rect", "phase", "px", "py")
+    def __init__(self, kind, x, y, phase):
         self.rect = pygame.Rect(x, y, 70, 140)
-        self.phase = random.random()*math.tau
+        self.reinit(kind, x, y, phase)
+    def reinit(self, kind, x, y, phase):
+        self.kind = kind
+        self.rect.update(x, y, 70, 140)
+        self.phase = phase
+        self.px = self.py = None
     def update(self, speed, t_ms):
         self.rect.x -= int(round(speed))
-    def draw(self, surf):
-        r = self.rect
-        if self.kind == "hell":
-            core = (160, 0, 160)   # 紫色
-            border = (0, 0, 0)
-        else:
-            core = (80, 140, 255)  # 蓝核
-            border = (255, 255, 255)
-        pygame.draw.ellipse(surf, core, r.inflate(-12, -12))
-        pygame.draw.ellipse(surf, border, r, 6)
+    def draw(self, surf, alpha=1.0):
+        return sprites.draw(surf, lerp_rect(self.rect, self.px, self.py, alpha), (0, 0, 0, 0), _paint_portal, self.kind)
+
+def _paint_portal(surf, r, kind):
+    if kind == "hell":
+        core = (160, 0, 160)   # 紫色
+        border = (0, 0, 0)
+    else:
+        core = (80, 140, 255)  # 蓝核
+        border = (255, 255, 255)
+    pygame.draw.ellipse(surf, core, r.inflate(-12, -12))
+    pygame.draw.ellipse(surf, border, r, 6)
+
+# ================= 实体分道（broadphase） =================
+def _rect_x(e):
+    return e.rect.x
+
+class Lane:
+    # 同一类实体按 rect.x 升序存放。世界整体按同一速度左移，相对顺序不变，
+    # 所以只在插入时二分；碰撞/拾取/生成避让/清理都只看 x 区间内的几个。
+    # 兼做对象池：出界/被吃掉/被消除的实例进 free，new() 优先原地复用
+    def __init__(self, cls, items=()):
+        self.cls = cls
+        self.items = sorted(items, key=_rect_x)
+        self.max_w = max((e.rect.w for e in self.items), default=0)
+        self.free = []
+        self.made = self.reused = 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def new(self, *args):
+        # 取一个实例（不插入）；调用方可以先挪位置再 add()
+        if self.free:
+            e = self.free.pop()
+            e.reinit(*args)
+            self.reused += 1
+            return e
+        self.made += 1
+        return self.cls(*args)
+
+    def add(self, e):
+        bisect.insort_right(self.items, e, key=_rect_x)
+        if e.rect.w > self.max_w:
+            self.max_w = e.rect.w
+
+    def remove(self, e):
+        self.items.remove(e)
+        self.free.append(e)
+
+    def clear(self):
+        self.free.extend(self.items)
+        self.items.clear()
+
+    def _start(self, x):
+        # 第一个可能越过 x 的下标：更靠前的 right 一定 <= x
+        items = self.items
+        if not items or items[0].rect.x > x - self.max_w:
+            return 0
+        return bisect.bisect_right(items, x - self.max_w, key=_rect_x)
+
+    def query(self, rect):
+        # 与 rect 相交的全部实体（x 升序）
+        items, out = self.items, []
+        for i in range(self._start(rect.x), len(items)):
+            e = items[i]
+            if e.rect.x >= rect.right:
+                break
+            if rect.colliderect(e.rect):
+                out.append(e)
+        return out
+
+    def hit(self, rect):
+        # 第一个与 rect 相交的实体，没有返回 None
+        items = self.items
+        for i in range(self._start(rect.x), len(items)):
+            e = items[i]
+            if e.rect.x >= rect.right:
+                break
+            if rect.colliderect(e.rect):
+                return e
+        return None
+
+    def first_ahead(self, x):
+        # right > x 中最靠左的一个
+        items = self.items
+        for i in range(self._start(x), len(items)):
+            if items[i].rect.right > x:
+                return items[i]
+        return None
+
+    def nearest_center(self, x):
+        # centerx > x 中 centerx 最小的一个
+        items, best = self.items, None
+        for i in range(self._start(x), len(items)):
+            r = items[i].rect
+            if best is not None and r.x > best.rect.centerx:
+                break
+            if r.centerx > x and (best is None or r.centerx < best.rect.centerx):
+                best = items[i]
+        return best
+
+    def rightmost(self):
+        if not self.items:
+            return 0
+        items = self.items
+        return max(items[i].rect.right for i in range(self._start(items[-1].rect.x), len(items)))
+
+    def cull(self, limit):
+        # 回收 right <= limit 的；只有 x <= limit 的前缀可能出界，
+        # 通常就是开头一两个，直接从前面删，不重建列表
+        items = self.items
+        if not items or items[0].rect.x > limit:
+            return
+        n = bisect.bisect_right(items, limit, key=_rect_x)
+        keep = []
+        for i in range(n):
+            e = items[i]
+            if e.rect.right > limit:
+                keep.append(e)
+            else:
+                self.free.append(e)
+        items[:n] = keep
 
 # ================= Game =================
 class Game:
-    def __init__(self):
-        self.best = load_best()
-        self.reset()
-
-    def reset(self):
+    # headless=True：无背景、不读最高分文件，只跑逻辑（平衡/批量模拟用）；
+    # 写最高分/局记录不在 Game 里做，由 App 交给 store.ScoreStore 在后台写
+    # seed：本局种子（None = 随机）；同一种子 + 同一串输入 = 同一局
+    # rng：直接指定出怪/掉落用的随机源，覆盖 seed 的 sim 流（每局都用它）
+    # level：分段出怪（chunks.ChunkStream）；None = 原来的计时出怪
+    # ghost：幽灵赛跑（ghost.Ghost），每步记录兔子、画最好那局的轨迹；None = 不用
+    def __init__(self, headless=False, rng=None, seed=None, level=None, ghost=None):
+        self.headless = headless
+        self.fixed_rng = rng
+        self.level = level
+        self.ghost = ghost
+        self.bg = None if headless else Background()
+        self.best = 0 if headless else load_best()
+        self.obstacles = Lane(Obstacle)
+        self.carrots = Lane(Carrot)
+        self.wings = Lane(WingsPickup)
+        self.portals = Lane(Portal)
+        self.frozen = None
+        self.board = None  # 结束画面的排行榜 ((分数, kiosk), ...)，由 App 从 leaderboard 缓存填
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        self.streams = RngStreams(self.seed)
+        self.rng = self.fixed_rng if self.fixed_rng is not None else self.streams.sim
+        if self.bg is not None:
+            self.bg.reseed(self.streams)
+        self.ticks = 0  # 已执行的 update 步数（回放按它对齐输入）
         self.scene = SCENE_GRASS
-        self.player = Rabbit(180, GROUND_Y)
-        self.obstacles = []
-        self.carrots = []
-        self.wings = []
-        self.portals = []
+        self.player = Rabbit(180, GROUND_Y, self.streams.fx)
+        for lane in (self.obstacles, self.carrots, self.wings, self.portals):
+            lane.clear()
+        if self.level is not None:
+            self.level.reset()
+        self.distance = 0  # 世界已卷过的像素（障碍每步移动量之和），幽灵按它对齐横向位置
+        if self.ghost is not None:
+            self.ghost.reset(self)
         self.special_charges = 0  # 地狱=火球5发；天堂=魔法棒5次
         self.playing = True
         self.gameover = False
@@ -432,6 +1107,10 @@ class Game:
         # portals trigger
         self.spawned_hell_portal = False
         self.spawned_heaven_portal = False
+        # 冻结画面（复活倒计时/结束）：底图只合成一次
+        self.frozen_key = None
+        self.frozen_sec = None
+        self.frozen_rect = None
 
     # ---------- speed curve ----------
     def current_speed(self):
@@ -442,81 +1121,99 @@ class Game:
 
     # ---------- helpers ----------
     def rightmost_obstacle_x(self):
-        return max([o.rect.right for o in self.obstacles], default=0)
+        return self.obstacles.rightmost()
 
     def shift_x_to_avoid_overlap(self, rect, margin=120):
+        items = self.obstacles.items
         for _ in range(8):
             overlap = False
-            for o in self.obstacles:
-                if rect.colliderect(o.rect):
-                    rect.x = o.rect.right + margin
+            # rect 只会右移：起点之前的障碍不可能再碰到，越过 rect.right 后也不会
+            for i in range(self.obstacles._start(rect.x), len(items)):
+                o = items[i].rect
+                if o.x >= rect.right:
+                    break
+                if rect.colliderect(o):
+                    rect.x = o.right + margin
                     overlap = True
             if not overlap:
                 break
         return rect.x
 
+    def place_clear(self, rect, margin):
+        # 翅膀/传送门的落点：分段出怪时连同还没进场的障碍一起一次算好
+        if self.level is not None:
+            return self.level.clear_x(self, rect, margin)
+        if self.obstacles.hit(rect) is not None:
+            return self.shift_x_to_avoid_overlap(rect, margin)
+        return rect.x
+
     def destroy_front_obstacle(self):
         # 消除前方最近的障碍
-        ahead = [o for o in self.obstacles if o.rect.centerx > self.player.rect.centerx + 30]
-        if not ahead:
+        target = self.obstacles.nearest_center(self.player.rect.centerx + 30)
+        if target is None:
             return False
-        target = min(ahead, key=lambda o: o.rect.centerx)
         self.obstacles.remove(target)
         return True
 
     # ---------- spawners ----------
     def spawn_obstacle(self):
-        kind = random.choices(["rock", "fox"], weights=[0.64, 0.36], k=1)[0]
+        kind = self.rng.choices(["rock", "fox"], weights=[0.64, 0.36], k=1)[0]
         if kind == "rock":
-            w = random.randint(ROCK_W_MIN, ROCK_W_MAX)
-            h = random.randint(ROCK_H_MIN, ROCK_H_MAX)
-            rect = pygame.Rect(WIDTH + 40, GROUND_Y - h, w, h)
+            w = self.rng.randint(ROCK_W_MIN, ROCK_W_MAX)
+            h = self.rng.randint(ROCK_H_MIN, ROCK_H_MAX)
         else:
             w = FOX_W;
             h = FOX_H
-            rect = pygame.Rect(WIDTH + 40, GROUND_Y - h, w, h)
-        self.obstacles.append(Obstacle(kind, rect.x, rect.y, rect.w, rect.h))
+        self.obstacles.add(self.obstacles.new(kind, WIDTH + 40, GROUND_Y - h, w, h, self.rng.random()*math.tau))
 
     def spawn_carrots(self):
-        n = random.randint(CARROT_ROW_MIN, CARROT_ROW_MAX)
-        y = random.choice(CARROT_LOW_CHOICES)
+        n = self.rng.randint(CARROT_ROW_MIN, CARROT_ROW_MAX)
+        y = self.rng.choice(CARROT_LOW_CHOICES)
         start_x = WIDTH + 80
         rmo = self.rightmost_obstacle_x()
         if rmo > 0:
             start_x = max(start_x, rmo + 140)
         for i in range(n):
-            c = Carrot(start_x + i * 34, y + random.randint(-8, 8))
-            if any(c.rect.colliderect(o.rect) for o in self.obstacles):
+            c = self.carrots.new(start_x + i * 34, y + self.rng.randint(-8, 8))
+            if self.obstacles.hit(c.rect) is not None:
                 c.rect.x = self.shift_x_to_avoid_overlap(c.rect, margin=140)
-            self.carrots.append(c)
+            self.carrots.add(c)
 
     def schedule_wing_after_threshold(self):
-        self.pending_wing_at = self.time_ms + random.randint(*WING_JITTER_MS)
+        self.pending_wing_at = self.time_ms + self.rng.randint(*WING_JITTER_MS)
 
     def actually_spawn_wing(self):
-        y = random.choice([GROUND_Y - 180, GROUND_Y - 140, GROUND_Y - 110])
+        y = self.rng.choice([GROUND_Y - 180, GROUND_Y - 140, GROUND_Y - 110])
         x = WIDTH + 80
         rmo = self.rightmost_obstacle_x()
         if rmo > 0:
             x = max(x, rmo + 160)
-        w = WingsPickup(x, y)
-        if any(w.rect.colliderect(o.rect) for o in self.obstacles):
-            w.rect.x = self.shift_x_to_avoid_overlap(w.rect, margin=160)
-        self.wings.append(w)
+        w = self.wings.new(x, y, self.rng.random()*math.tau)
+        w.rect.x = self.place_clear(w.rect, margin=160)
+        self.wings.add(w)
 
     def spawn_portal(self, kind):
         x = WIDTH + 120
         y = GROUND_Y - 180
-        p = Portal(kind, x, y)
+        p = self.portals.new(kind, x, y, self.streams.fx.random()*math.tau)
         # 避开重叠
-        if any(p.rect.colliderect(o.rect) for o in self.obstacles):
-            p.rect.x = self.shift_x_to_avoid_overlap(p.rect, margin=200)
-        self.portals.append(p)
+        p.rect.x = self.place_clear(p.rect, margin=200)
+        self.portals.add(p)
 
     # ---------- update ----------
+    def snapshot(self):
+        # 每个固定步之前记下位置，渲染时在上一步和这一步之间插值
+        self.player.prev_y = self.player.y
+        for group in (self.obstacles, self.carrots, self.wings, self.portals):
+            for e in group.items:
+                e.px = e.rect.x; e.py = e.rect.y
+
     def update(self, dt, keys_held):
         if not self.playing or self.gameover:
             return
+        self.ticks += 1
+        if self.ghost is not None:
+            self.ghost.tick(self)
 
         if self.reviving:
             self.revive_timer -= dt
@@ -524,18 +1221,27 @@ class Game:
                 self.reviving = False
                 self.player.iframe_ms = POST_REVIVE_IFRAME_MS
             return
+        self.frozen_key = None
 
         self.time_ms += dt
         score_gain = dt * 0.035
         self.score += score_gain
 
         speed = self.current_speed()
-        bg.update(speed, dt)
+        self.distance += int(round(speed))
+        if self.bg is not None:
+            self.bg.update(speed, dt)
 
         # player physics
         space_held = keys_held.get("space", False)
         self.player.update_physics(dt, score_gain, space_held)
 
+        self.update_spawns(dt, speed)
+        self.update_entities(speed, dt)
+        self.update_collisions()
+
+    # update 的各阶段拆成方法，性能面板按方法计时
+    def update_spawns(self, dt, speed):
         # portals trigger
         if (self.score >= 3000) and (not self.spawned_hell_portal) and (self.scene == SCENE_GRASS):
             self.spawn_portal("hell");
@@ -555,53 +1261,58 @@ class Game:
                 self.actually_spawn_wing()
                 self.pending_wing_at = None
 
+        # 分段出怪；段库还没建到这一档时 stream() 返回 False，先用下面的计时出怪顶上
+        if self.level is not None and self.level.stream(self, speed):
+            return
+
         # spawn obstacles
         self.spawn_cd -= dt
         if self.spawn_cd <= 0:
             self.spawn_obstacle()
-            gap = random.randint(OBST_MIN_GAP, OBST_MAX_GAP) - int(self.score * OBST_GAP_SCORE_FACTOR)
+            gap = self.rng.randint(OBST_MIN_GAP, OBST_MAX_GAP) - int(self.score * OBST_GAP_SCORE_FACTOR)
             self.spawn_cd = max(1000, gap)
 
         # spawn carrots
         self.carrot_cd -= dt
         if self.carrot_cd <= 0:
             self.spawn_carrots()
-            self.carrot_cd = random.randint(1100, 1900)
+            self.carrot_cd = self.rng.randint(1100, 1900)
 
+    def update_entities(self, speed, dt):
         # move & clean
-        for o in self.obstacles:
+        for o in self.obstacles.items:
             o.update(speed, self.time_ms)
-        self.obstacles = [o for o in self.obstacles if o.rect.right > -80]
+        self.obstacles.cull(-80)
 
-        for c in self.carrots:
+        for c in self.carrots.items:
             c.update(speed, dt)
-        self.carrots = [c for c in self.carrots if c.rect.right > -40]
+        self.carrots.cull(-40)
 
-        for w in self.wings:
+        for w in self.wings.items:
             w.update(speed, self.time_ms)
-        self.wings = [w for w in self.wings if w.rect.right > -40]
+        self.wings.cull(-40)
 
-        for p in self.portals:
+        for p in self.portals.items:
             p.update(speed, self.time_ms)
-        self.portals = [p for p in self.portals if p.rect.right > -40]
+        self.portals.cull(-40)
 
+    def update_collisions(self):
         # --------- 碰撞/拾取 ----------
         prect = self.player.rect
 
         # 传送门
-        for p in self.portals[:]:
-            if prect.colliderect(p.rect):
-                self.portals.remove(p)
-                if p.kind == "hell":
-                    self.scene = SCENE_HELL
-                    self.special_charges = 5  # 火球5发
-                else:
-                    self.scene = SCENE_HEAVEN
-                    self.special_charges = 5  # 魔法棒5次
-                break
+        p = self.portals.hit(prect)
+        if p is not None:
+            self.portals.remove(p)
+            if p.kind == "hell":
+                self.scene = SCENE_HELL
+                self.special_charges = 5  # 火球5发
+            else:
+                self.scene = SCENE_HEAVEN
+                self.special_charges = 5  # 魔法棒5次
 
         # 碰障碍（飞行≠无敌；只有SUPER无敌）
-        hit_obstacle = any(prect.colliderect(o.rect) for o in self.obstacles)
+        hit_obstacle = self.obstacles.hit(prect) is not None
         if hit_obstacle and (not self.player.super_active) and (self.player.iframe_ms <= 0):
             if not self.revive_used:
                 self.revive_used = True
@@ -610,142 +1321,776 @@ class Game:
             else:
                 self.gameover = True
                 self.best = max(self.best, int(self.score))
-                save_best(self.best)
 
         # 胡萝卜→能量
-        for c in self.carrots[:]:
-            if prect.colliderect(c.rect):
-                self.carrots.remove(c)
-                self.coins += 1
-                self.score += 10
-                if not self.player.super_active:
-                    self.energy = min(50, self.energy + 1)
-                    if self.energy >= 50:
-                        self.energy = 0
-                        self.player.start_super()
+        for c in self.carrots.query(prect):
+            self.carrots.remove(c)
+            self.coins += 1
+            self.score += 10
+            if not self.player.super_active:
+                self.energy = min(50, self.energy + 1)
+                if self.energy >= 50:
+                    self.energy = 0
+                    self.player.start_super()
 
         # 翅膀
-        for w in self.wings[:]:
-            if prect.colliderect(w.rect):
-                self.wings.remove(w)
-                self.player.give_wings()
+        for w in self.wings.query(prect):
+            self.wings.remove(w)
+            self.player.give_wings()
+
+    # ---------- input ----------
+    def press_jump(self, keys_held):
+        if not self.gameover and not self.reviving:
+            self.player.start_jump()
+            keys_held["space"] = True
+            self.player.set_jump_hold(True)
+
+    def release_jump(self, keys_held):
+        keys_held["space"] = False
+        self.player.release_jump()
+        self.player.set_jump_hold(False)
+
+    def use_special(self):
+        if (not self.gameover) and (not self.reviving) and self.special_charges > 0:
+            if self.destroy_front_obstacle():
+                self.special_charges -= 1
 
 # ---------- draw ----------
+    # 各 draw_* 返回本帧画过的区域（分层渲染器据此做脏矩形）
     def draw_energy_bar(self, surf):
         # 右上角能量条：0..50
         bar_w, bar_h = 220, 20
         x, y = WIDTH - bar_w - 18, 14
-        pygame.draw.rect(surf, (235, 235, 235), (x, y, bar_w, bar_h), border_radius=8)
+        r = pygame.draw.rect(surf, (235, 235, 235), (x, y, bar_w, bar_h), border_radius=8)
         pygame.draw.rect(surf, (120, 120, 120), (x, y, bar_w, bar_h), 2, border_radius=8)
         fill = int(bar_w * (self.energy / 50.0))
         if fill > 0:
             pygame.draw.rect(surf, (255, 170, 70), (x, y, fill, bar_h), border_radius=8)
-        lbl = font.render("Energy (50 carrots → SUPER)", True, (10, 25, 10))
-        surf.blit(lbl, (x, y + bar_h + 6))
+        lbl = text_cache.render(font, "Energy (50 carrots → SUPER)", (10, 25, 10))
+        return [r, surf.blit(lbl, (x, y + bar_h + 6))]
 
-    def draw_timers_bottom_left(self, surf):
-        # 左下角：Wings剩余秒、Super剩余秒、特殊道具次数
+    def timer_lines(self):
+        # 左下角：Wings剩余秒、Super剩余秒、特殊道具次数（文字段 + 数字）
         lines = []
         if self.player.has_wings:
             sec = wings_seconds_left(self.player.wing_score_left)
-            lines.append(f"Wings: {sec}s")
+            lines.append(("Wings: ", sec, "s"))
         if self.player.super_active:
             sec2 = max(0, int(self.player.super_timer / 1000 + 0.5))
-            lines.append(f"SUPER: {sec2}s")
+            lines.append(("SUPER: ", sec2, "s"))
         if self.scene == SCENE_HELL and self.special_charges > 0:
-            lines.append(f"Fireballs: {self.special_charges}")
+            lines.append(("Fireballs: ", self.special_charges))
         if self.scene == SCENE_HEAVEN and self.special_charges > 0:
-            lines.append(f"Wand: {self.special_charges}")
+            lines.append(("Wand: ", self.special_charges))
+        return lines
+
+    def draw_timers_bottom_left(self, surf):
+        lines = self.timer_lines()
+        rects = []
         if lines:
             x, y = 16, HEIGHT - 20 - len(lines) * 26
-            for i, text in enumerate(lines):
-                label = font.render(text, True, (0, 0, 0))
-                surf.blit(label, (x, y + i * 26))
+            for i, parts in enumerate(lines):
+                rects.append(text_cache.blit_parts(surf, font, (0, 0, 0), parts, (x, y + i * 26)))
+        return rects
 
-    def draw(self, surf):
-        bg.draw(surf, self.scene)
-        for c in self.carrots: c.draw(surf, self.scene)
-        for o in self.obstacles: o.draw(surf, self.scene)
-        for w in self.wings: w.draw(surf, self.scene)
-        for p in self.portals: p.draw(surf)
-        self.player.draw(surf, self.time_ms, self.scene)
-
-        # HUD
+    def hud_parts(self):
         best_val = getattr(self, 'best', 0)
-        hud = font.render(
-            f"Score: {int(self.score)}   Carrots: {self.coins}   Best: {best_val}"
-            + ("" if not self.player.has_wings else "   Wings: ON")
-            + ("" if not self.player.super_active else "   SUPER!"),
-            True, (10, 25, 10) if self.scene != SCENE_HELL else (235, 220, 220)
-        )
-        surf.blit(hud, (12, 14))
-        self.draw_energy_bar(surf)
-        self.draw_timers_bottom_left(surf)
-
+        return (("Score: ", int(self.score), "   Carrots: ", self.coins, "   Best: ", best_val)
+                + (() if not self.player.has_wings else ("   Wings: ON",))
+                + (() if not self.player.super_active else ("   SUPER!",)))
+
+    def hud_key(self):
+        # HUD 上显示的所有值；不变就不用重画
+        return (self.hud_parts(), self.energy, tuple(self.timer_lines()), self.scene == SCENE_HELL)
+
+    def draw_entities(self, surf, alpha=1.0):
+        rects = []
+        for c in self.carrots: rects.append(c.draw(surf, self.scene, alpha))
+        rng = self.streams.render
+        for o in self.obstacles: rects.append(o.draw(surf, self.scene, alpha, rng))
+        for w in self.wings: rects.append(w.draw(surf, self.scene, alpha))
+        for p in self.portals: rects.append(p.draw(surf, alpha))
+        if self.ghost is not None:
+            rects.extend(self.ghost.draw(surf, self, alpha))
+        rects.extend(self.player.draw(surf, self.time_ms, self.scene, alpha))
+        return rects
+
+    def draw_hud(self, surf):
+        col = (10, 25, 10) if self.scene != SCENE_HELL else (235, 220, 220)
+        rects = [text_cache.blit_parts(surf, font, col, self.hud_parts(), (12, 14))]
+        rects += self.draw_energy_bar(surf)
+        rects += self.draw_timers_bottom_left(surf)
+        return rects
+
+    def draw_overlays(self, surf):
+        # 遮罩 + 静态文字；复活倒计时数字单独画（draw_countdown）
         if self.reviving:
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 230) if self.scene != SCENE_HELL else (0, 0, 0, 200))
-            surf.blit(overlay, (0, 0))
-            sec = max(1, math.ceil(self.revive_timer / 1000))
-            txt = big_font.render(f"{sec}", True, (220, 0, 0))
-            surf.blit(txt, txt.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
+            surf.blit(overlay_surface((255, 255, 255, 230) if self.scene != SCENE_HELL else (0, 0, 0, 200)), (0, 0))
 
         if self.gameover:
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 210))
-            surf.blit(overlay, (0, 0))
-            title = big_font.render("GAME OVER", True, (220, 0, 0))
+            surf.blit(overlay_surface((255, 255, 255, 210)), (0, 0))
+            title = text_cache.render(big_font, "GAME OVER", (220, 0, 0))
             surf.blit(title, title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40)))
-            msg = font.render("Press SPACE to restart  |  ESC to quit", True, (0, 0, 0))
+            msg = text_cache.render(font, "Press SPACE to restart  |  ESC to quit", (0, 0, 0))
             surf.blit(msg, msg.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 20)))
+            for i, (score, kiosk) in enumerate(self.board or ()):
+                text_cache.blit_parts(surf, font, (40, 40, 40), (i + 1, ".  ", score, "   ", kiosk),
+                                      center=(WIDTH // 2, HEIGHT // 2 + 70 + i * 28))
+
+    def countdown_sec(self):
+        return max(1, math.ceil(self.revive_timer / 1000))
+
+    def draw_countdown(self, surf, sec):
+        return text_cache.blit_parts(surf, big_font, (220, 0, 0), (sec,), center=(WIDTH // 2, HEIGHT // 2))
+
+    def draw_frozen(self, surf):
+        # 复活/结束时世界静止：背景+实体+HUD+遮罩合成一张底图（只做一次），
+        # 之后只在倒计时数字变化时补画那一小块。返回需要提交的区域
+        key = (self.gameover, self.scene, self.board if self.gameover else None)
+        dirty = []
+        if self.frozen_key != key:
+            frozen = self.frozen
+            if frozen is None:
+                frozen = self.frozen = pygame.Surface((WIDTH, HEIGHT))
+                if pygame.display.get_surface() is not None:
+                    self.frozen = frozen = frozen.convert()
+            self.bg.draw(frozen, self.scene)
+            self.draw_entities(frozen)
+            self.draw_hud(frozen)
+            self.draw_overlays(frozen)
+            self.frozen_key, self.frozen_sec, self.frozen_rect = key, None, None
+            dirty.append(surf.blit(frozen, (0, 0)))
+        if self.reviving:
+            sec = self.countdown_sec()
+            if sec != self.frozen_sec:
+                if self.frozen_rect is not None:
+                    dirty.append(surf.blit(self.frozen, self.frozen_rect, self.frozen_rect))
+                self.frozen_rect = self.draw_countdown(surf, sec)
+                self.frozen_sec = sec
+                dirty.append(self.frozen_rect)
+        return dirty
+
+    def draw(self, surf, alpha=1.0):
+        if self.reviving or self.gameover:
+            self.draw_frozen(surf)
+            return
+        self.bg.draw(surf, self.scene, alpha)
+        self.draw_entities(surf, alpha)
+        self.draw_hud(surf)
+
+# ================= Layered renderer =================
+class LayeredRenderer:
+    # 可选的分层渲染（--renderer layered）：
+    #   天空层：缓存整张（sky_surface），只在下面几类矩形里按区域拷回
+    #   视差层：滚动层的横带 + 云/鸟的包围盒（Background.moving_rects），上一帧和本帧的都要恢复、重画、提交
+    #   实体层：精灵 blit，提交上一帧和本帧的包围盒
+    #   HUD 层：文字变化时才重新合成，平时从缓存层按区域拷贝（底下先恢复天空，半透明边缘不会越叠越深）
+    # 别处画面和上一帧一样，不动也不提交。场景淡入时整屏重画；
+    # 复活/结束画面交给 Game.draw_frozen（只提交变化的数字）。
+    def __init__(self, screen):
+        self.screen = screen
+        self.hud = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        self.hud_key = None
+        self.hud_rects = []
+        self.prev_rects = []
+        self.prev_moving = []
+        self.prev_fading = False
+        self.prev_overlay = False
+        self.full_rect = pygame.Rect(0, 0, WIDTH, HEIGHT)
+
+    def _hud_layer(self, game):
+        key = game.hud_key()
+        if key == self.hud_key:
+            return []
+        old = self.hud_rects
+        self.hud.fill((0, 0, 0, 0))
+        self.hud_rects = game.draw_hud(self.hud)
+        self.hud_key = key
+        return old + self.hud_rects
+
+    def render(self, game, alpha=1.0):
+        surf = self.screen
+        if game.reviving or game.gameover:
+            self.prev_overlay = True
+            dirty = game.draw_frozen(surf)
+            if dirty:
+                show(dirty)
+            return dirty
+        bg = game.bg
+        # 淡入期间天空每帧都变；淡入结束那一帧天空换成最终那张，也要整屏
+        fading = bg.fading() or game.scene != bg.scene
+        full = self.prev_overlay or not self.prev_rects or fading or self.prev_fading
+        self.prev_overlay, self.prev_fading = False, fading
+        hud_dirty = self._hud_layer(game)
+
+        moving = bg.moving_rects(alpha)
+        band = moving[0]
+        # 横带装不下的：云/鸟（本帧和上一帧）、上一帧的实体（兔耳朵、幽灵可能在横带上面）、HUD
+        dirty = [r for r in moving[1:] + self.prev_moving + self.prev_rects if not band.contains(r)]
+        hud = [r for r in hud_dirty + self.hud_rects if not band.contains(r)]
+        bg.draw(surf, game.scene, alpha, None if full else [band] + dirty + hud)
+        self.prev_moving = moving[1:]
+
+        ents = game.draw_entities(surf, alpha)
+        for r in self.hud_rects:
+            surf.blit(self.hud, r, r)
+
+        if full or None in ents:
+            dirty = [self.full_rect]
+        else:
+            dirty = [band] + dirty + [r for r in ents + hud_dirty if not band.contains(r)]
+        # 有实体报不出包围盒（None）时，下一帧也整屏重画
+        self.prev_rects = [] if None in ents else ents
+        show(dirty)
+        return dirty
+
+# ================= Profiler =================
+# (挂载路径, 显示名)；开启时把这些方法换成计时包装，关掉时删掉包装，平时零开销
+PROFILE_HOOKS = (
+    ("update", "update"),
+    ("player.update_physics", "physics"),
+    ("update_spawns", "spawn"),
+    ("update_entities", "entities"),
+    ("update_collisions", "collide"),
+    ("bg.update", "bg.update"),
+    ("bg.draw", "draw.bg"),
+    ("draw_entities", "draw.entities"),
+    ("draw_hud", "draw.hud"),
+    ("draw_overlays", "draw.overlays"),
+)
+PROFILE_ROWS = [name for _, name in PROFILE_HOOKS] + ["render", "flip", "frame"]
+
+class Profiler:
+    # F3 开关（--profile 启动即开），F4 导出 Chrome trace（chrome://tracing / ui.perfetto.dev）
+    # 每个阶段按帧累计耗时，保留最近 window 帧算 p50/p95/p99
+    def __init__(self, window=240, trace_events=60000):
+        self.enabled = False
+        self.window = window
+        self.samples = {}
+        self.frame = {}
+        self.counts = deque(maxlen=window)
+        self.trace = deque(maxlen=trace_events)      # (name, start, end)
+        self.count_trace = deque(maxlen=trace_events // 8)  # (t, 实体数)
+        self.t0 = time.perf_counter()
+        self.last_frame = None
+        self.hooked = []
+        self.player = None
+        self.panel = None
+        self.panel_at = 0.0
+        self.small = None
+
+    # ---------- hooks ----------
+    def timed(self, name, fn):
+        perf, frame, trace = time.perf_counter, self.frame, self.trace
+        def wrapper(*args, **kwargs):
+            start = perf()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end = perf()
+                frame[name] = frame.get(name, 0.0) + (end - start) * 1000.0
+                trace.append((name, start, end))
+        return wrapper
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.frame[name] = self.frame.get(name, 0.0) + (end - start) * 1000.0
+            self.trace.append((name, start, end))
+
+    def _hook(self, obj, attr, name):
+        setattr(obj, attr, self.timed(name, getattr(obj, attr)))
+        self.hooked.append((obj, attr))
+
+    def attach(self, game):
+        for path, name in PROFILE_HOOKS:
+            owner, _, attr = path.rpartition(".")
+            obj = getattr(game, owner) if owner else game
+            if obj is not None:
+                self._hook(obj, attr, name)
+        self.player = game.player
+
+    def detach(self):
+        for obj, attr in self.hooked:
+            delattr(obj, attr)
+        self.hooked = []
+        self.player = None
+
+    def toggle(self, game):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.samples, self.frame, self.last_frame = {}, {}, None
+            self.attach(game)
+        else:
+            self.detach()
 
-# ================= Main Loop =================
-def _run():
-    game = Game()
-    keys_held = {"space": False}
+    # ---------- per frame ----------
+    def end_frame(self, game):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame["frame"] = (now - self.last_frame) * 1000.0
+        self.last_frame = now
+        # 固定步长下有的帧不跑 update：没出现的阶段记 0
+        for name in PROFILE_ROWS:
+            dq = self.samples.get(name)
+            if dq is None:
+                dq = self.samples[name] = deque(maxlen=self.window)
+            dq.append(self.frame.get(name, 0.0))
+        # timed() 的闭包拿着同一个 dict，只能原地清空
+        self.frame.clear()
+        n = len(game.obstacles) + len(game.carrots) + len(game.wings) + len(game.portals)
+        self.counts.append(n)
+        self.count_trace.append((now, n))
+        if game.player is not self.player:
+            # reset() 换了新兔子：把物理计时挂到新实例上
+            self.hooked = [(o, a) for o, a in self.hooked if o is not self.player]
+            self._hook(game.player, "update_physics", "physics")
+            self.player = game.player
+
+    def stats(self):
+        out = {}
+        for name in PROFILE_ROWS:
+            vals = sorted(self.samples.get(name, ()))
+            if vals:
+                n = len(vals) - 1
+                out[name] = tuple(vals[min(n, int(q * len(vals)))] for q in (0.50, 0.95, 0.99))
+        return out
+
+    def export_trace(self, path="trace.json"):
+        import json
+        us = lambda t: (t - self.t0) * 1e6
+        events = [{"name": n, "ph": "X", "ts": us(a), "dur": (b - a) * 1e6, "pid": 1, "tid": 1}
+                  for n, a, b in self.trace]
+        events += [{"name": "entities", "ph": "C", "ts": us(t), "pid": 1, "args": {"count": n}}
+                   for t, n in self.count_trace]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
 
-    clock_tick = clock.tick
-    while True:
-        dt = clock_tick(FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit();
-                sys.exit()
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pygame.quit();
-                    sys.exit()
-                if not game.gameover and not game.reviving:
-                    if event.key in (pygame.K_SPACE, pygame.K_UP, pygame.K_w):
-                        game.player.start_jump()
-                        keys_held["space"] = True
-                        game.player.set_jump_hold(True)
-                elif game.gameover:
-                    if event.key in (pygame.K_SPACE, pygame.K_r):
-                        game.reset()
-                        keys_held["space"] = False
-
-            if event.type == pygame.KEYUP:
-                if event.key in (pygame.K_SPACE, pygame.K_UP, pygame.K_w):
+    # ---------- overlay ----------
+    def draw(self, surf):
+        # 右侧面板：帧时间柱状图 + 各阶段分位数表（表格每 250ms 重排一次）
+        if self.small is None:
+            self.small = pygame.font.Font(None, 20)
+        now = time.perf_counter()
+        if self.panel is None or now - self.panel_at > 0.25:
+            self.panel = self._build_panel()
+            self.panel_at = now
+        x, y = WIDTH - self.panel.get_width() - 10, 70
+        rect = surf.blit(self.panel, (x, y))
+        gx, gy, gw, gh = x + 8, rect.bottom - 58, self.panel.get_width() - 16, 50
+        frames = self.samples.get("frame", ())
+        bar = gw / self.window
+        for i, ms in enumerate(frames):
+            h = min(gh, int(ms / 33.4 * gh))
+            col = (90, 220, 120) if ms <= STEP_MS + 1 else (240, 200, 60) if ms <= 2 * STEP_MS else (240, 80, 80)
+            pygame.draw.line(surf, col, (gx + int(i * bar), gy + gh), (gx + int(i * bar), gy + gh - h))
+        pygame.draw.line(surf, (200, 200, 200), (gx, gy + gh // 2), (gx + gw, gy + gh // 2))
+        return rect
+
+    def _build_panel(self):
+        f, rows = self.small, self.stats()
+        w, line = 290, 15
+        lines = 1 + len(PROFILE_ROWS) + 2
+        panel = pygame.Surface((w, 12 + lines * line + 62))
+        panel.fill((20, 24, 30))
+        cols = (8, 140, 190, 240)
+        for cx, txt in zip(cols, ("ms / frame", "p50", "p95", "p99")):
+            panel.blit(f.render(txt, True, (160, 200, 255)), (cx, 6))
+        y = 6 + line + 4
+        for name in PROFILE_ROWS:
+            if name in rows:
+                panel.blit(f.render(name, True, (220, 220, 220)), (cols[0], y))
+                for cx, v in zip(cols[1:], rows[name]):
+                    panel.blit(f.render(f"{v:.2f}", True, (220, 220, 220)), (cx, y))
+                y += line
+        counts = sorted(self.counts)
+        if counts:
+            panel.blit(f.render(f"entities  now {self.counts[-1]}  p95 {counts[int(0.95 * (len(counts) - 1))]}",
+                                True, (220, 220, 220)), (cols[0], y + 4))
+        cs = cache_stats()
+        panel.blit(f.render(f"sprite hit {cs['sprite_hit_rate']:.1%}   text hit {cs['text_hit_rate']:.1%}",
+                            True, (220, 220, 220)), (cols[0], y + 4 + line))
+        return panel
+
+# ================= 启动预热 =================
+WARMUP_BUDGET_MS = 8             # 启动画面每帧最多花在预热上的时间
+IDLE_BUDGET_MS = 4               # 网页上：每帧最多花在后台活（段库）上的时间
+
+def warmup_jobs():
+    # 首帧先出启动画面，再分帧建缓存，进游戏后不再有首次构建的卡顿。
+    # 返回 (开局前必须建好的, 开局后每帧顺手建一个的)
+    jobs, later = [], []
+    jobs.append(lambda: sky_surface(SCENE_GRASS))
+    jobs.extend(lambda l=layer: l.strip(SCENE_GRASS) for layer in PARALLAX_LAYERS)
+    for scene in (SCENE_HELL, SCENE_HEAVEN):
+        later.append(lambda s=scene: sky_surface(s))
+        later.extend(lambda l=layer, s=scene: l.strip(s) for layer in PARALLAX_LAYERS)
+    for a, b in ((SCENE_GRASS, SCENE_HELL), (SCENE_HELL, SCENE_HEAVEN), (SCENE_GRASS, SCENE_HEAVEN)):
+        for k in range(SKY_FADE_STEPS):
+            later.append(lambda a=a, b=b, k=k: sky_surface(b, a, k / SKY_FADE_STEPS))
+    for rgba in ((255, 255, 255, 230), (0, 0, 0, 200), (255, 255, 255, 210)):
+        jobs.append(lambda c=rgba: overlay_surface(c))
+    jobs.append(lambda: [text_cache.render(big_font, str(sec), (220, 0, 0)) for sec in (3, 2, 1)])
+    jobs.append(lambda: text_cache.render(font, "Energy (50 carrots → SUPER)", (10, 25, 10)))
+    jobs.append(lambda: text_cache.render(big_font, "GAME OVER", (220, 0, 0)))
+    # 兔子：普通/SUPER × 翅膀 × 耳朵 9 帧
+    super_size = (int(RABBIT_W * SUPER_SCALE), int(RABBIT_H * SUPER_SCALE))
+    for size, sup in (((RABBIT_W, RABBIT_H), False), (super_size, True)):
+        for wings in (False, True):
+            jobs.append(lambda size=size, sup=sup, wings=wings:
+                        [sprites.get(size, RABBIT_PAD, _paint_rabbit, sup, wings, wob) for wob in range(-4, 5)])
+    for hell in (False, True):
+        jobs.append(lambda h=hell: (sprites.get((22, 32), (4, 16, 6, 2), _paint_carrot, h),
+                                    sprites.get(WING_PICKUP_SIZE, (2, 2, 2, 2), _paint_wings_pickup, h),
+                                    sprites.get((FOX_W, FOX_H), (16, 18, 16, 6), _paint_fox, h),
+                                    sprites.get((52, 8), (0, 0, 0, 0), _paint_shadow,
+                                                (65,85,65) if not h else (110,50,50))))
+    for kind in ("hell", "heaven"):
+        later.append(lambda k=kind: sprites.get((70, 140), (0, 0, 0, 0), _paint_portal, k))
+    return jobs, later
+
+def draw_splash(surf, progress):
+    surf.fill((200, 230, 255))
+    title = text_cache.render(big_font, "HAPPY RABBIT", (40, 90, 40))
+    surf.blit(title, title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40)))
+    bar = pygame.Rect(WIDTH // 2 - 150, HEIGHT // 2 + 20, 300, 14)
+    pygame.draw.rect(surf, (255, 255, 255), bar, border_radius=7)
+    pygame.draw.rect(surf, (255, 170, 70), (bar.x, bar.y, int(bar.w * progress), bar.h), border_radius=7)
+    pygame.draw.rect(surf, (120, 120, 120), bar, 2, border_radius=7)
+
+# ================= Main Loop =================
+class FixedStep:
+    # 累加器：模拟永远按 STEP_MS 走，和渲染帧率无关；
+    # 返回 alpha = 剩余时间 / STEP_MS，供渲染插值
+    def __init__(self, step_ms=STEP_MS, max_frame_ms=MAX_FRAME_MS):
+        self.step_ms = step_ms
+        self.max_frame_ms = max_frame_ms
+        self.acc = 0.0
+        self.ticks = 0
+
+    def advance(self, game, frame_ms, keys_held):
+        self.acc += min(frame_ms, self.max_frame_ms)
+        while self.acc >= self.step_ms:
+            game.snapshot()
+            game.update(self.step_ms, keys_held)
+            self.acc -= self.step_ms
+            self.ticks += 1
+        return self.acc / self.step_ms
+
+WEB = sys.platform == "emscripten"
+JUMP_KEYS = (pygame.K_SPACE, pygame.K_UP, pygame.K_w)
+
+def tab_hidden():
+    # 浏览器标签页在后台？pygbag 下 platform.window 就是 JS 的 window
+    if not WEB:
+        return False
+    try:
+        import platform
+        return bool(platform.window.document.hidden)
+    except Exception:
+        return False
+
+class App:
+    # 桌面循环（_run）和浏览器 async 循环（main）共用的一帧：事件 → 固定步长模拟 → 渲染
+    def __init__(self, renderer="flip", record=None, seed=None, profile=False, startup_probe=False, chunks=False,
+                 leaderboard=None, ghost=False, scaling=None, window=None):
+        init_display(scaling, window)
+        # 启动画面 + 分帧预热；startup 记录 首帧/可玩 的时间（ms，从 STARTUP_T0 起）
+        self.jobs, self.later_jobs = warmup_jobs()
+        self.startup = {}
+        self.startup_probe = startup_probe
+        # --chunks：分段出怪；第 0 档在启动画面里建好，之后桌面上由后台线程、
+        # 网页上（没有线程）由空闲帧按预算往前建到 当前档 + 1；帧线程从不现建，没建好的档先用计时出怪
+        self.level = None
+        if chunks:
+            import chunks as chunks_mod
+            self.level = chunks_mod.ChunkStream(block=False)
+            self.jobs.append(self.build_chunks)
+            if not WEB:
+                self.level.library.start_worker()
+        # --ghost：和最好的那局的幽灵一起跑（ghost.py）
+        self.ghost = None
+        if ghost:
+            import ghost as ghost_mod
+            self.ghost = ghost_mod.Ghost()
+        # Game 建背景时才 import numpy，放到首帧之后的第一个预热任务里
+        self.game = None
+        self.jobs.insert(0, lambda: self.start(seed, profile))
+        self.jobs_total = len(self.jobs)
+        # 最高分 + 局记录（runs.db）：帧里只入队，落盘在写线程；网页上没有线程，用空闲帧写
+        self.store = None
+        # --leaderboard URL：多台 kiosk 共用的榜单；提交和取榜都在后台线程，服务不在也照常玩
+        self.board = None
+        if leaderboard and not WEB:
+            import leaderboard as leaderboard_mod
+            self.board = leaderboard_mod.LeaderboardClient(leaderboard)
+            self.board.start()
+        self.keys_held = {"space": False}
+        self.layered = LayeredRenderer(screen) if renderer == "layered" else None
+        self.stepper = FixedStep()
+        self.prof = Profiler()
+        self.running = True
+        self.paused = False
+        self.minimized = False
+
+        # --record DIR：每局的种子 + 输入写成 DIR/<seed>.hrp（见 replay.py）
+        self.record = record
+        self.recorder = None
+
+    def start(self, seed, profile):
+        self.game = Game(seed=seed, level=self.level, ghost=self.ghost)
+        self.open_store()
+        if profile:
+            self.prof.toggle(self.game)
+        if self.record:
+            os.makedirs(self.record, exist_ok=True)
+            self.new_recorder()
+
+    # ---------- replay ----------
+    def new_recorder(self):
+        if self.record:
+            import replay
+            self.recorder = replay.Recorder(self.game.seed)
+
+    def log(self, action):
+        if self.recorder is not None:
+            self.recorder.event(self.game.ticks, action)
+
+    def save_replay(self):
+        game = self.game
+        if self.recorder is not None and game.ticks:
+            self.recorder.save(os.path.join(self.record, f"{game.seed}.hrp"), game.ticks, game.score)
+
+    def quit(self):
+        if not self.game.gameover:
+            self.save_replay()
+        if self.store is not None:
+            self.store.close()
+        if self.board is not None:
+            self.board.close()
+        if self.ghost is not None:
+            self.ghost.close()
+        self.running = False
+
+    def build_chunks(self):
+        # 预热任务：每次只做一小步，第 0 档没建完就把自己排回队尾
+        lib = self.level.library
+        lib.step(upto=0)
+        if not lib.ready(0):
+            self.jobs.append(self.build_chunks)
+
+    # ---------- scores ----------
+    def open_store(self):
+        import store
+        self.store = store.ScoreStore()
+        if not WEB:
+            self.store.start()
+
+    # ---------- input ----------
+    def handle(self, event):
+        game, keys_held = self.game, self.keys_held
+        if event.type == pygame.QUIT:
+            self.quit()
+
+        if event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            self.minimized = True
+        if event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWEXPOSED):
+            self.minimized = False
+
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.quit()
+            if event.key == pygame.K_F3:
+                self.prof.toggle(game)
+                # 面板收起后整屏重画一次
+                game.frozen_key = None
+                if self.layered is not None:
+                    self.layered.prev_rects = []
+            if event.key == pygame.K_F4 and self.prof.enabled:
+                print("trace written:", self.prof.export_trace(f"trace-{int(time.time())}.json"))
+            if not game.gameover and not game.reviving:
+                if event.key in JUMP_KEYS:
+                    self.log("down")
+                    game.press_jump(keys_held)
+            elif game.gameover:
+                if event.key in (pygame.K_SPACE, pygame.K_r):
+                    game.reset()
                     keys_held["space"] = False
-                    game.player.release_jump()
-                    game.player.set_jump_hold(False)
+                    self.new_recorder()
 
-            # 左键使用特殊道具
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if (not game.gameover) and (not game.reviving) and game.special_charges > 0:
-                    if game.destroy_front_obstacle():
-                        game.special_charges -= 1
+        if event.type == pygame.KEYUP:
+            if event.key in JUMP_KEYS:
+                self.log("up")
+                game.release_jump(keys_held)
 
-        game.update(dt, keys_held)
-        game.draw(screen)
-        pygame.display.flip()
+        # 左键使用特殊道具
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.log("special")
+            game.use_special()
+
+    # ---------- frame ----------
+    def warm_frame(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                self.running = False
+        deadline = time.perf_counter() + WARMUP_BUDGET_MS / 1000.0
+        if self.startup:
+            while self.jobs and time.perf_counter() < deadline:
+                self.jobs.pop(0)()
+        draw_splash(screen, 1.0 - len(self.jobs) / self.jobs_total)
+        show()
+        if presenter is not None:
+            presenter.present()
+        now = (time.perf_counter() - STARTUP_T0) * 1000.0
+        if not self.startup:
+            self.startup["first_frame_ms"] = now
+            if self.startup_probe:
+                print(f"first_frame {now:.1f}", flush=True)
+        elif not self.jobs:
+            self.startup["ready_ms"] = now
+            self.stepper.acc = 0.0
+            if self.startup_probe:
+                print(f"ready {now:.1f}", flush=True)
+                self.running = False
+
+    def frame(self, frame_ms):
+        if self.jobs or not self.startup:
+            self.warm_frame()
+            return
+        for event in pygame.event.get():
+            self.handle(event)
+        if not self.running:
+            return
+
+        # 最小化/标签页在后台：不模拟不渲染；回来时丢掉这段时间，不补步
+        paused = self.minimized or tab_hidden()
+        if paused:
+            if not self.paused and self.keys_held["space"]:
+                self.log("up")
+                self.game.release_jump(self.keys_held)
+            self.paused = True
+            return
+        if self.paused:
+            self.paused = False
+            self.stepper.acc = 0.0
+            frame_ms = 0
+
+        game, prof, layered = self.game, self.prof, self.layered
+        was_over = game.gameover
+        alpha = self.stepper.advance(game, frame_ms, self.keys_held)
+        if game.gameover and not was_over:
+            self.save_replay()
+            if self.store is not None:
+                self.store.submit(game)
+            if self.board is not None:
+                self.board.submit(game)
+            if self.ghost is not None:
+                self.ghost.finish(game)
+        if game.gameover and self.board is not None:
+            game.board = self.board.top()
+        with prof.section("render"):
+            if layered is not None:
+                layered.render(game, alpha)
+            else:
+                game.draw(screen, alpha)
+        if prof.enabled:
+            panel = prof.draw(screen)
+            if layered is not None:
+                show(panel)
+        with prof.section("flip"):
+            if layered is None:
+                show()
+            if presenter is not None:
+                presenter.present()
+        if self.later_jobs:
+            self.later_jobs.pop(0)()
+        elif WEB:
+            if self.store is not None:
+                self.store.step()
+            if self.level is not None:
+                self.level.library.step(IDLE_BUDGET_MS)
+        prof.end_frame(game)
+
+def _run(renderer="flip", render_fps=RENDER_FPS, **opts):
+    # 桌面：阻塞循环，clock.tick 限帧；暂停时每秒只醒 10 次
+    app = App(renderer, **opts)
+    while app.running:
+        app.frame(clock.tick(render_fps if not app.paused else 10))
+    pygame.quit()
+    sys.exit()
+
+async def main(renderer="flip", render_fps=RENDER_FPS, **opts):
+    # 浏览器（pygbag）：每帧 await 一次把控制权还给浏览器，节奏由 requestAnimationFrame 决定，
+    # 所以 web 上 clock.tick() 只量时间不限帧（wasm 里限帧等于忙等）；后台时降到 4 次/秒
+    import asyncio
+    app = App(renderer, **opts)
+    while app.running:
+        app.frame(clock.tick() if WEB else clock.tick(render_fps))
+        await asyncio.sleep(0.25 if app.paused else 0)
+    if not WEB:
+        pygame.quit()
+
+def _size(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+def parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="HAPPY RABBIT")
+    ap.add_argument("--renderer", choices=("flip", "layered"), default="flip",
+                    help="flip: 每帧整屏重画；layered: 天空不重画，只恢复/提交会动的横带、云、鸟、实体和 HUD")
+    ap.add_argument("--fps", type=int, default=RENDER_FPS,
+                    help="渲染帧率上限（120/144 高刷，30 弱机；0 = 不限）；模拟固定 %d Hz" % FPS)
+    ap.add_argument("--seed", type=int, default=None, help="第一局的种子（默认随机）")
+    ap.add_argument("--profile", action="store_true", help="启动时打开性能面板（F3 开关，F4 导出 Chrome trace）")
+    ap.add_argument("--record", metavar="DIR", default=None, help="把每局的种子和输入录到 DIR（replay.py 回放）")
+    ap.add_argument("--startup-probe", action="store_true", help="打印首帧/预热完成的时间（ms）后退出")
+    ap.add_argument("--async", dest="use_async", action="store_true", help="桌面上也用 async 循环（调试网页版用）")
+    ap.add_argument("--chunks", action="store_true", help="分段出怪：预生成并验证过可跳的关卡段（chunks.py）")
+    ap.add_argument("--leaderboard", metavar="URL", default=None,
+                    help="提交到共用排行榜并在结束画面显示（leaderboard.py --serve 起服务）")
+    ap.add_argument("--ghost", action="store_true", help="和最好的那局的幽灵一起跑（ghost.hrg，见 ghost.py）")
+    ap.add_argument("--scale", choices=("integer", "smooth"), default=None,
+                    help="按逻辑分辨率 %dx%d 离屏渲染，再缩放到可拉伸的窗口（integer 像素清晰 / smooth 双线性）" % (WIDTH, HEIGHT))
+    ap.add_argument("--window", type=_size, default=None, metavar="WxH", help="初始窗口大小（配合 --scale）")
+    ap.add_argument("--extra-layers", action="store_true", help="多画远山和近处草丛两层视差")
+    args = ap.parse_args(argv)
+    if args.window and args.scale is None:
+        args.scale = "smooth"
+    if args.chunks and args.record:
+        ap.error("--record 只支持计时出怪（replay.py 按计时出怪回放）")
+    return args
 
 if __name__ == "__main__":
-    try:
-        _run()
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        input("\nProgram crashed. Press Enter to close...")
\ No newline at end of file
+    if WEB:
+        # pygbag 入口：asyncio.run(main())
+        import asyncio
+        asyncio.run(main())
+    else:
+        try:
+            args = parse_args()
+            if args.extra_layers:
+                use_parallax_layers(True)
+            opts = dict(renderer=args.renderer, render_fps=args.fps, record=args.record,
+                        seed=args.seed, profile=args.profile, startup_probe=args.startup_probe,
+                        chunks=args.chunks, leaderboard=args.leaderboard, ghost=args.ghost,
+                        scaling=args.scale, window=args.window)
+            if args.use_async:
+                import asyncio
+                asyncio.run(main(**opts))
+            else:
+                _run(**opts)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            input("\nProgram crashed. Press Enter to close...")
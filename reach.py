@@ -0,0 +1,230 @@
+"""Jump reachability tables: where the rabbit can be after pressing jump.
+
+    python reach.py                          # 各按法的滞空/最高点/可越过的障碍
+    python reach.py --speed 16 --plot full   # 文本图：该速度下 full 按法的可达区域
+    python reach.py --set JUMP_V0=-11        # 调参后重算
+
+The jump model (JUMP_V0, GRAVITY, HOLD_GRAVITY_SCALE, MAX_JUMP_HOLD_MS,
+JUMP_CUT_FACTOR, MAX_JUMPS, CEILING_Y and the wing constants) is stepped
+exactly the way Rabbit.update_physics steps it, once per input policy.
+Heights per tick do not depend on the scroll speed; only dx = tick * v
+does, so one table per policy answers every speed:
+
+    reach(dx, v)            reachable bottom heights at dx px after the press
+    max_clear(w, v)         tallest obstacle of width w that can be cleared
+    press_window(w, h, v)   distances ahead at which pressing now clears it
+    recover(w, h, v)        px until the rabbit can press again afterwards
+
+All lookups are O(1) array reads. Tables are built on first use and
+rebuilt automatically when any of the tuning constants change.
+"""
+import argparse
+
+import numpy as np
+
+import main
+
+PLAYER_X = 180                   # 与 Game.reset 里 Rabbit 的 x 一致
+WING_TICKS = 240                 # 翅膀包络算到 4 秒
+NEVER = 1 << 14                  # 表里“做不到”的标记
+
+# ---------- arcs ----------
+def fly(hold=None, second=None, wings=False, ticks=None):
+    # 从地面按下跳跃后每步兔子底边离地的高度，落地那步为 0；
+    # hold=None 一直按住；second=第二段跳在第几步按下；wings=有翅膀时按住 hold 步
+    r = main.Rabbit(PLAYER_X, main.GROUND_Y)
+    if wings:
+        r.give_wings()
+        r.wing_score_left = float("inf")
+    else:
+        r.start_jump()
+        r.set_jump_hold(True)
+    heights = []
+    t = 0
+    while True:
+        held = hold is None or t < hold
+        if not wings:
+            if t == hold:
+                r.release_jump()
+                r.set_jump_hold(False)
+            if second is not None and t == second:
+                r.start_jump()
+                r.set_jump_hold(True)
+        r.update_physics(main.STEP_MS, 0.0, held)
+        heights.append(main.GROUND_Y - (int(r.y) + r.h))
+        t += 1
+        if (r.on_ground and not wings) or t == ticks:
+            return tuple(heights)
+
+
+def _apex(arc):
+    return max(range(len(arc)), key=arc.__getitem__)
+
+
+def policy_arcs(name):
+    # 每种按法对应的高度曲线；any = 所有点按长度 + 所有二段跳时机
+    if name == "tap":
+        return [fly(0)]
+    if name == "hop":
+        return [fly(4)]
+    if name == "mid":
+        return [fly(8)]
+    if name == "full":
+        return [fly(None)]
+    if name == "double":
+        return [fly(None, _apex(fly(None)))] if main.MAX_JUMPS >= 2 else [fly(None)]
+    if name == "any":
+        arcs = {fly(hold) for hold in (0, 2, 4, 6, 8, 10, None)}
+        if main.MAX_JUMPS >= 2:
+            for hold in (4, None):
+                first = fly(hold)
+                arcs.update(fly(hold, k) for k in range(1, len(first) - 1))
+        return sorted(arcs, key=len)
+    if name == "wings":
+        return [fly(None, wings=True, ticks=WING_TICKS), fly(0, wings=True, ticks=WING_TICKS)]
+    raise ValueError(f"unknown policy: {name!r}")
+
+
+POLICIES = ("tap", "hop", "mid", "full", "double", "any", "wings")
+
+
+# ---------- tables ----------
+def overlap_ticks(w, v):
+    # 宽 w 的障碍与兔子横向重叠的最多步数（各种对齐里最坏的一种）
+    return (w + main.RABBIT_W + 2 * v - 2) // v - 1
+
+
+class ReachTable:
+    # top/bottom[t]：第 t 步可达的最高/最低底边高度（落地后为 -1）。
+    # 窗口起点 s = 与障碍重叠开始时已经跳了几步，也就是提前几步按下：
+    # lead/last[n, H]：要在连续 n 步里底边都 >= H，s 最小/最大是多少（最晚/最早的按键时刻）；
+    # land[n, H]：重叠开始后第几步落地（可再按）。取 s 最大（最早按下）的那一跳，落地最早
+    def __init__(self, arcs):
+        self.arcs = arcs
+        length = max(len(a) for a in arcs)
+        hmax = max(max(a) for a in arcs) + 1
+        top = np.full(length, -1, np.int32)
+        bottom = np.full(length, NEVER, np.int32)
+        lead = np.full((length + 1, hmax + 1), NEVER, np.int32)
+        last = np.full((length + 1, hmax + 1), -1, np.int32)
+        land = np.full((length + 1, hmax + 1), NEVER, np.int32)
+        heights = np.arange(hmax + 1)
+        for arc in arcs:
+            h = np.array(arc, np.int32)
+            top[:len(h)] = np.maximum(top[:len(h)], h)
+            bottom[:len(h)] = np.minimum(bottom[:len(h)], h)
+            for n in range(1, len(h) + 1):
+                # 长度 n 的滑动窗口最小值 → 窗口起点 s 能满足的最高障碍
+                win = np.lib.stride_tricks.sliding_window_view(h, n).min(axis=1)
+                first = np.searchsorted(np.maximum.accumulate(win), heights)      # 最小的 s：最晚按下
+                late = len(win) - 1 - np.searchsorted(np.maximum.accumulate(win[::-1]), heights)  # 最大的 s：最早按下
+                ok = first < len(win)
+                lead[n][ok] = np.minimum(lead[n][ok], first[ok])
+                last[n][ok] = np.maximum(last[n][ok], late[ok])
+                land[n][ok] = np.minimum(land[n][ok], len(h) - late[ok])     # 最早按下 → 重叠开始后最快落地
+        bottom[bottom == NEVER] = -1
+        self.top, self.bottom = top, bottom
+        self.lead, self.last, self.land = lead, last, land
+        # clear[n] = 连续 n 步能保持的最高底边
+        self.clear = np.array([int(np.flatnonzero(row < NEVER).max(initial=0)) for row in lead])
+        self.air = length
+        self.memo = {}
+
+    def spans(self, i, height):
+        # 第 i 条曲线上底边 >= height 的各段 [s, e]（记忆化，chunks 的验证用）
+        key = (i, height)
+        out = self.memo.get(key)
+        if out is None:
+            out, start = [], None
+            for t, h in enumerate(self.arcs[i]):
+                if h >= height:
+                    if start is None:
+                        start = t
+                elif start is not None:
+                    out.append((start, t - 1))
+                    start = None
+            if start is not None:
+                out.append((start, len(self.arcs[i]) - 1))
+            self.memo[key] = out
+        return out
+
+    def reach(self, dx, v):
+        # 起跳后水平走了 dx 时底边可达高度 (低, 高)；已全部落地返回 None
+        t = dx // v
+        if t < 0 or t >= self.air or self.top[t] < 0:
+            return None
+        return int(self.bottom[t]), int(self.top[t])
+
+    def max_clear(self, w, v):
+        n = overlap_ticks(w, v)
+        return int(self.clear[n]) if n < len(self.clear) else 0
+
+    def press_window(self, w, h, v):
+        # 现在按下能越过：障碍左沿到兔子右沿的距离 d 在 [d_min, d_max] 内；做不到返回 None
+        # 单条曲线（tap/hop/mid/full/double）上是连续区间；any 取并集的两端
+        n = overlap_ticks(w, v)
+        if n >= len(self.lead) or h >= self.lead.shape[1] or self.lead[n, h] >= NEVER:
+            return None
+        return int(self.lead[n, h]) * v, int(self.last[n, h]) * v + v - 1
+
+    def recover(self, w, h, v):
+        # 越过后多少 px 才能再次起跳（从障碍左沿到达兔子右沿算起，按最早时机起跳）
+        n = overlap_ticks(w, v)
+        if n >= len(self.land) or h >= self.land.shape[1] or self.land[n, h] >= NEVER:
+            return None
+        return int(self.land[n, h]) * v
+
+
+_TUNING = ("JUMP_V0", "GRAVITY", "HOLD_GRAVITY_SCALE", "MAX_JUMP_HOLD_MS", "JUMP_CUT_FACTOR", "MAX_JUMPS",
+           "CEILING_Y", "GROUND_Y", "RABBIT_W", "RABBIT_H", "STEP_MS", "WING_GRAVITY", "WING_ASCEND_VEL")
+_tables = {}
+
+def table(policy="any"):
+    # 按 (按法, 当前调参常量) 缓存；sweep/--set 改了常量会自动重建
+    key = (policy,) + tuple(getattr(main, name) for name in _TUNING)
+    t = _tables.get(key)
+    if t is None:
+        t = _tables[key] = ReachTable(policy_arcs(policy))
+    return t
+
+
+def plot(policy, v, width=100, rows=20):
+    t = table(policy)
+    hmax = int(t.top.max()) + 1
+    cols = min(width, t.air)
+    lines = []
+    step = max(1, hmax // rows)
+    for r in range(rows, -1, -1):
+        y = hmax * r // rows
+        # 这一行代表 [y, y+step)：和该步的可达区间有交集就画 #
+        row = "".join("#" if t.bottom[c] < y + step and t.top[c] >= y else " " for c in range(cols))
+        lines.append(f"{y:4d} |{row}")
+    lines.append(f"     +{'-' * cols}  1 列 = 1 步 = {v} px")
+    return "\n".join(lines)
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--speed", type=int, default=8, help="scroll px per tick")
+    ap.add_argument("--plot", choices=POLICIES, help="draw the reachable region for one policy")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE")
+    args = ap.parse_args()
+
+    import sim
+    sim.apply(sim.parse_set(args.set))
+    if args.plot:
+        print(plot(args.plot, args.speed))
+        return
+    v = args.speed
+    print(f"speed {v} px/tick")
+    print(f"{'policy':8s} {'arcs':>5s} {'air px':>7s} {'apex':>5s} "
+          + " ".join(f"{f'clear w{w}':>9s}" for w in (44, 90, 200, 400)))
+    for name in POLICIES:
+        t = table(name)
+        print(f"{name:8s} {len(t.arcs):5d} {t.air * v:7d} {int(t.top.max()):5d} "
+              + " ".join(f"{t.max_clear(w, v):9d}" for w in (44, 90, 200, 400)))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,140 @@
+"""Compact input replays: a run's seed plus its per-tick inputs.
+
+    python main.py --record replays/            # 每局结束写 replays/<seed>.hrp
+    python replay.py replays/*.hrp              # 无头全速回放，核对步数和分数
+    python replay.py replays/42.hrp --profile   # 同一局再跑一遍，看 cProfile
+
+File layout (little endian):
+
+    header  b"HRPL" | u8 version | u64 seed | u16 simulation Hz
+    events  varint(delta_ticks << 2 | code)      code 0 jump down, 1 jump up, 2 special
+    end     varint(delta_ticks << 2 | 3) | varint(final score)
+
+delta_ticks counts Game.update steps since the previous record, so a
+typical event is a single byte. Playback feeds the events to
+sim.simulate with the same seed; a mismatch exits non-zero, which makes
+a folder of replays usable as a regression test.
+"""
+import argparse, cProfile, os, pstats, struct, sys
+from collections import namedtuple
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import main, sim
+
+MAGIC = b"HRPL"
+VERSION = 1
+HEADER = struct.Struct("<4sBQH")
+CODES = (sim.JUMP_DOWN, sim.JUMP_UP, sim.SPECIAL)
+END = 3
+
+Replay = namedtuple("Replay", "seed hz events end_tick score")
+
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data, i):
+    n = shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+
+class Recorder:
+    # _run 里每局一个；event() 的 tick 用 Game.ticks（本步之前已执行的步数）
+    def __init__(self, seed, hz=main.FPS):
+        self.seed = seed
+        self.buf = bytearray(HEADER.pack(MAGIC, VERSION, seed, hz))
+        self.last = 0
+        self.count = 0
+
+    def event(self, tick, action):
+        _put_varint(self.buf, (tick - self.last) << 2 | CODES.index(action))
+        self.last = tick
+        self.count += 1
+
+    def finish(self, tick, score):
+        out = bytearray(self.buf)
+        _put_varint(out, (tick - self.last) << 2 | END)
+        _put_varint(out, int(score))
+        return bytes(out)
+
+    def save(self, path, tick, score):
+        with open(path, "wb") as f:
+            f.write(self.finish(tick, score))
+
+
+def encode(seed, events, end_tick, score, hz=main.FPS):
+    rec = Recorder(seed, hz)
+    for tick, action in events:
+        rec.event(tick, action)
+    return rec.finish(end_tick, score)
+
+
+def decode(data):
+    if len(data) < HEADER.size:
+        raise ValueError("replay too short")
+    magic, version, seed, hz = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a replay file")
+    if version != VERSION:
+        raise ValueError(f"unsupported replay version {version}")
+    events, tick, i = [], 0, HEADER.size
+    try:
+        while True:
+            v, i = _get_varint(data, i)
+            tick += v >> 2
+            if v & 3 == END:
+                score, i = _get_varint(data, i)
+                return Replay(seed, hz, events, tick, score)
+            events.append((tick, CODES[v & 3]))
+    except IndexError:
+        raise ValueError("truncated replay") from None
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def play(rp):
+    # 无头全速；按录制时的频率步进
+    return sim.simulate(rp.seed, rp.events, dt=1000.0 / rp.hz, max_ticks=rp.end_tick)
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--profile", action="store_true", help="run each replay under cProfile")
+    args = ap.parse_args()
+
+    bad = 0
+    for path in args.paths:
+        rp = load(path)
+        prof = cProfile.Profile() if args.profile else None
+        if prof:
+            prof.enable()
+        r = play(rp)
+        if prof:
+            prof.disable()
+        ok = r["ticks"] == rp.end_tick and r["score"] == rp.score
+        bad += not ok
+        print(f"{path}: seed {rp.seed}  {len(rp.events)} inputs  ticks {r['ticks']}/{rp.end_tick}  "
+              f"score {r['score']}/{rp.score}  {'OK' if ok else 'MISMATCH'}  ({r['tps']:,.0f} ticks/s)")
+        if prof:
+            pstats.Stats(prof, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    run()
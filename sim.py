@@ -0,0 +1,204 @@
+"""Headless fast-forward runner for balancing.
+
+    python sim.py --runs 200 --seconds 180 --seed 1
+    python sim.py --set OBST_GAP_SCORE_FACTOR=0.5 --set RAMP_SLOPE=0.0008
+    python sim.py --chunks --runs 200              # 分段出怪（chunks.py）
+    python sim.py --policy bot --runs 10 --seconds 120   # 前瞻规划的自动玩家（bot.py）
+
+Steps Game at a fixed dt with no display, font or drawing and reports
+throughput in ticks per second.
+"""
+import argparse, ast, time
+from contextlib import contextmanager
+
+import main
+
+# main 里由别的常量算出来的值：--set 改了 FPS / GROUND_Y 以后要跟着重算
+DERIVED = {
+    "STEP_MS": lambda: 1000.0 / main.FPS,
+    "CARROT_LOW_CHOICES": lambda: [main.GROUND_Y-84, main.GROUND_Y-68, main.GROUND_Y-52],
+}
+
+# 输入事件（与 _run 中的按键/鼠标一致）
+JUMP_DOWN, JUMP_UP, SPECIAL = "down", "up", "special"
+
+
+def apply_action(game, keys_held, action):
+    if action == JUMP_DOWN:
+        game.press_jump(keys_held)
+    elif action == JUMP_UP:
+        game.release_jump(keys_held)
+    elif action == SPECIAL:
+        game.use_special()
+    else:
+        raise ValueError(f"unknown action: {action!r}")
+
+
+def simulate(seed, inputs=(), dt=None, max_ticks=60 * 60 * main.FPS, level=None, until=None):
+    """Run one headless game and return a result dict.
+
+    inputs is either a sequence of (tick, action) pairs or a policy
+    callable(game, tick) -> iterable of actions, applied before each tick.
+    The run ends at game over, after max_ticks, or once until(game) is
+    true (checked before each tick). level is passed to Game
+    (e.g. a chunks.ChunkStream); None keeps the timer-driven spawns.
+    dt defaults to main.STEP_MS at call time, so it follows --set FPS.
+    """
+    dt = dt or main.STEP_MS
+    game = main.Game(headless=True, seed=seed, level=level)
+    keys_held = {"space": False}
+    policy, events = None, {}
+    if callable(inputs):
+        policy = inputs
+    else:
+        for tick, action in inputs:
+            events.setdefault(tick, []).append(action)
+
+    t0 = time.perf_counter()
+    tick = 0
+    while tick < max_ticks and not game.gameover and not (until is not None and until(game)):
+        actions = policy(game, tick) if policy is not None else events.get(tick, ())
+        for action in actions:
+            apply_action(game, keys_held, action)
+        game.update(dt, keys_held)
+        tick += 1
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "seed": seed,
+        "ticks": tick,
+        "sim_ms": game.time_ms,
+        "score": int(game.score),
+        "carrots": game.coins,
+        "scene": game.scene,
+        "gameover": game.gameover,
+        "revive_used": game.revive_used,
+        "elapsed_s": elapsed,
+        "tps": tick / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+class AutoJumper:
+    # 简单基线策略：前方障碍进入提前量就起跳（按住到顶），
+    # 快撞上还不够高就二段跳；有翅膀时一直按住贴着天花板飞
+    def __init__(self, lead_ticks=10, hold_ticks=12):
+        self.lead_ticks = lead_ticks
+        self.hold_ticks = hold_ticks
+        self.release_at = None
+
+    def __call__(self, game, tick):
+        p = game.player
+        if p.has_wings:
+            self.release_at = None
+            return () if game.reviving or p.jump_holding or p.vy < 0 else (JUMP_DOWN,)
+        if self.release_at is not None:
+            if tick < self.release_at:
+                return ()
+            self.release_at = None
+            return (JUMP_UP,)
+        prect = p.rect
+        front = game.obstacles.first_ahead(prect.x)
+        if front is None:
+            return ()
+        front = front.rect
+        dist = front.x - prect.right
+        speed = game.current_speed()
+        if p.on_ground:
+            if dist > speed * self.lead_ticks:
+                return ()
+        elif not (p.vy > 0 and p.jump_count < 2 and dist < speed * 3 and prect.bottom > front.y - 4):
+            return ()
+        self.release_at = tick + self.hold_ticks
+        return (JUMP_DOWN,)
+
+
+def _bot():
+    # bot.py 要 import sim，放到用的时候再导入
+    import bot
+    return bot.Planner()
+
+
+POLICIES = {
+    "idle": lambda: (),
+    "auto": AutoJumper,
+    "bot": _bot,
+}
+
+
+def parse_set(items):
+    # NAME=VALUE → 覆盖 main 顶部的调参常量
+    # 非数字的值（颜色元组、开关等）只按字面量解析，类型必须和原值一样
+    out = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if not name.isupper() or not hasattr(main, name):
+            raise SystemExit(f"unknown constant: {name}")
+        if name in DERIVED:
+            raise SystemExit(f"{name} is derived from other constants; set those instead")
+        cur = getattr(main, name)
+        try:
+            if isinstance(cur, (int, float)) and not isinstance(cur, bool):
+                out[name] = type(cur)(value)
+            else:
+                out[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise SystemExit(f"bad value for {name}: {value!r}")
+        if type(out[name]) is not type(cur):
+            raise SystemExit(f"{name} must be a {type(cur).__name__}, got {value!r}")
+    return out
+
+
+def apply(values):
+    """Write parse_set() values into main and recompute DERIVED; returns the old values."""
+    old = {k: getattr(main, k) for k in (*values, *DERIVED)}
+    for name, value in values.items():
+        setattr(main, name, value)
+    for name, f in DERIVED.items():
+        setattr(main, name, f())
+    return old
+
+
+@contextmanager
+def overridden(values):
+    # 只在 with 块里生效，出来时连同派生值一起恢复（sweep 的子进程、bench 的场景）
+    old = apply(values)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(main, name, value)
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--seconds", type=float, default=300.0, help="max simulated seconds per run")
+    ap.add_argument("--policy", choices=sorted(POLICIES), default="auto")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE")
+    ap.add_argument("--chunks", action="store_true", help="spawn from validated chunk segments")
+    args = ap.parse_args()
+
+    apply(parse_set(args.set))
+    level = None
+    if args.chunks:
+        import chunks
+        level = chunks.ChunkStream()
+
+    max_ticks = int(args.seconds * 1000 / main.STEP_MS)
+    results = []
+    t0 = time.perf_counter()
+    for i in range(args.runs):
+        results.append(simulate(args.seed + i, POLICIES[args.policy](), max_ticks=max_ticks, level=level))
+    elapsed = time.perf_counter() - t0
+
+    ticks = sum(r["ticks"] for r in results)
+    scores = sorted(r["score"] for r in results)
+    print(f"runs: {len(results)}   ticks: {ticks}   wall: {elapsed:.2f}s   "
+          f"throughput: {ticks / elapsed:,.0f} ticks/s ({ticks * main.STEP_MS / 1000 / elapsed:,.0f}x realtime)")
+    print(f"score  min: {scores[0]}   median: {scores[len(scores) // 2]}   max: {scores[-1]}   "
+          f"gameover: {sum(r['gameover'] for r in results)}/{len(results)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,212 @@
+"""Score persistence off the frame path: best score plus a run history.
+
+    python main.py                           # 每局结束：best_score.txt 原子替换，runs.db 追加一行
+    python store.py                          # 局数、前 10 名、常用分位数
+    python store.py --top 20 --pct 50 90 99
+    python store.py --db /tmp/big.db --fill 1000000   # 灌入随机局测查询速度
+
+ScoreStore.submit() only copies a few numbers onto a queue; the I/O
+happens on a writer thread (desktop) or on App's idle frames (browser,
+no threads). best_score.txt goes through main.save_best, which writes a
+temp file, fsyncs it and os.replace()s it over the old one, so a crash
+leaves either the old or the new score, never a truncated file.
+
+runs.db is SQLite in WAL mode with one append-only row per finished run
+(time, seed, score, carrots, scene reached, duration). An index on
+score makes top-N a short index walk. A per-bucket count table updated
+in the same transaction turns a percentile into a walk over a few
+hundred buckets plus one indexed OFFSET inside the right bucket, so
+both stay in milliseconds at millions of rows.
+"""
+import argparse, math, queue, random, sys, threading, time
+
+try:
+    import sqlite3
+except ImportError:               # 有的浏览器打包没有 sqlite3：只写最高分
+    sqlite3 = None
+
+import main
+
+RUNS_DB = "runs.db"
+BUCKET = 100                      # 分位数直方图每桶的分数宽度
+BATCH = 64                        # 一次事务最多写几局
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL    NOT NULL,
+    seed    INTEGER NOT NULL,
+    score   INTEGER NOT NULL,
+    carrots INTEGER NOT NULL,
+    scene   TEXT    NOT NULL,
+    ms      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_score ON runs(score);
+CREATE TABLE IF NOT EXISTS hist (bucket INTEGER PRIMARY KEY, n INTEGER NOT NULL);
+"""
+COLUMNS = "ts, seed, score, carrots, scene, ms"
+
+
+class RunLog:
+    # 只在一个线程里用（写线程，或网页上的主线程）
+    def __init__(self, path=RUNS_DB):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def append(self, rows):
+        # rows: (ts, seed, score, carrots, scene, ms)；局和直方图在同一个事务里
+        with self.db:
+            self.db.executemany(f"INSERT INTO runs ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT INTO hist VALUES (?, 1) ON CONFLICT(bucket) DO UPDATE SET n = n + 1",
+                                [(r[2] // BUCKET,) for r in rows])
+
+    def count(self):
+        return self.db.execute("SELECT COALESCE(SUM(n), 0) FROM hist").fetchone()[0]
+
+    def top(self, n=10):
+        return self.db.execute(f"SELECT {COLUMNS} FROM runs ORDER BY score DESC LIMIT ?", (n,)).fetchall()
+
+    def percentiles(self, ps):
+        # 最近秩法：第 ceil(p/100*N) 名（从低到高）；先按桶累加定位，再在桶里用索引 OFFSET
+        buckets = self.db.execute("SELECT bucket, n FROM hist ORDER BY bucket").fetchall()
+        total = sum(n for _, n in buckets)
+        out = {}
+        for p in ps:
+            if not total:
+                out[p] = None
+                continue
+            # round 掉浮点误差：99.9% × 1000 应该是第 999 名，不是 ceil(999.0000000000001)
+            k = min(total - 1, max(0, math.ceil(round(p * total / 100.0, 9)) - 1))
+            for bucket, n in buckets:
+                if k < n:
+                    out[p] = self.db.execute("SELECT score FROM runs WHERE score >= ? ORDER BY score LIMIT 1 OFFSET ?",
+                                             (bucket * BUCKET, k)).fetchone()[0]
+                    break
+                k -= n
+        return out
+
+    def close(self):
+        self.db.close()
+
+
+class ScoreStore:
+    # App 里一个：submit() 在帧里调用，只入队；start() 开写线程，网页上改由 App 空闲帧调 step()
+    def __init__(self, best_path=main.BEST_PATH, runs_db=RUNS_DB):
+        self.best_path = best_path
+        self.runs_db = runs_db if sqlite3 is not None else None
+        self.best = self.saved_best = main.load_best(best_path)
+        self.pending = queue.SimpleQueue()
+        self.log = None
+        self.thread = None
+
+    def submit(self, game):
+        # 只入队（SimpleQueue 可以多线程同时 put）；最高分在写的那一边算，不在这里读改写
+        self.pending.put((time.time(), game.seed, int(game.score), game.coins, game.scene, int(game.time_ms)))
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="store", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            rows = [self.pending.get()]
+            while len(rows) < BATCH and not self.pending.empty():
+                rows.append(self.pending.get())
+            done = None in rows
+            rows = [r for r in rows if r is not None]
+            if rows:
+                self._write(rows)
+            if done:
+                self._close_log()
+                return
+
+    def step(self):
+        # 没有线程时：写一批（每帧最多一次）
+        rows = []
+        while len(rows) < BATCH and not self.pending.empty():
+            rows.append(self.pending.get())
+        if rows:
+            self._write(rows)
+
+    def _write(self, rows):
+        best = self.best = max(self.best, max(r[2] for r in rows))
+        if best > self.saved_best and main.save_best(best, self.best_path):
+            self.saved_best = best
+        if self.runs_db is None:
+            return
+        try:
+            if self.log is None:
+                self.log = RunLog(self.runs_db)
+            self.log.append(rows)
+        except sqlite3.Error as e:
+            # 库坏了/盘满：关掉局记录，最高分照常写
+            print(f"run log disabled: {e}", file=sys.stderr)
+            self.runs_db = None
+
+    def close(self):
+        # 退出前把队列写完
+        if self.thread is not None:
+            self.pending.put(None)
+            self.thread.join(timeout=5.0)
+            self.thread = None
+        else:
+            while not self.pending.empty():
+                self.step()
+            self._close_log()
+
+    def _close_log(self):
+        # sqlite 连接只能在打开它的线程里关
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+def fill(log, n, seed=0):
+    # 随机局：分数大致按 sim 的分布（长尾）
+    rng = random.Random(seed)
+    now = time.time()
+    scenes = (main.SCENE_GRASS, main.SCENE_HELL, main.SCENE_HEAVEN)
+    for start in range(0, n, 10000):
+        rows = []
+        for i in range(start, min(n, start + 10000)):
+            score = int(rng.expovariate(1 / 1500.0))
+            rows.append((now - (n - i), rng.getrandbits(32), score, score // 40, scenes[min(2, score // 2000)],
+                         score * 28))
+        log.append(rows)
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--db", default=RUNS_DB)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--pct", type=float, nargs="+", default=[50, 90, 99])
+    ap.add_argument("--fill", type=int, default=0, metavar="N", help="append N random runs first")
+    args = ap.parse_args()
+    if sqlite3 is None:
+        raise SystemExit("sqlite3 is not available")
+
+    log = RunLog(args.db)
+    if args.fill:
+        t0 = time.perf_counter()
+        fill(log, args.fill)
+        print(f"filled {args.fill} runs in {time.perf_counter() - t0:.1f}s")
+    t0 = time.perf_counter()
+    top = log.top(args.top)
+    t1 = time.perf_counter()
+    pct = log.percentiles(args.pct)
+    t2 = time.perf_counter()
+    print(f"runs: {log.count()}   best file: {main.load_best()}")
+    print(f"top {args.top} ({(t1 - t0) * 1000:.1f} ms):")
+    for i, (ts, seed, score, carrots, scene, ms) in enumerate(top, 1):
+        print(f"  {i:3d}. {score:7d}  carrots {carrots:4d}  {scene:6s}  {ms / 1000:6.1f}s  seed {seed}  "
+              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(ts))}")
+    print(f"percentiles ({(t2 - t1) * 1000:.1f} ms): "
+          + "   ".join(f"p{p:g} {v if v is not None else '-'}" for p, v in pct.items()))
+    log.close()
+
+
+if __name__ == "__main__":
+    run()
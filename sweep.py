@@ -0,0 +1,227 @@
+"""Parallel parameter sweep over the tuning constants in main.py.
+
+    python sweep.py --grid JUMP_V0=-12,-13.2,-14.5 --grid GRAVITY=0.9,1.02,1.1 \\
+                    --runs 400 --seconds 300 --out sweep.csv
+    python sweep.py --sample OBST_MIN_GAP=1200:2000 --sample SUPER_DURATION_MS=4000:12000 \\
+                    --points 64 --runs 200 --out sweep.parquet
+
+Every (point, run) pair gets a fixed seed derived from --seed, the point
+index and the run index, so results do not depend on worker count or
+scheduling. Headless runs are fanned out over a process pool in chunks;
+one aggregated row per point is written as soon as the point finishes.
+"""
+import argparse, csv, itertools, multiprocessing, os, random, sys, time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # stdout 可能就是 CSV
+
+import main, sim
+
+# 必须保持 min <= max 的常量对（随机采样时自动交换）
+ORDERED_PAIRS = [("OBST_MIN_GAP", "OBST_MAX_GAP"), ("ROCK_W_MIN", "ROCK_W_MAX"),
+                 ("ROCK_H_MIN", "ROCK_H_MAX"), ("CARROT_ROW_MIN", "CARROT_ROW_MAX")]
+
+PCTS = (10, 50, 90)
+
+
+def run_seed(base_seed, point, run):
+    return (base_seed << 40) | (point << 20) | run
+
+
+def _check_name(name):
+    cur = getattr(main, name, None)
+    if not name.isupper() or not isinstance(cur, (int, float)) or isinstance(cur, bool):
+        raise SystemExit(f"not a numeric tuning constant in main.py: {name}")
+    if name in sim.DERIVED:
+        raise SystemExit(f"{name} is derived from other constants; sweep those instead")
+    return type(cur)
+
+
+def parse_grid(items):
+    axes = []
+    for item in items:
+        name, _, values = item.partition("=")
+        cast = _check_name(name)
+        axes.append((name, [cast(v) for v in values.split(",")]))
+    return axes
+
+
+def parse_sample(items):
+    ranges = []
+    for item in items:
+        name, _, bounds = item.partition("=")
+        cast = _check_name(name)
+        lo, _, hi = bounds.partition(":")
+        ranges.append((name, cast, cast(lo), cast(hi)))
+    return ranges
+
+
+def make_points(grid, sample, n_points, seed):
+    if grid:
+        names = [name for name, _ in grid]
+        points = [dict(zip(names, values)) for values in itertools.product(*(v for _, v in grid))]
+    else:
+        points = [{}]
+    if sample:
+        rng = random.Random(seed)
+        out = []
+        for base in points:
+            for _ in range(n_points):
+                p = dict(base)
+                for name, cast, lo, hi in sample:
+                    p[name] = rng.randint(lo, hi) if cast is int else rng.uniform(lo, hi)
+                out.append(p)
+        points = out
+    for p in points:
+        for lo, hi in ORDERED_PAIRS:
+            if lo in p and hi in p and p[lo] > p[hi]:
+                p[lo], p[hi] = p[hi], p[lo]
+    return points
+
+
+def _run_chunk(task):
+    # 子进程里执行：套上这个点的常量（连同派生值，跑完恢复）→ 跑一批种子
+    point, params, seeds, seconds, policy, engine = task
+    with sim.overridden(params):
+        max_ticks = int(seconds * 1000 / main.STEP_MS)
+        if engine == "batch":
+            import batch
+            results = batch.BatchSim(seeds).run(batch.BatchAutoJumper(), max_ticks=max_ticks)
+        else:
+            results = [sim.simulate(s, sim.POLICIES[policy](), max_ticks=max_ticks) for s in seeds]
+    keep = ("score", "sim_ms", "gameover", "scene", "carrots")
+    return point, [{k: r[k] for k in keep} for r in results]
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p / 100.0
+    f = int(k)
+    c = min(f + 1, len(sorted_vals) - 1)
+    return sorted_vals[f] + (sorted_vals[c] - sorted_vals[f]) * (k - f)
+
+
+def aggregate(point, params, results):
+    scores = sorted(r["score"] for r in results)
+    secs = sorted(r["sim_ms"] / 1000.0 for r in results)
+    n = len(results)
+    row = {"point": point, **params, "runs": n}
+    row["score_mean"] = sum(scores) / n
+    for p in PCTS:
+        row[f"score_p{p}"] = percentile(scores, p)
+    row["score_max"] = scores[-1]
+    row["survival_s_mean"] = sum(secs) / n
+    for p in PCTS:
+        row[f"survival_s_p{p}"] = percentile(secs, p)
+    row["gameover_rate"] = sum(r["gameover"] for r in results) / n
+    row["reached_hell"] = sum(r["scene"] != main.SCENE_GRASS for r in results) / n
+    row["reached_heaven"] = sum(r["scene"] == main.SCENE_HEAVEN for r in results) / n
+    row["carrots_mean"] = sum(r["carrots"] for r in results) / n
+    row["sim_seconds"] = sum(secs)
+    return row
+
+
+class CsvSink:
+    def __init__(self, path, fields):
+        self.f = open(path, "w", newline="") if path != "-" else sys.stdout
+        self.w = csv.DictWriter(self.f, fieldnames=fields)
+        self.w.writeheader()
+
+    def write(self, row):
+        self.w.writerow(row)
+        self.f.flush()
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+
+class ParquetSink:
+    # 需要 pyarrow；每 batch_rows 行写一个 row group
+    def __init__(self, path, fields, batch_rows=64):
+        try:
+            import pyarrow, pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use a .csv path instead")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.path, self.fields, self.batch_rows = path, fields, batch_rows
+        self.rows, self.writer = [], None
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        table = self.pa.Table.from_pylist(self.rows)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def run():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    ap.add_argument("--grid", action="append", default=[], metavar="NAME=v1,v2,...")
+    ap.add_argument("--sample", action="append", default=[], metavar="NAME=lo:hi")
+    ap.add_argument("--points", type=int, default=32, help="random samples per grid point (with --sample)")
+    ap.add_argument("--runs", type=int, default=100, help="seeds per point")
+    ap.add_argument("--seconds", type=float, default=300.0, help="max simulated seconds per run")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--policy", choices=sorted(sim.POLICIES), default="auto")
+    ap.add_argument("--engine", choices=("scalar", "batch"), default="scalar",
+                    help="batch = NumPy engine (auto policy only)")
+    ap.add_argument("--chunk", type=int, default=25, help="runs per worker task")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", default="-", help=".csv / .parquet path, or - for stdout")
+    args = ap.parse_args()
+
+    if args.engine == "batch" and args.policy != "auto":
+        raise SystemExit("--engine batch only supports --policy auto")
+    grid, sample = parse_grid(args.grid), parse_sample(args.sample)
+    points = make_points(grid, sample, args.points, args.seed)
+
+    tasks = []
+    for pi, params in enumerate(points):
+        seeds = [run_seed(args.seed, pi, r) for r in range(args.runs)]
+        for k in range(0, len(seeds), args.chunk):
+            tasks.append((pi, params, seeds[k:k + args.chunk], args.seconds, args.policy, args.engine))
+
+    names = list(points[0])
+    fields = list(aggregate(0, points[0], [{"score": 0, "sim_ms": 0, "gameover": False,
+                                             "scene": main.SCENE_GRASS, "carrots": 0}]))
+    sink = (ParquetSink if args.out.endswith(".parquet") else CsvSink)(args.out, fields)
+
+    pending = {pi: args.runs for pi in range(len(points))}
+    collected = {pi: [] for pi in range(len(points))}
+    t0 = time.perf_counter()
+    sim_s = 0.0
+    done = 0
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            for pi, results in pool.imap_unordered(_run_chunk, tasks):
+                collected[pi].extend(results)
+                pending[pi] -= len(results)
+                if pending[pi] == 0:
+                    row = aggregate(pi, points[pi], collected.pop(pi))
+                    sink.write(row)
+                    sim_s += row["sim_seconds"]
+                    done += 1
+                    wall = time.perf_counter() - t0
+                    print(f"\r{done}/{len(points)} points   {sim_s:,.0f} sim-s in {wall:.1f}s "
+                          f"({sim_s / wall:,.0f}x realtime)", end="", file=sys.stderr)
+    finally:
+        sink.close()
+    print(f"\nswept {', '.join(names) or '(defaults)'} with {args.workers} workers", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,7 @@
+import os, sys
+
+# 无窗口跑：main 只在 init_display() 时才开显示，这里保险起见也设成 dummy
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
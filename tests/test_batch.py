@@ -0,0 +1,50 @@
+import pytest
+
+import batch, sim
+
+KEYS = ("ticks", "sim_ms", "score", "carrots", "scene", "gameover", "revive_used")
+
+# AutoJumper 在这些种子上：0 草地死掉；19、27 进地狱；37 到天堂；22 到天堂且跑满 max_ticks
+SEEDS = (0, 19, 22, 27, 37)
+MAX_TICKS = 9000
+
+
+def recorded_run(seed, max_ticks=MAX_TICKS, every=45):
+    # AutoJumper 跑一局；有火球/魔法棒时每 every 步放一次，输入录成 (tick, action)
+    jumper, events = sim.AutoJumper(), []
+
+    def rec(game, tick):
+        actions = list(jumper(game, tick))
+        if game.special_charges > 0 and tick % every == 0:
+            actions.append(sim.SPECIAL)
+        events.extend((tick, a) for a in actions)
+        return actions
+
+    return sim.simulate(seed, rec, max_ticks=max_ticks), events
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    return [recorded_run(seed) for seed in SEEDS]
+
+
+def test_recorded_runs_cover_portals_and_specials(recorded):
+    scenes = {r["scene"] for r, _ in recorded}
+    assert scenes == {"grass", "hell", "heaven"}
+    assert any(a == sim.SPECIAL for _, events in recorded for _, a in events)
+    assert any(not r["gameover"] for r, _ in recorded)          # 有一局跑满 max_ticks
+
+
+def test_scripted_inputs_match_scalar(recorded):
+    out = batch.BatchSim(SEEDS).run(batch.ScriptedInputs([e for _, e in recorded]), max_ticks=MAX_TICKS)
+    for (r, events), b in zip(recorded, out):
+        s = sim.simulate(r["seed"], events, max_ticks=MAX_TICKS)     # 标量回放与录制时一致
+        assert {k: s[k] for k in KEYS} == {k: r[k] for k in KEYS}
+        assert {k: b[k] for k in KEYS} == {k: s[k] for k in KEYS}, r["seed"]
+
+
+def test_auto_jumper_matches_scalar():
+    out = batch.BatchSim(SEEDS).run(batch.BatchAutoJumper(), max_ticks=MAX_TICKS)
+    for b in out:
+        s = sim.simulate(b["seed"], sim.AutoJumper(), max_ticks=MAX_TICKS)
+        assert {k: b[k] for k in KEYS} == {k: s[k] for k in KEYS}, b["seed"]
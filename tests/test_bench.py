@@ -0,0 +1,34 @@
+import bench
+
+
+def baseline(runs):
+    return {"results": {"calm": {"update_us": sorted(runs)[len(runs) // 2], "gc_per_1k": 1.0}},
+            "samples": {"calm": {"update_us": runs}}}
+
+
+def test_compare_ignores_overlapping_noise():
+    # 中位数高了 30%，但两边的分布交叠（一阵抖动）：不算退化
+    old = baseline([20.0, 21.0, 22.0, 23.0, 35.0])
+    new = {"calm": {"update_us": 28.6, "gc_per_1k": 1.0}}
+    assert bench.compare(old, new, {"calm": {"update_us": [21.0, 22.0, 28.6, 36.0, 40.0]}}, 10) == []
+
+
+def test_compare_flags_separated_regression():
+    old = baseline([20.0, 21.0, 22.0, 23.0, 35.0])
+    new = {"calm": {"update_us": 28.0, "gc_per_1k": 1.0}}
+    bad = bench.compare(old, new, {"calm": {"update_us": [27.0, 27.5, 28.0, 28.5, 29.0]}}, 10)
+    assert [(name, m) for name, m, *_ in bad] == [("calm", "update_us")]
+
+
+def test_compare_without_samples_uses_threshold_and_slack():
+    # gc/peak 没有逐次样本：只看阈值和绝对余量
+    old = baseline([20.0] * 5)
+    assert bench.compare(old, {"calm": {"gc_per_1k": 1.6}}, {}, 10) == []
+    assert len(bench.compare(old, {"calm": {"gc_per_1k": 1.7}}, {}, 10)) == 1
+
+
+def test_drift_from_reference_samples():
+    # 参照活儿慢了 20%：整台机器慢了；没有参照样本时不判断
+    old = {"samples": {"calm": {"reference_ms": [5.0, 5.0, 5.0]}, "super": {"reference_ms": [5.0, 5.0]}}}
+    assert abs(bench.drift(old, {"calm": {"reference_ms": [6.0, 6.0, 6.0]}}) - 20.0) < 1e-9
+    assert bench.drift({"samples": {}}, {"calm": {"reference_ms": [6.0]}}) is None
@@ -0,0 +1,64 @@
+import pytest
+
+import chunks, main, reach, sim
+
+
+def test_landing_tick_rejects_unreachable_chunks():
+    top = reach.table("any").max_clear(44, 8)
+    assert chunks.landing_tick([(400, 44, top)], 8) is not None
+    assert chunks.landing_tick([(400, 44, top + 1)], 8) is None
+    # 四块石头排得太密：一跳越不过整串，中间又来不及落地再跳
+    tight = [(400, 74, 90), (579, 80, 79), (744, 86, 50), (890, 45, 65)]
+    assert chunks.landing_tick(tight, 8) is None
+    # 同样的石头拉开间距就能一块一块跳
+    spread = [(dx * 3, w, h) for dx, w, h in tight]
+    assert chunks.landing_tick(spread, 8) is not None
+
+
+def test_high_tiers_reject_some_candidates():
+    stats = {}
+    build = chunks.TierBuild(0, 9)
+    while len(build.segs) < 24:
+        build.work(stats)
+    assert stats.get("rejected", 0) > 0
+    assert stats["candidates"] == len(build.segs) + stats["rejected"]
+    # 留下来的段在这一档每个速度下都能过
+    for seg in build.segs:
+        spec = [(dx, w, h + (chunks.FOX_BOB if code == chunks.FOX else 0))
+                for dx, code, _, w, h in seg.entities() if code != chunks.CARROT]
+        assert all(chunks.landing_tick(spec, v) is not None for v in build.speeds)
+
+
+def test_non_blocking_stream_falls_back_to_timer_spawns():
+    lib = chunks.ChunkLibrary(seed=5, size=4)
+    level = chunks.ChunkStream(lib, block=False)
+    game = main.Game(headless=True, seed=1, level=level)
+    keys, jumper = {"space": False}, sim.AutoJumper()
+
+    def step(tick):
+        for action in jumper(game, tick):
+            sim.apply_action(game, keys, action)
+        game.update(main.STEP_MS, keys)
+
+    for tick in range(300):
+        step(tick)
+    # 段库一档都没建：不在帧线程上现建，计时出怪照常出障碍
+    assert lib.tiers == {} and lib.upto >= 1
+    assert game.obstacles.items
+    assert not level.pending
+    lib.get(0)
+    step(300)
+    assert not game.gameover and not game.reviving
+    # 建好以后改从段里出：新段从进场点开始排
+    assert level.end - level.dist >= chunks.LOOKAHEAD
+    assert min(wx for wx, *_ in level.pending) - level.dist > chunks.SPAWN_X
+
+
+def test_shared_library_follows_tuning_constants():
+    lib = chunks.ChunkLibrary.shared(seed=3, size=4)
+    assert chunks.ChunkLibrary.shared(seed=3, size=4) is lib
+    with sim.overridden(sim.parse_set(["JUMP_V0=-11.0"])):
+        assert chunks.ChunkLibrary.shared(seed=3, size=4) is not lib
+    with sim.overridden(sim.parse_set(["ROCK_H_MAX=130"])):
+        assert chunks.ChunkLibrary.shared(seed=3, size=4) is not lib
+    assert chunks.ChunkLibrary.shared(seed=3, size=4) is lib
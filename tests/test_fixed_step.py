@@ -0,0 +1,43 @@
+import main
+
+
+class Recorder:
+    # 只记录调用的假 Game
+    def __init__(self):
+        self.calls = []
+
+    def snapshot(self):
+        self.calls.append("snap")
+
+    def update(self, dt, keys_held):
+        self.calls.append(dt)
+
+
+def test_accumulates_partial_frames():
+    g, fs = Recorder(), main.FixedStep(step_ms=10.0, max_frame_ms=100.0)
+    # 不够一步：不走模拟，alpha 是剩余比例
+    assert fs.advance(g, 4.0, ()) == 0.4 and g.calls == [] and fs.ticks == 0
+    # 攒够一步：先 snapshot 再 update，余数留到下一帧
+    assert abs(fs.advance(g, 9.0, ()) - 0.3) < 1e-9
+    assert g.calls == ["snap", 10.0] and fs.ticks == 1
+
+
+def test_long_frame_runs_several_steps():
+    g, fs = Recorder(), main.FixedStep(step_ms=10.0, max_frame_ms=100.0)
+    assert abs(fs.advance(g, 35.0, ()) - 0.5) < 1e-9
+    assert fs.ticks == 3 and g.calls == ["snap", 10.0] * 3
+
+
+def test_frame_clamped_to_max():
+    # 卡顿一秒只补 max_frame_ms，不会一口气追几十步
+    g, fs = Recorder(), main.FixedStep(step_ms=10.0, max_frame_ms=50.0)
+    assert fs.advance(g, 1000.0, ()) == 0.0 and fs.ticks == 5
+
+
+def test_tick_count_independent_of_frame_rate():
+    # 同样 1 秒：30 fps 和 144 fps 走的步数一样（差不到一步）
+    for fps in (30, 60, 144):
+        fs = main.FixedStep()
+        for _ in range(fps):
+            fs.advance(Recorder(), 1000.0 / fps, ())
+        assert abs(fs.ticks - 1000.0 / main.STEP_MS) <= 1
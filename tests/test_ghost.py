@@ -0,0 +1,155 @@
+import os, random
+
+import pytest
+
+import main, ghost, sim
+
+
+def random_track(n, seed=0):
+    # (dist, y, state) 每步；速度很少变、y 有大有小的跳变、偶尔换状态
+    rng = random.Random(seed)
+    dist, speed, y, state = 0, 8, main.GROUND_Y - main.RABBIT_H, (0, main.RABBIT_W, main.RABBIT_H)
+    out = []
+    for _ in range(n):
+        if rng.random() < 0.02:
+            speed += rng.choice((-3, 1, 2, 300))
+        dist += speed
+        y += rng.choice((0, 0, 0, -1, 1, -15, 22, -5000, 5000))
+        if rng.random() < 0.01:
+            state = (rng.randrange(4), rng.randint(1, 500), rng.randint(1, 500))
+        out.append((dist, y, state))
+    return out
+
+
+def write(path, track, score=1234, seed=77):
+    w = ghost.TrackWriter(str(path), seed)
+    for rec in track:
+        w.add(*rec)
+    w.finish(score)
+    return w
+
+
+def test_round_trip_every_record(tmp_path):
+    track = random_track(20000)
+    path = tmp_path / "g.hrg"
+    w = write(path, track)
+    assert w.count == len(track)
+    r = ghost.TrackReader(str(path))
+    try:
+        assert (r.seed, r.hz, r.score) == (77, main.FPS, 1234)
+        for k, (dist, y, state) in enumerate(track):
+            assert r.seek(k)
+            assert (r.k, r.dist, r.y, r.state) == (k, dist, y, state)
+            if k:
+                assert r.prev_y == track[k - 1][1]
+        assert not r.seek(len(track))
+        assert (r.k, r.dist, r.y) == (len(track) - 1, track[-1][0], track[-1][1])   # 停在最后一条
+    finally:
+        r.close()
+
+
+def test_seek_in_jumps_crosses_chunk_boundaries(tmp_path):
+    track = random_track(30000, seed=4)
+    path = tmp_path / "g.hrg"
+    write(path, track)
+    assert os.path.getsize(path) > 3 * ghost.CHUNK
+    r = ghost.TrackReader(str(path))
+    try:
+        k = 0
+        for step in (0, 1, 1, 7, 4095, 4096, 1, 9000, 123, 10000):
+            k += step
+            assert r.seek(k)
+            assert (r.dist, r.y, r.state) == track[k]
+        assert r.seek(k)                      # 同一个 k 再 seek 不动
+        assert (r.dist, r.y) == track[k][:2]
+        assert len(r.buf) <= ghost.CHUNK + ghost.MAX_RECORD
+    finally:
+        r.close()
+
+
+def test_truncated_track_stops_early(tmp_path):
+    track = random_track(3000, seed=2)
+    path = tmp_path / "g.hrg"
+    write(path, track)
+    data = path.read_bytes()
+    cut = tmp_path / "cut.hrg"
+    cut.write_bytes(data[:len(data) - 7])
+    r = ghost.TrackReader(str(cut))
+    try:
+        assert not r.seek(len(track) - 1)
+        assert 0 < r.k < len(track) - 1
+        assert (r.dist, r.y, r.state) == track[r.k]
+    finally:
+        r.close()
+
+
+def test_bad_headers_are_rejected(tmp_path):
+    short = tmp_path / "short.hrg"
+    short.write_bytes(b"HRGH\x01")
+    with pytest.raises(ValueError):
+        ghost.TrackReader(str(short))
+    path = tmp_path / "g.hrg"
+    write(path, random_track(10))
+    bad = tmp_path / "bad.hrg"
+    bad.write_bytes(b"XXXX" + path.read_bytes()[4:])
+    with pytest.raises(ValueError):
+        ghost.TrackReader(str(bad))
+
+
+def play(g, seed, ticks, score=None):
+    # 带幽灵跑一局（AutoJumper），结束时可改写分数来模拟好/差的一局
+    game = main.Game(headless=True, seed=seed, ghost=g)
+    keys, policy, seen = {"space": False}, sim.AutoJumper(), []
+    for tick in range(ticks):
+        for a in policy(game, tick):
+            sim.apply_action(game, keys, a)
+        game.update(main.STEP_MS, keys)
+        seen.append((game.distance, int(round(game.player.y))))
+        if game.gameover:
+            break
+    if score is not None:
+        game.score = score
+    g.finish(game)
+    return game, seen
+
+
+def test_real_run_is_recorded_and_replayed(tmp_path):
+    path = str(tmp_path / "ghost.hrg")
+    g = ghost.Ghost(path)
+    game, seen = play(g, 5, 1500, score=5000)
+    assert os.path.exists(path) and not os.path.exists(g.tmp)
+    r = ghost.TrackReader(path)
+    try:
+        assert (r.seed, r.score) == (5, 5000)
+        # 第 k 条是第 k 步之前（k 步走完）的兔子：和上一步结束时看到的一样
+        for k in range(1, len(seen)):
+            assert r.seek(k)
+            assert (r.dist, r.y) == seen[k - 1]
+    finally:
+        r.close()
+
+
+@pytest.mark.parametrize("score, replaced", [(4999, False), (5000, False), (5001, True)])
+def test_only_a_better_run_replaces_the_ghost(tmp_path, score, replaced):
+    path = str(tmp_path / "ghost.hrg")
+    first = ghost.Ghost(path)
+    play(first, 5, 600, score=5000)
+    before = open(path, "rb").read()
+    g = ghost.Ghost(path)
+    play(g, 6, 600, score=score)
+    after = open(path, "rb").read()
+    assert (after != before) == replaced
+    assert not os.path.exists(g.tmp)          # 没换上就删掉临时文件
+    assert g.writer is None
+    g.close()
+
+
+def test_close_mid_run_discards_the_temp_file(tmp_path):
+    path = str(tmp_path / "ghost.hrg")
+    g = ghost.Ghost(path)
+    game = main.Game(headless=True, seed=1, ghost=g)
+    for _ in range(100):
+        game.update(main.STEP_MS, {"space": False})
+    assert os.path.exists(g.tmp)
+    g.close()
+    assert not os.path.exists(g.tmp) and not os.path.exists(path)
@@ -0,0 +1,178 @@
+import random
+
+import pygame
+
+import main
+from main import Lane, Obstacle, Carrot, WingsPickup, Portal
+
+
+def rock(x, w=40):
+    return Obstacle("rock", x, main.GROUND_Y - 50, w, 50, 0.0)
+
+
+def xs(lane):
+    return [e.rect.x for e in lane]
+
+
+# ---------- broadphase ----------
+def test_add_keeps_items_sorted_by_x():
+    rng = random.Random(1)
+    lane = Lane(Obstacle)
+    for _ in range(200):
+        lane.add(rock(rng.randint(-100, 2000), rng.randint(10, 90)))
+    assert xs(lane) == sorted(xs(lane))
+    assert lane.max_w == max(e.rect.w for e in lane)
+
+
+def test_add_equal_x_goes_after_existing():
+    a, b = rock(100), rock(100)
+    lane = Lane(Obstacle, [a])
+    lane.add(b)
+    assert lane.items == [a, b]
+
+
+def test_query_edges_are_half_open():
+    # pygame.Rect 相交是半开区间：只碰到边不算
+    e = rock(100, w=40)                       # x 100..140
+    lane = Lane(Obstacle, [e])
+    y = e.rect.y
+    assert lane.query(pygame.Rect(60, y, 40, 10)) == []      # right == 100
+    assert lane.query(pygame.Rect(140, y, 40, 10)) == []     # x == 140
+    assert lane.query(pygame.Rect(61, y, 40, 10)) == [e]
+    assert lane.query(pygame.Rect(139, y, 40, 10)) == [e]
+    assert lane.hit(pygame.Rect(60, y, 40, 10)) is None
+    assert lane.hit(pygame.Rect(139, y, 1, 1)) is e
+
+
+def test_query_finds_wide_item_starting_far_left():
+    # 宽实体的左沿远在查询区间左边，靠 max_w 往回找
+    wide, narrow = rock(0, w=300), rock(250, w=20)
+    lane = Lane(Obstacle, [narrow, wide])
+    r = pygame.Rect(280, wide.rect.y, 5, 5)
+    assert lane.query(r) == [wide]
+    assert lane.first_ahead(280) is wide
+    assert lane.rightmost() == 300
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(7)
+    lane = Lane(Obstacle)
+    for _ in range(300):
+        lane.add(rock(rng.randint(0, 3000), rng.randint(5, 120)))
+    for _ in range(500):
+        r = pygame.Rect(rng.randint(-50, 3050), main.GROUND_Y - 60, rng.randint(1, 200), 20)
+        expect = [e for e in sorted(lane.items, key=lambda e: e.rect.x) if r.colliderect(e.rect)]
+        assert lane.query(r) == expect
+        assert lane.hit(r) is (expect[0] if expect else None)
+        x = r.x
+        ahead = [e for e in lane.items if e.rect.right > x]
+        assert lane.first_ahead(x) is (min(ahead, key=lambda e: e.rect.x) if ahead else None)
+
+
+def test_empty_lane():
+    lane = Lane(Obstacle)
+    r = pygame.Rect(0, 0, main.WIDTH, main.HEIGHT)
+    assert lane.query(r) == [] and lane.hit(r) is None
+    assert lane.first_ahead(0) is None and lane.nearest_center(0) is None
+    assert lane.rightmost() == 0
+    lane.cull(1000)
+    assert len(lane) == 0
+
+
+def test_cull_only_drops_items_fully_past_limit():
+    a, b, c = rock(-100, w=40), rock(-60, w=100), rock(50)
+    lane = Lane(Obstacle, [a, b, c])
+    lane.cull(-50)                            # a.right = -60 出界；b.right = 40 还在
+    assert lane.items == [b, c]
+    assert lane.free == [a]
+
+
+# ---------- pool ----------
+def test_remove_while_iterating_query_result():
+    # Game.update_collisions 的写法：遍历 query() 的结果（新列表）时从 lane 里删
+    lane = Lane(Carrot, [Carrot(x, 300) for x in range(0, 400, 34)])
+    r = pygame.Rect(60, 300, 100, 32)
+    hit = lane.query(r)
+    for c in hit:
+        lane.remove(c)
+    assert [c.rect.x for c in hit] == [68, 102, 136]
+    assert not lane.query(r)
+    assert xs(lane) == sorted(xs(lane))
+    assert lane.free == hit
+
+
+def test_recycle_while_iterating_a_snapshot():
+    lane = Lane(Obstacle, [rock(x) for x in range(0, 1000, 100)])
+    seen = []
+    for e in list(lane):
+        seen.append(e.rect.x)
+        if e.rect.x % 200 == 0:
+            lane.remove(e)
+            # 刚进 free 的马上被复用，插到右边，不影响这次遍历
+            n = lane.new("fox", e.rect.x + 2000, main.GROUND_Y - main.FOX_H, main.FOX_W, main.FOX_H, 1.0)
+            lane.add(n)
+    assert seen == list(range(0, 1000, 100))
+    assert lane.made == 0 and lane.reused == 5
+    assert not lane.free
+    assert xs(lane) == sorted(xs(lane))
+    assert [e.kind for e in lane][-5:] == ["fox"] * 5
+
+
+def test_new_prefers_free_instances():
+    lane = Lane(Carrot)
+    a = lane.new(10, 20)
+    lane.add(a)
+    lane.clear()
+    assert lane.free == [a] and not lane.items
+    assert lane.new(30, 40) is a
+    assert (lane.made, lane.reused) == (1, 1)
+    assert lane.new(50, 60) is not a
+    assert lane.made == 2
+
+
+def test_reused_obstacle_has_no_leftover_state():
+    lane = Lane(Obstacle)
+    fox = lane.new("fox", 300, 100, main.FOX_W, main.FOX_H, 2.5)
+    lane.add(fox)
+    fox.update(8, 1234.0)                     # 改了 rect.y（狐狸上下摆）
+    fox.px, fox.py = 310, 99                  # 上一步位置（渲染插值用）
+    lane.remove(fox)
+    r = lane.new("rock", 900, 400, 60, 70, 0.5)
+    assert r is fox
+    assert (r.kind, tuple(r.rect), r.phase, r.px, r.py) == ("rock", (900, 400, 60, 70), 0.5, None, None)
+    fresh = Obstacle("rock", 900, 400, 60, 70, 0.5)
+    assert all(getattr(r, k) == getattr(fresh, k) for k in Obstacle.__slots__)
+
+
+def test_reused_pickups_have_no_leftover_state():
+    for cls, args, dirty in ((Carrot, (5, 6), {"t": 3.0}),
+                             (WingsPickup, (5, 6, 0.7), {"phase": 9.0}),
+                             (Portal, ("heaven", 5, 6, 0.7), {"kind": "hell", "phase": 9.0})):
+        lane = Lane(cls)
+        e = lane.new(*args)
+        lane.add(e)
+        e.rect.move_ip(-500, 40)
+        e.px, e.py = 1, 2
+        for k, v in dirty.items():
+            setattr(e, k, v)
+        lane.cull(0)
+        again = lane.new(*args)
+        assert again is e
+        fresh = cls(*args)
+        for k in cls.__slots__:
+            assert getattr(again, k) == getattr(fresh, k), (cls.__name__, k)
+
+
+def test_game_reset_returns_everything_to_the_pools():
+    g = main.Game(headless=True, seed=3)
+    keys = {"space": False}
+    for _ in range(3000):
+        g.update(main.STEP_MS, keys)
+        if g.gameover:
+            break
+    lanes = (g.obstacles, g.carrots, g.wings, g.portals)
+    live = [len(l) for l in lanes]
+    pooled = [len(l.free) for l in lanes]
+    g.reset()
+    assert all(len(l) == 0 for l in lanes)
+    assert [len(l.free) for l in lanes] == [a + b for a, b in zip(live, pooled)]
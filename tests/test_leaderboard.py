@@ -0,0 +1,96 @@
+import asyncio, json, threading, time
+from types import SimpleNamespace
+
+import pytest
+
+import leaderboard
+
+
+def run(i, score, kiosk="k1"):
+    return {"id": f"{kiosk}/{i}", "kiosk": kiosk, "score": score, "seed": i, "scene": "grass", "ms": 1000, "ts": 0.0}
+
+
+@pytest.fixture
+def board(tmp_path):
+    b = leaderboard.Board(str(tmp_path / "lb.db"))
+    yield b
+    b.db.close()
+
+
+def test_resent_batch_not_counted_twice(board):
+    batch = [run(i, 100 * i) for i in range(5)]
+    assert board.add(batch) == 5
+    # 超时后整批重发：id 相同，一条都不加
+    assert board.add(batch) == 0 and board.count == 5
+    assert board.add(batch + [run(9, 50)]) == 1 and board.count == 6
+
+
+def test_top_sorted_and_clamped(board):
+    board.add([run(i, (i * 37) % 11) for i in range(11)])
+    top = board.top(3)
+    assert [r[0] for r in top] == [10, 9, 8]
+    # n 夹在 1..100
+    assert len(board.top(0)) == 1 and len(board.top(1000)) == 11
+
+
+def test_route(board):
+    status, body = board.route("POST", "/scores", json.dumps({"runs": [run(1, 7)]}).encode())
+    assert (status, body) == (200, {"added": 1})
+    status, body = board.route("GET", "/top?n=2", b"")
+    assert status == 200 and body["count"] == 1 and body["top"][0][:2] == (7, "k1")
+    assert board.route("GET", "/nope", b"")[0] == 404
+
+
+def serve_in_thread(path):
+    # 服务整个放在自己的线程里（sqlite 连接只能在建它的线程用），返回 (port, stop)
+    ready, box = threading.Event(), {}
+
+    async def main():
+        board = leaderboard.Board(path)
+        server = await asyncio.start_server(lambda r, w: leaderboard.handle(board, r, w), "127.0.0.1", 0)
+        box.update(loop=asyncio.get_running_loop(), done=asyncio.Event(), port=server.sockets[0].getsockname()[1])
+        ready.set()
+        async with server:
+            await box["done"].wait()
+        board.db.close()
+
+    t = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    t.start()
+    ready.wait(5)
+
+    def stop():
+        # asyncio.run 退出时会把还挂着的 keep-alive 连接一并取消
+        box["loop"].call_soon_threadsafe(box["done"].set)
+        t.join(5)
+    return box["port"], stop
+
+
+def test_client_against_service(tmp_path):
+    port, stop = serve_in_thread(str(tmp_path / "lb.db"))
+    try:
+        client = leaderboard.LeaderboardClient(f"http://127.0.0.1:{port}", kiosk="test", top_n=3)
+        assert client.top() is None
+        client.start()
+        for i in range(250):
+            client.submit(SimpleNamespace(score=i, seed=i, scene="grass", time_ms=1000.0))
+        deadline = time.monotonic() + 10
+        while (client.pending or client.top() != ((249, "test"), (248, "test"), (247, "test"))) \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+        client.close(5.0)
+        # 全部发出、按 BATCH 分批、一条长连接
+        assert not client.pending and client.stats["runs"] == 250
+        assert client.stats["batches"] >= 3 and client.stats["connects"] == 1 and client.stats["errors"] == 0
+        assert client.top() == ((249, "test"), (248, "test"), (247, "test"))
+        assert leaderboard.Board(str(tmp_path / "lb.db")).count == 250
+    finally:
+        stop()
+
+
+def test_client_survives_missing_service():
+    # 服务不在：submit 照常、top 为 None，后台只记错误不抛
+    client = leaderboard.LeaderboardClient("http://127.0.0.1:9", kiosk="test")
+    client.start()
+    client.submit(SimpleNamespace(score=1, seed=1, scene="grass", time_ms=1.0))
+    client.close(5.0)
+    assert client.top() is None and len(client.pending) == 1 and client.stats["errors"] >= 1
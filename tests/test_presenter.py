@@ -0,0 +1,78 @@
+import numpy as np
+import pygame
+import pytest
+
+import main
+
+W, H = main.WIDTH, main.HEIGHT
+
+
+@pytest.fixture
+def window():
+    main.init_display()
+
+    def open_window(size):
+        return pygame.display.set_mode(size, pygame.RESIZABLE)
+    yield open_window
+    main.init_display()
+
+
+def noise(surf, seed=0):
+    # 每个像素都不同的画面：缩放错一个像素都看得出来
+    rgb = np.random.default_rng(seed).integers(0, 256, (W, H, 3), dtype=np.uint8)
+    pygame.surfarray.blit_array(surf, rgb)
+
+
+def pixels(surf):
+    return pygame.surfarray.array3d(surf)
+
+
+def test_integer_scale_and_letterbox(window):
+    win = window((2 * W + 100, 2 * H + 60))
+    p = main.Presenter("integer")
+    noise(p.canvas)
+    p.present()
+    # 最大整数倍 2，居中，四周黑边
+    assert p.k == 2 and p.dest == pygame.Rect(50, 30, 2 * W, 2 * H)
+    got = pixels(win)
+    assert (got[p.dest.x:p.dest.right, p.dest.y:p.dest.bottom] == pixels(p.canvas).repeat(2, 0).repeat(2, 1)).all()
+    assert not got[:50].any() and not got[:, :30].any() and not got[p.dest.right:].any()
+
+
+def test_integer_dirty_rects_match_full_rescale(window):
+    win = window((3 * W, 3 * H))
+    p = main.Presenter("integer")
+    noise(p.canvas, 1)
+    p.present()
+    # 只改两块、只提交这两块：结果和整帧重新放大一样
+    rects = [pygame.Rect(10, 20, 30, 40), pygame.Rect(W - 5, H - 5, 50, 50)]
+    for r in rects:
+        p.canvas.fill((255, 0, 0), r)
+    p.add(rects)
+    p.add([None])   # None 项（这帧没画）跳过
+    assert not p.full
+    p.present()
+    assert (pixels(win) == pixels(p.canvas).repeat(3, 0).repeat(3, 1)).all()
+
+
+def test_integer_below_one_falls_back_to_aspect_fit(window):
+    window((W // 2, H))
+    p = main.Presenter("integer")
+    p.present()
+    # 不到 1 倍：等比缩小，上下留黑边
+    assert p.k == 0 and p.dest == pygame.Rect(0, H // 4, W // 2, H // 2)
+
+
+def test_smooth_scale_and_resize(window):
+    win = window((W + 200, H))
+    p = main.Presenter("smooth")
+    noise(p.canvas, 2)
+    p.present()
+    # 正好 1 倍：原样拷贝，左右各 100 黑边
+    assert p.dest == pygame.Rect(100, 0, W, H)
+    assert (pixels(win)[100:100 + W] == pixels(p.canvas)).all() and not pixels(win)[:100].any()
+    # 拉伸窗口：下一帧重新布局，等比双线性
+    win = window((W * 3 // 2, H * 3 // 2))
+    p.present()
+    assert p.dest == pygame.Rect(0, 0, W * 3 // 2, H * 3 // 2)
+    assert (pixels(win) == pixels(pygame.transform.smoothscale(p.canvas, p.dest.size))).all()
@@ -0,0 +1,52 @@
+import main, reach
+
+# 手搭的高度曲线：第 t 步底边离地高度，落地那步为 0
+ARC = (10, 20, 30, 20, 10, 0)
+HOP = (5, 40, 5, 0)
+
+
+def test_single_arc_tables():
+    t = reach.ReachTable([ARC])
+    assert t.top.tolist() == list(ARC) and t.bottom.tolist() == list(ARC)
+    assert t.air == 6
+    # n=1 连续 1 步 >= 15：s 可取 1..3；最晚按下提前 1 步，最早按下提前 3 步，重叠开始后 3 步落地
+    assert (t.lead[1, 15], t.last[1, 15], t.land[1, 15]) == (1, 3, 3)
+    # n=2：窗口最小值 [10, 20, 20, 10, 0] → s 取 1..2
+    assert (t.lead[2, 15], t.last[2, 15], t.land[2, 15]) == (1, 2, 4)
+    # n=3 只有 s=1；25 高的做不到
+    assert (t.lead[3, 15], t.last[3, 15], t.land[3, 15]) == (1, 1, 5)
+    assert t.lead[3, 25] == reach.NEVER and t.last[3, 25] == -1 and t.land[3, 25] == reach.NEVER
+    assert t.clear.tolist() == [0, 30, 20, 20, 10, 10, 0]
+    assert t.spans(0, 15) == [(1, 3)] and t.spans(0, 5) == [(0, 4)] and t.spans(0, 31) == []
+
+
+def test_lookups_in_pixels():
+    t = reach.ReachTable([ARC])
+    # v=100、宽 0：重叠 1 步（兔子宽 56 < 100）
+    assert reach.overlap_ticks(0, 100) == 1
+    assert t.max_clear(0, 100) == 30
+    assert t.press_window(0, 15, 100) == (100, 399)
+    assert t.recover(0, 15, 100) == 300
+    assert t.press_window(0, 31, 100) is None and t.recover(0, 31, 100) is None
+    assert t.reach(250, 100) == (30, 30)
+    assert t.reach(600, 100) is None
+
+
+def test_several_arcs_take_the_envelope():
+    t = reach.ReachTable([ARC, HOP])
+    assert t.top.tolist() == [10, 40, 30, 20, 10, 0]
+    assert t.bottom.tolist() == [5, 20, 5, 0, 10, 0]
+    # 35 高只有 HOP 第 1 步够得着：提前 1 步按下，重叠开始后 3 步落地
+    assert (t.lead[1, 35], t.last[1, 35], t.land[1, 35]) == (1, 1, 3)
+    # 15 高：最晚按下来自两条都是 s=1，最早按下来自 ARC 的 s=3；最快落地取两条里最小的
+    assert (t.lead[1, 15], t.last[1, 15], t.land[1, 15]) == (1, 3, 3)
+    assert t.clear[1] == 40
+
+
+def test_table_rebuilds_when_constants_change():
+    import sim
+    a = reach.table("full")
+    with sim.overridden(sim.parse_set(["JUMP_V0=-11.0"])):
+        b = reach.table("full")
+        assert b is not a and b.top.max() < a.top.max()
+    assert reach.table("full") is a
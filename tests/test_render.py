@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pygame
+import pytest
+
+import main, sim
+
+
+@pytest.fixture(scope="module")
+def screen():
+    return main.init_display()
+
+
+def drive(a, b, ticks, rng, policy):
+    keys_a, keys_b = {"space": False}, {"space": False}
+    for tick in range(ticks):
+        for action in policy(a, tick):
+            sim.apply_action(a, keys_a, action)
+            sim.apply_action(b, keys_b, action)
+        a.update(main.STEP_MS, keys_a)
+        b.update(main.STEP_MS, keys_b)
+        yield rng.choice((1.0, 1.0, rng.random()))
+
+
+@pytest.fixture
+def extra_layers():
+    main.use_parallax_layers(True)
+    yield
+    main.use_parallax_layers(main.EXTRA_LAYERS)
+
+
+def test_default_layers_are_hills_and_ground():
+    assert [l.name for l in main.PARALLAX_LAYERS] == ["hills", "ground"]
+
+
+@pytest.mark.parametrize("seed, scene, extra", [(3, main.SCENE_GRASS, False), (8, main.SCENE_HELL, True)])
+def test_layered_matches_full_redraw(screen, request, seed, scene, extra):
+    # 同一种子两局：一局整屏重画到离屏 surface，一局走 LayeredRenderer 画到屏幕，逐帧逐像素对比
+    if extra:
+        request.getfixturevalue("extra_layers")
+    a, b = main.Game(seed=seed), main.Game(seed=seed)
+    for g in (a, b):
+        g.scene = scene
+        g.player.give_wings()              # 贴着天花板飞：耳朵在横带上面
+    ref = screen.copy()
+    layered = main.LayeredRenderer(screen)
+    for alpha in drive(a, b, 240, random.Random(seed), sim.AutoJumper()):
+        if a.gameover or a.reviving:
+            break
+        a.draw(ref, alpha)
+        layered.render(b, alpha)
+        assert pygame.image.tobytes(screen, "RGB") == pygame.image.tobytes(ref, "RGB")
+
+
+def test_layered_submits_less_than_full_screen(screen):
+    g = main.Game(seed=1)
+    layered = main.LayeredRenderer(screen)
+    area = []
+    for _ in drive(g, main.Game(seed=1), 120, random.Random(1), sim.AutoJumper()):
+        covered = np.zeros((main.HEIGHT, main.WIDTH), bool)
+        for r in layered.render(g):
+            r = r.clip(layered.full_rect)
+            covered[r.top:r.bottom, r.left:r.right] = True
+        area.append(int(covered.sum()))
+    # 第一帧整屏，之后天空那部分不提交
+    assert area[0] == main.WIDTH * main.HEIGHT
+    assert max(area[1:]) < main.WIDTH * main.HEIGHT * 0.9
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import main, replay, sim
+
+
+def recorded_run(seed, max_ticks=4000):
+    # AutoJumper 跑一局，把它的输入录成 (tick, action)
+    policy, events = sim.AutoJumper(), []
+
+    def rec(game, tick):
+        actions = list(policy(game, tick))
+        events.extend((tick, a) for a in actions)
+        return actions
+
+    return sim.simulate(seed, rec, max_ticks=max_ticks), events
+
+
+def test_encode_decode_round_trip():
+    rng = random.Random(5)
+    events, tick = [], 0
+    for _ in range(500):
+        tick += rng.choice((0, 0, 1, 3, 40, 127, 128, 5000, 1 << 20))   # 同一步多个事件、多字节 varint
+        events.append((tick, rng.choice(replay.CODES)))
+    data = replay.encode(2**63 + 12345, events, tick + 77, 987654321)
+    rp = replay.decode(data)
+    assert rp == replay.Replay(2**63 + 12345, main.FPS, events, tick + 77, 987654321)
+
+
+def test_empty_replay_round_trip():
+    rp = replay.decode(replay.encode(7, [], 0, 0))
+    assert (rp.seed, rp.events, rp.end_tick, rp.score) == (7, [], 0, 0)
+
+
+def test_recorder_save_and_load(tmp_path):
+    rec = replay.Recorder(42)
+    rec.event(10, sim.JUMP_DOWN)
+    rec.event(22, sim.JUMP_UP)
+    rec.event(22, sim.SPECIAL)
+    path = tmp_path / "42.hrp"
+    rec.save(path, 300, 1234)
+    rp = replay.load(path)
+    assert rp.events == [(10, "down"), (22, "up"), (22, "special")]
+    assert (rp.seed, rp.end_tick, rp.score) == (42, 300, 1234)
+
+
+def test_every_truncation_is_rejected():
+    _, events = recorded_run(3, max_ticks=1500)
+    data = replay.encode(3, events, 1500, 999)
+    for n in range(len(data)):
+        with pytest.raises(ValueError):
+            replay.decode(data[:n])
+
+
+def test_corrupt_header_is_rejected():
+    data = bytearray(replay.encode(1, [(5, "down")], 10, 3))
+    bad_magic = b"XXXX" + bytes(data[4:])
+    with pytest.raises(ValueError, match="not a replay"):
+        replay.decode(bad_magic)
+    data[4] = replay.VERSION + 1
+    with pytest.raises(ValueError, match="version"):
+        replay.decode(bytes(data))
+
+
+def test_same_seed_and_inputs_give_the_same_run():
+    r, events = recorded_run(11)
+    assert events
+    again = sim.simulate(11, events, max_ticks=r["ticks"])
+    twice = sim.simulate(11, events, max_ticks=r["ticks"])
+    keys = ("ticks", "score", "carrots", "scene", "gameover", "revive_used")
+    assert [r[k] for k in keys] == [again[k] for k in keys] == [twice[k] for k in keys]
+
+
+def test_replay_file_plays_back_to_the_recorded_score():
+    r, events = recorded_run(21)
+    rp = replay.decode(replay.encode(21, events, r["ticks"], r["score"]))
+    out = replay.play(rp)
+    assert (out["ticks"], out["score"]) == (rp.end_tick, rp.score)
+
+
+def test_background_and_drawing_do_not_touch_the_sim_stream():
+    # 画面用 bg/fx/render 流；同一种子、同一串输入时，开着背景和绘制分数也一样
+    main.init_display()
+    _, events = recorded_run(8, max_ticks=2000)
+    by_tick = {}
+    for tick, a in events:
+        by_tick.setdefault(tick, []).append(a)
+
+    def run(draw):
+        g = main.Game(headless=not draw, seed=8)
+        keys = {"space": False}
+        for tick in range(2000):
+            for a in by_tick.get(tick, ()):
+                sim.apply_action(g, keys, a)
+            g.update(main.STEP_MS, keys)
+            if draw:
+                g.draw(main.screen)
+            if g.gameover:
+                break
+        return tick, g.score, g.coins, g.scene
+
+    assert run(False) == run(True)
+
+
+def test_rng_streams_are_independent():
+    a, b = main.RngStreams(99), main.RngStreams(99)
+    for _ in range(1000):
+        b.bg.random(), b.fx.random(), b.render.random()
+    assert [a.sim.random() for _ in range(100)] == [b.sim.random() for _ in range(100)]
+    assert main.RngStreams(99).sim.random() == random.Random(99).random()
@@ -0,0 +1,33 @@
+import pytest
+
+import main, sim, sweep
+
+
+def test_overridden_recomputes_derived_and_restores():
+    before = (main.FPS, main.GROUND_Y, main.STEP_MS, list(main.CARROT_LOW_CHOICES))
+    with sim.overridden(sim.parse_set(["FPS=120", "GROUND_Y=500"])):
+        assert main.STEP_MS == 1000.0 / 120
+        assert main.CARROT_LOW_CHOICES == [416, 432, 448]
+    assert (main.FPS, main.GROUND_Y, main.STEP_MS, main.CARROT_LOW_CHOICES) == before
+
+
+def test_parse_set_rejects_derived():
+    with pytest.raises(SystemExit):
+        sim.parse_set(["STEP_MS=8.0"])
+
+
+def test_sweep_chunk_leaves_main_untouched():
+    # 同一个子进程会接着跑别的点：上一个点的常量不能留下来
+    before = {k: getattr(main, k) for k in ("FPS", "OBST_MIN_GAP", "STEP_MS")}
+    point, rows = sweep._run_chunk((0, {"FPS": 30, "OBST_MIN_GAP": 1000}, [1, 2], 5.0, "auto", "scalar"))
+    assert {k: getattr(main, k) for k in before} == before
+    assert all(r["sim_ms"] <= 5000 for r in rows)
+    # 30 步/秒 → 5 秒只有 150 步，每步 33.3 ms
+    assert max(r["sim_ms"] for r in rows) == pytest.approx(150 * 1000 / 30)
+
+
+def test_until_stops_without_game_over():
+    # 到目标就停：不是死了，gameover 保持 False；少走一步时还没到
+    r = sim.simulate(1, sim.AutoJumper(), max_ticks=5000, until=lambda g: g.score >= 300)
+    assert r["score"] >= 300 and not r["gameover"]
+    assert sim.simulate(1, sim.AutoJumper(), max_ticks=r["ticks"] - 1)["score"] < 300
@@ -0,0 +1,140 @@
+import math, os, random, threading
+from fractions import Fraction
+from types import SimpleNamespace
+
+import pytest
+
+import main, store
+
+
+def nearest_rank(scores, p):
+    # 精确的最近秩：第 ceil(p/100 * N) 名（用分数算，没有浮点误差）
+    s = sorted(scores)
+    k = math.ceil(Fraction(str(p)) * len(s) / 100)
+    return s[min(len(s) - 1, max(0, k - 1))]
+
+
+def rows(scores):
+    return [(float(i), i, sc, 0, "grass", 1000) for i, sc in enumerate(scores)]
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = store.RunLog(str(tmp_path / "runs.db"))
+    yield log
+    log.close()
+
+
+def test_percentiles_of_1_to_1000(log):
+    scores = list(range(1, 1001))
+    random.Random(0).shuffle(scores)
+    log.append(rows(scores))
+    assert log.count() == 1000
+    assert log.percentiles([0, 1, 50, 90, 99, 99.9, 100]) == {
+        0: 1, 1: 10, 50: 500, 90: 900, 99: 990, 99.9: 999, 100: 1000}
+
+
+def test_percentiles_match_exact_sort(log):
+    # 长尾分布、很多重复分数、跨桶边界（BUCKET 的整数倍附近）
+    rng = random.Random(3)
+    scores = [int(rng.expovariate(1 / 1500.0)) for _ in range(5000)]
+    scores += [store.BUCKET * k + d for k in range(1, 20) for d in (-1, 0, 1)] * 5
+    for start in range(0, len(scores), 700):
+        log.append(rows(scores[start:start + 700]))
+    ps = [0, 0.1, 1, 5, 25, 50, 75, 90, 95, 99, 99.9, 100]
+    assert log.percentiles(ps) == {p: nearest_rank(scores, p) for p in ps}
+    assert [r[2] for r in log.top(5)] == sorted(scores, reverse=True)[:5]
+
+
+def test_percentiles_empty_and_single(log):
+    assert log.percentiles([50]) == {50: None}
+    assert log.count() == 0
+    log.append(rows([42]))
+    assert log.percentiles([0, 50, 100]) == {0: 42, 50: 42, 100: 42}
+
+
+def run(score, seed=1):
+    return SimpleNamespace(score=score, seed=seed, coins=score // 40, scene="grass", time_ms=score * 28.0)
+
+
+def paths(tmp_path):
+    return str(tmp_path / "best.txt"), str(tmp_path / "runs.db")
+
+
+def test_concurrent_submits_then_shutdown(tmp_path):
+    best, db = paths(tmp_path)
+    main.save_best(500, best)
+    st = store.ScoreStore(best, db)
+    st.start()
+    rng = random.Random(9)
+    per = [[rng.randint(0, 20000) for _ in range(300)] for _ in range(8)]
+    go = threading.Event()
+
+    def submitter(scores):
+        go.wait()
+        for sc in scores:
+            st.submit(run(sc))
+
+    threads = [threading.Thread(target=submitter, args=(s,)) for s in per]
+    for t in threads:
+        t.start()
+    go.set()
+    for t in threads:
+        t.join()
+    st.close()
+    assert st.thread is None and st.log is None
+    top = max(max(s) for s in per)
+    with open(best) as f:
+        assert f.read() == str(top)
+    assert not os.path.exists(best + ".tmp")
+    main._best.pop(best, None)
+    assert main.load_best(best) == top
+    log = store.RunLog(db)
+    try:
+        assert log.count() == 8 * 300
+        assert log.top(1)[0][2] == top
+    finally:
+        log.close()
+
+
+def test_lower_scores_never_overwrite_the_best(tmp_path):
+    best, db = paths(tmp_path)
+    main.save_best(9000, best)
+    main._best.pop(best, None)
+    st = store.ScoreStore(best, db)
+    st.start()
+    for sc in (100, 8999, 0):
+        st.submit(run(sc))
+    st.close()
+    with open(best) as f:
+        assert f.read() == "9000"
+
+
+def test_step_without_a_thread_drains_on_close(tmp_path):
+    # 网页上没有线程：空闲帧调 step()，退出时 close() 把剩下的写完
+    best, db = paths(tmp_path)
+    st = store.ScoreStore(best, db)
+    for sc in range(store.BATCH * 2 + 5):
+        st.submit(run(sc))
+    st.step()
+    st.close()
+    with open(best) as f:
+        assert f.read() == str(store.BATCH * 2 + 4)
+    log = store.RunLog(db)
+    try:
+        assert log.count() == store.BATCH * 2 + 5
+    finally:
+        log.close()
+
+
+def test_failed_replace_keeps_the_old_file(tmp_path, monkeypatch):
+    best, _ = paths(tmp_path)
+    assert main.save_best(1234, best)
+
+    def boom(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(main.os, "replace", boom)
+    assert not main.save_best(99999, best)
+    with open(best) as f:
+        assert f.read() == "1234"
@@ -0,0 +1,19 @@
+import pygame
+
+import main
+
+
+def test_blit_parts_caches_whole_line_and_covers_descenders():
+    main.init_display()
+    cache = main.TextCache()
+    surf = pygame.Surface((400, 100), pygame.SRCALPHA)
+    r1 = cache.blit_parts(surf, main.font, (0, 0, 0), ("Wings: ", 17, "s"), (10, 5))
+    r2 = cache.blit_parts(surf, main.font, (0, 0, 0), ("Wings: ", 17, "s"), (10, 5))
+    assert (cache.misses, cache.hits) == (1, 1)
+    # 返回的范围就是整张文字图：g 的下伸部也在里面（分层渲染按这个恢复/提交）
+    img = main.font.render("Wings: 17s", True, (0, 0, 0))
+    assert r1 == r2 == img.get_rect(topleft=(10, 5))
+    assert surf.get_bounding_rect().height <= r1.height
+    # 数字变了就是另一行
+    cache.blit_parts(surf, main.font, (0, 0, 0), ("Wings: ", 16, "s"), center=(200, 50))
+    assert cache.misses == 2